@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+# Throughput of the vectorised Black-76 greeks for batches of random options, next to a scalar
+# math.erf implementation of the same formulas, and the largest difference between the two.
+# Then the batched implied vol solver, recovering the vols of the same options from their prices.
+# Its vol error is taken over options with a vega of at least 0.01 USD per vol point, below which
+# prices are too flat in vol for any solver to recover it.
+# usage: python3 bench/bench_black76.py [batch sizes...]
+
+import sys
+import math
+import timeit
+from pathlib import Path
+
+import numpy as np
+
+sys.path.append(str(Path(__file__).parent.parent.resolve() / "bot"))
+import black76
+import implied_vol
+
+
+def scalar_greeks(forward, strike, t, vol, is_call):
+    sqrt_t = math.sqrt(t)
+    d1 = (math.log(forward / strike) + 0.5 * vol * vol * t) / (vol * sqrt_t)
+    pdf = math.exp(-0.5 * d1 * d1) / math.sqrt(2 * math.pi)
+    cdf = 0.5 * math.erfc(-d1 / math.sqrt(2))
+    return {
+        "delta": cdf if is_call else cdf - 1,
+        "gamma": pdf / (forward * vol * sqrt_t),
+        "vega": forward * pdf * sqrt_t / 100,
+        "theta": -forward * pdf * vol / (2 * sqrt_t) / 365,
+    }
+
+
+def options(n, seed=7):
+    rng = np.random.default_rng(seed)
+    forward = 30000 * np.exp(rng.normal(0, 0.01, n))
+    strike = np.round(forward * np.exp(rng.normal(0, 0.3, n)), -2)
+    t = rng.uniform(1 / 365, 1.0, n)
+    vol = rng.uniform(0.3, 1.2, n)
+    is_call = rng.random(n) < 0.5
+    return forward, strike, t, vol, is_call
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [1, 100, 1000, 10000, 100000]
+    print(f"{'options':>8} {'vectorised (ms)':>16} {'options/ms':>11} {'scalar (ms)':>12} {'speedup':>8}")
+    for n in sizes:
+        args = options(n)
+        number = max(1, 20000 // n)
+        vector_s = min(timeit.repeat(lambda: black76.greeks(*args), number=number, repeat=5)) / number
+        rows = list(zip(*(a.tolist() for a in args)))
+        scalar_number = max(1, 2000 // n)
+        scalar_s = min(timeit.repeat(lambda: [scalar_greeks(*row) for row in rows], number=scalar_number, repeat=3)) / scalar_number
+        print(f"{n:>8} {vector_s * 1e3:>16.3f} {n / (vector_s * 1e3):>11.0f} {scalar_s * 1e3:>12.3f} {scalar_s / vector_s:>7.1f}x")
+
+    # the polynomial normal cdf against math.erfc
+    args = options(10000)
+    vector = black76.greeks(*args)
+    scalar = [scalar_greeks(*row) for row in zip(*(a.tolist() for a in args))]
+    for name in ("delta", "gamma", "vega", "theta"):
+        error = np.max(np.abs(vector[name] - np.array([g[name] for g in scalar])))
+        print(f"max |{name} difference|: {error:.2e}")
+
+    print(f"\n{'options':>8} {'implied vol (ms)':>17} {'options/ms':>11} {'max |vol error|':>16}")
+    for n in sizes:
+        forward, strike, t, vol, is_call = options(n)
+        prices = black76.price(forward, strike, t, vol, is_call)
+        number = max(1, 2000 // n)
+        solve_s = min(timeit.repeat(lambda: implied_vol.implied_vol(prices, forward, strike, t, is_call), number=number, repeat=3)) / number
+        solved = implied_vol.implied_vol(prices, forward, strike, t, is_call)
+        priced = black76.greeks(forward, strike, t, vol, is_call)["vega"] >= 0.01
+        error = np.nanmax(np.abs(solved - vol)[priced])
+        print(f"{n:>8} {solve_s * 1e3:>17.3f} {n / (solve_s * 1e3):>11.0f} {error:>16.2e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+# Micro-benchmarks of the message formatting and classification hot paths, compared with the
+# stored baselines in bench/baselines.json. Exits with status 1 when a benchmark is slower than
+# its baseline by more than the threshold.
+#
+# Times are stored as multiples of a fixed pure-python calibration workload measured in the same
+# run, so baselines recorded on one machine stay meaningful on another.
+#
+# usage: python3 bench/bench_hotpaths.py [--threshold 0.25] [--filter NAME] [--update]
+# Needs config/config.yml like the bot itself, insights are never sent to OpenAI.
+
+import sys
+import json
+import timeit
+import argparse
+from pathlib import Path
+
+bench_dir = Path(__file__).parent.resolve()
+sys.path.append(str(bench_dir.parent / "bot"))
+import bot
+from insights_generator import InsightsGenerator
+
+from fixtures import BLOCK_STRATEGIES, block_trades, onscreen_trades
+
+BASELINES = bench_dir / "baselines.json"
+
+
+def run_sync(coro):
+    # drive a coroutine that never suspends without the cost of an event loop
+    try:
+        coro.send(None)
+    except StopIteration as e:
+        return e.value
+    coro.close()
+    raise RuntimeError("coroutine suspended")
+
+
+def calibration():
+    values = [(i * 7919) % 1009 for i in range(2000)]
+    text = ""
+    for value in sorted(values)[:200]:
+        text += f"{value:,.2f} "
+    return {value: str(value) for value in values}, text
+
+
+def benchmarks():
+    """Yield (name, callable) for every measured call."""
+    insights = InsightsGenerator()
+    for name, trade in onscreen_trades():
+        yield f"generate_trade_message/{name}", lambda trade=trade: bot.generate_trade_message(trade)
+
+    for name, legs in block_trades():
+        yield f"get_block_trade_strategy/{name}", lambda legs=legs: bot.get_block_trade_strategy(legs)
+        yield f"generate_block_trade_message/{name}", lambda legs=legs: run_sync(bot.generate_block_trade_message(legs))
+
+        # the insights inputs are the ones push_block_trade would pass for this structure
+        _, strategy_name, _, ordered = run_sync(bot.generate_block_trade_message(legs))
+        premium = sum(float(leg["price"]) * float(leg["size"]) * (1 if leg["direction"] == "buy" else -1) for leg in ordered)
+        index_price = float(ordered[0]["index_price"])
+        yield f"_build_trade_context/{name}", lambda s=strategy_name, t=ordered, p=premium, i=index_price: \
+            insights._build_trade_context(s, t, t[0]["currency"], t[0]["size"], p, i)
+        yield f"_calculate_max_gain_loss/{name}", lambda s=strategy_name, t=ordered, p=premium, i=index_price: \
+            insights._calculate_max_gain_loss(s, t, i, p)
+
+
+def measure(fn, repeat=5):
+    # autorange picks a loop count worth ~0.2s, each of the repeats then runs a quarter of it
+    timer = timeit.Timer(fn)
+    number = max(1, timer.autorange()[0] // 4)
+    return min(timer.repeat(repeat, number)) / number
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the formatting and classification hot paths")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown over the baseline, 0.25 = 25%%")
+    parser.add_argument("--filter", default="", help="only run benchmarks whose name contains this")
+    parser.add_argument("--update", action="store_true", help="store the measured results as the new baselines")
+    args = parser.parse_args()
+
+    # never reach OpenAI from a benchmark
+    bot.insights_generator.enabled = False
+    baselines = json.loads(BASELINES.read_text()) if BASELINES.exists() else {}
+
+    # a structure classifying as anything but its name would time a miss or another shape
+    for name, legs in block_trades():
+        result, _, _ = bot.get_block_trade_strategy(legs)
+        assert result is not None and result.strategy_name == BLOCK_STRATEGIES[name], f"{name} classifies as {result}"
+
+    unit = measure(calibration)
+    print(f"calibration unit: {unit * 1e6:.1f} us")
+    print(f"{'benchmark':<52} {'us':>10} {'units':>8} {'baseline':>9} {'change':>8}")
+    results = {}
+    regressions = []
+    for name, fn in benchmarks():
+        if args.filter not in name:
+            continue
+        seconds = measure(fn)
+        units = seconds / unit
+        results[name] = round(units, 5)
+        baseline = baselines.get(name)
+        if baseline:
+            change = units / baseline - 1
+            flag = " !" if change > args.threshold else ""
+            if flag:
+                regressions.append(name)
+            print(f"{name:<52} {seconds * 1e6:>10.2f} {units:>8.4f} {baseline:>9.4f} {change:>+8.1%}{flag}")
+        else:
+            print(f"{name:<52} {seconds * 1e6:>10.2f} {units:>8.4f} {'-':>9} {'new':>8}")
+
+    if args.update:
+        baselines.update(results)
+        BASELINES.write_text(json.dumps(dict(sorted(baselines.items())), indent=2) + "\n")
+        print(f"updated {len(results)} baselines in {BASELINES}")
+    elif regressions:
+        print(f"{len(regressions)} benchmarks regressed by more than {args.threshold:.0%}: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+# Event loop throughput of the bot's task layout on the asyncio loop and on uvloop. A synthetic tape
+# of trades is routed from a trade queue to the eight group queues the bot's route_trade puts them
+# in, and one consumer per group formats each alert and sends it. In the "queue" workload
+# a send only yields to the loop, which measures the per-callback overhead. In the "tcp" workload
+# it is a request and response over a loopback connection, standing in for the Telegram API call.
+# usage: python3 bench/bench_loop.py [trades]
+
+import sys
+import json
+import time
+import random
+import asyncio
+from pathlib import Path
+
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
+sys.path.append(str(Path(__file__).parent.parent.resolve() / "bot"))
+import bot
+
+# route_trade queue -> group its consumer sends to
+QUEUE_GROUPS = {
+    "bigsize_trade_queue": "main",
+    "breavan_trade_queue": "breavan",
+    "midas_trade_queue": "midas",
+    "fbg_trade_queue": "fbg",
+    "galaxy_trade_queue": "galaxy",
+    "astron_trade_queue": "astron",
+    "signalplus_trade_queue": "signalplus",
+    "playground_trade_queue": "playground",
+}
+GROUPS = list(QUEUE_GROUPS.values())
+
+
+class QueueRecorder:
+    # stands in for the bot's redis client, keeping the queues route_trade puts a trade in
+    def __init__(self):
+        self.queues = []
+
+    def put_item(self, data, queue):
+        self.queues.append(queue)
+
+
+def make_trades(count):
+    rng = random.Random(0)
+    trades = []
+    for i in range(count):
+        currency = rng.choice(["BTC", "ETH"])
+        size = rng.choice([1, 30, 60, 150, 600, 1200]) * (10 if currency == "ETH" else 1)
+        trades.append({
+            "trade_id": f"{currency}-{i}",
+            "symbol": f"{currency}-29MAR24-{rng.randrange(20, 80) * 1000}-{rng.choice('CP')}",
+            "currency": currency,
+            "direction": rng.choice(["buy", "sell"]),
+            "price": round(rng.uniform(0.001, 0.2), 4),
+            "size": size,
+            "index_price": 40000.0 if currency == "BTC" else 2300.0,
+            "source": "deribit",
+            "timestamp": 1679484388529 + i,
+        })
+    return trades
+
+
+def route_groups(trades):
+    """(currency, size) -> groups for every size on the tape, as bot.route_trade routes a trade of it."""
+    recorder = QueueRecorder()
+    redis_client, bot.redis_client = bot.redis_client, recorder
+    routes = {}
+    try:
+        for trade in trades:
+            key = (trade["currency"], trade["size"])
+            if key not in routes:
+                recorder.queues = []
+                bot.route_trade(dict(trade))
+                routes[key] = [QUEUE_GROUPS[queue] for queue in recorder.queues]
+    finally:
+        bot.redis_client = redis_client
+    return routes
+
+
+async def echo(reader, writer, handlers):
+    handlers.append(asyncio.current_task())
+    while True:
+        line = await reader.readline()
+        if not line:
+            break
+        writer.write(b'{"ok":true}\n')
+        await writer.drain()
+    writer.close()
+
+
+async def pipeline(trades, routes, tcp):
+    queues = {group: asyncio.Queue() for group in GROUPS}
+    trade_queue = asyncio.Queue()
+    expected = sum(len(routes[trade["currency"], trade["size"]]) for trade in trades)
+    done = asyncio.Event()
+    sent = 0
+    handlers = []
+    connections = []
+    server = await asyncio.start_server(lambda reader, writer: echo(reader, writer, handlers), "127.0.0.1", 0) if tcp else None
+
+    async def route():
+        while True:
+            trade = await trade_queue.get()
+            for group in routes[trade["currency"], trade["size"]]:
+                queues[group].put_nowait(trade)
+
+    async def consume(group):
+        nonlocal sent
+        if tcp:
+            reader, writer = await asyncio.open_connection(*server.sockets[0].getsockname()[:2])
+            connections.append(writer)
+        while True:
+            trade = await queues[group].get()
+            text = (f'{trade["direction"].upper()} {trade["size"]} {trade["symbol"]} '
+                    f'@ {trade["price"]} ({trade["price"] * trade["index_price"]:,.2f} USD)')
+            if tcp:
+                writer.write(json.dumps({"chat_id": group, "text": text}).encode() + b"\n")
+                await reader.readline()
+            else:
+                await asyncio.sleep(0)
+            sent += 1
+            if sent == expected:
+                done.set()
+
+    tasks = [asyncio.ensure_future(route())] + [asyncio.ensure_future(consume(group)) for group in GROUPS]
+    started = time.perf_counter()
+    for trade in trades:
+        trade_queue.put_nowait(trade)
+        # the fetchers hand over a page at a time
+        if trade_queue.qsize() >= 50:
+            await asyncio.sleep(0)
+    await done.wait()
+    elapsed = time.perf_counter() - started
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    # closing the connections ends the server's handlers
+    for writer in connections:
+        writer.close()
+    await asyncio.gather(*handlers)
+    if server is not None:
+        server.close()
+        await server.wait_closed()
+    return elapsed, expected
+
+
+def run(policy, trades, routes, tcp, repeat=3):
+    asyncio.set_event_loop_policy(policy)
+    try:
+        return min((asyncio.run(pipeline(trades, routes, tcp)) for _ in range(repeat)), key=lambda result: result[0])
+    finally:
+        asyncio.set_event_loop_policy(None)
+
+
+def main():
+    trades = make_trades(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
+    routes = route_groups(trades)
+    loops = [("asyncio", asyncio.DefaultEventLoopPolicy())]
+    if uvloop is not None:
+        loops.append(("uvloop", uvloop.EventLoopPolicy()))
+    else:
+        print("uvloop is not installed, timing the asyncio loop only")
+    print(f"{'workload':<10}{'loop':<10}{'messages':>10}{'ms':>10}{'msg/s':>12}")
+    for workload in ("queue", "tcp"):
+        baseline = None
+        for name, policy in loops:
+            elapsed, messages = run(policy, trades, routes, workload == "tcp")
+            rate = messages / elapsed
+            baseline = baseline or rate
+            print(f"{workload:<10}{name:<10}{messages:>10}{elapsed * 1e3:>10.1f}{rate:>12.0f}  {rate / baseline:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
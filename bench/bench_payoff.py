@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+# Compare the sampled max gain/loss routine the insights generator used to run with the exact
+# piecewise-linear payoff engine, for single structures and for a batch.
+# usage: python3 bench/bench_payoff.py [iterations]
+
+import sys
+import timeit
+from pathlib import Path
+
+import numpy as np
+
+sys.path.append(str(Path(__file__).parent.parent.resolve() / "bot"))
+from payoff import payoff_profile
+
+# (name, [(strike, "C"/"P", signed size)], net premium)
+STRUCTURES = [
+    ("long call", [(30000, "C", 1)], 1500),
+    ("put spread", [(28000, "P", -1), (30000, "P", 1)], 800),
+    ("call butterfly", [(29000, "C", 1), (30000, "C", -2), (31000, "C", 1)], 200),
+    ("iron condor", [(26000, "P", 1), (27000, "P", -1), (33000, "C", -1), (34000, "C", 1)], -300),
+    ("call albatross", [(28000, "C", 1), (29000, "C", -2), (30000, "C", 1), (31000, "C", -2), (32000, "C", 1)], 100),
+    ("call ratio", [(30000, "C", 1), (31000, "C", -2)], -50),
+]
+
+
+def legacy_max_gain_loss(legs, premium):
+    # the grid-sampling algorithm InsightsGenerator._calculate_max_gain_loss used before the payoff engine
+    net_call_multiplier = sum(size for strike, option_type, size in legs if option_type == "C")
+    min_strike = min(strike for strike, _, _ in legs)
+    max_strike = max(strike for strike, _, _ in legs)
+
+    def payoff(spot_price):
+        total_payoff = -premium
+        for strike, option_type, size in legs:
+            intrinsic = max(0, spot_price - strike) if option_type == "C" else max(0, strike - spot_price)
+            total_payoff += size * intrinsic
+        return total_payoff
+
+    if net_call_multiplier != 0:
+        test_prices = [0.01, min_strike * 0.5, min_strike, (min_strike + max_strike) / 2, max_strike, max_strike * 1.5]
+        payoffs = [payoff(p) for p in test_prices]
+        if net_call_multiplier > 0:
+            return None, min(payoffs)
+        return max(payoffs), None
+
+    step = (max_strike - min_strike) / 50 if max_strike > min_strike else max_strike * 0.02
+    current = max(0.01, min_strike - max_strike * 0.2)
+    payoffs = []
+    while current <= max_strike * 1.5:
+        payoffs.append(payoff(current))
+        current += step
+    return max(payoffs), min(payoffs)
+
+
+def exact_max_gain_loss(legs, premium):
+    strikes, option_types, sizes = zip(*legs)
+    profile = payoff_profile(strikes, [t == "C" for t in option_types], sizes, premium)
+    max_gain = None if np.isinf(profile.max_gain) else profile.max_gain
+    max_loss = None if np.isinf(profile.max_loss) else profile.max_loss
+    return max_gain, max_loss
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    print(f"{'structure':<16} {'legacy (us)':>12} {'exact (us)':>12}  legacy -> exact (max gain, max loss)")
+    for name, legs, premium in STRUCTURES:
+        legacy = legacy_max_gain_loss(legs, premium)
+        exact = exact_max_gain_loss(legs, premium)
+        legacy_us = timeit.timeit(lambda: legacy_max_gain_loss(legs, premium), number=iterations) / iterations * 1e6
+        exact_us = timeit.timeit(lambda: exact_max_gain_loss(legs, premium), number=iterations) / iterations * 1e6
+        print(f"{name:<16} {legacy_us:>12.1f} {exact_us:>12.1f}  {legacy} -> {exact}")
+
+    # batch: every structure padded to 5 legs and repeated
+    repeats = 2000
+    width = max(len(legs) for _, legs, _ in STRUCTURES)
+    strikes = np.zeros((len(STRUCTURES), width))
+    is_call = np.zeros((len(STRUCTURES), width), dtype=bool)
+    quantities = np.zeros((len(STRUCTURES), width))
+    premiums = np.array([premium for _, _, premium in STRUCTURES], dtype=float)
+    for i, (_, legs, _) in enumerate(STRUCTURES):
+        for j, (strike, option_type, size) in enumerate(legs):
+            strikes[i, j], is_call[i, j], quantities[i, j] = strike, option_type == "C", size
+    strikes, is_call, quantities, premiums = (np.tile(a, (repeats, 1)) if a.ndim == 2 else np.tile(a, repeats)
+                                              for a in (strikes, is_call, quantities, premiums))
+    batch_s = min(timeit.repeat(lambda: payoff_profile(strikes, is_call, quantities, premiums), number=1, repeat=5))
+    print(f"batch of {len(premiums)} structures: {batch_s * 1e3:.1f} ms ({batch_s / len(premiums) * 1e6:.2f} us/structure)")
+
+
+if __name__ == "__main__":
+    main()
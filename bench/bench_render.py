@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+# Compare the chart code the cron jobs each carried inline, reopening and rescaling the logo on every
+# render, with the shared templates of cron/render.py, per chart and for the watermark on its own,
+# then the matplotlib and Pillow table backends on the styles of the three table jobs.
+# usage: python3 bench/bench_render.py [iterations]
+
+import io
+import sys
+import timeit
+from pathlib import Path
+
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+import matplotlib.ticker as mtick
+import numpy as np
+from PIL import Image
+
+sys.path.append(str(Path(__file__).parent.parent.resolve() / "cron"))
+import render
+
+TITLE = "BTC DERIBIT 24H BLOCK TRADE VOLUME TOP 10"
+FOOTER = "2024-01-02 11:00 UTC+0"
+HEADERS = ["Rank", "Instrument", "Size"]
+ROWS = [[i + 1, f"BTC-2403{i:02d}-{40000 + 1000 * i}-C", f"{1000 - 75 * i:,.10g}"] for i in range(10)]
+TENORS = ["1D", "1W", "2W", "1M", "2M", "3M", "6M", "1Y"]
+LINES = [
+    ("NOW", TENORS, [52.1, 50.3, 49.8, 51.2, 53.0, 54.4, 56.1, 57.3], "mediumpurple", "-"),
+    ("T-1", TENORS, [50.2, 49.9, 49.1, 50.8, 52.6, 54.0, 55.8, 57.0], "lightseagreen", "-"),
+    ("T-7", TENORS, [47.5, 47.9, 48.2, 49.6, 51.7, 53.1, 55.0, 56.4], "steelblue", "-"),
+    ("RV", ["1W", "2W", "1M", "3M"], [45.0, 46.2, 47.9, 50.1], "goldenrod", "-."),
+]
+VOLUME_TABLE = render.TableStyle(col_widths=[0.15, 1/3, 1/3])
+IV_TABLE = render.TableStyle(col_widths=[0.15] + [1/11] * 10, dpi=250, font_size="xx-large")
+IV_HEADERS = ["Tenor", "Future", "10P", "25P", "ATMF", "25C", "10C", "10D FLY", "25D FLY", "10D RR", "25D RR"]
+IV_ROWS = [[f"{i + 1}AUG23", f"{30000 + 150 * i:.2f}"] + [f"{50 + i + j / 10:.2f}%" for j in range(9)] for i in range(11)]
+CALENDAR_TABLE = render.TableStyle(
+    col_widths=[1/10, 7/10, 1/10, 1/10], figsize=(10, 10), font_size=12, auto_font_size=False, scale=(1, 3),
+    align={0: "center", 1: "left", 2: "center"}, title={"y": 0.92, "fontsize": 16, "weight": "bold", "color": "black"},
+    footer_xy=(0.02, 0.03), footer={"size": 13, "weight": "medium"})
+CALENDAR_HEADERS = ["UTC+0", "Event", "Area", "Consensus"]
+CALENDAR_ROWS = [[f"{8 + i}:30", f"Event number {i} (YoY)", "US", f"{i / 10:.1f}%"] for i in range(12)]
+CALENDAR_FOOTER = FOOTER + " " + r"$\bf{BTC}$" + ":\\$29300 " + r"$\bf{ETH}$" + ":\\$1870"
+
+
+def legacy_watermark(width):
+    img = Image.open(f"{render.assets_dir}/logo.png")
+    wm_width = int(width/4)
+    scaling = (wm_width / float(img.size[0]))
+    wm_height = int(float(img.size[1])*float(scaling))
+    return img.resize((wm_width, wm_height), Image.LANCZOS)
+
+
+def legacy_table():
+    # volume.render_volume's figure code before the render module
+    with plt.rc_context({"font.family": "monospace"}):
+        ccolors = plt.cm.BuPu(np.full(len(HEADERS), 0.1))
+        plt.figure(linewidth=2, edgecolor="darkgray", facecolor="snow", tight_layout={"pad": 1})
+        the_table = plt.table(cellText=[list(row) for row in ROWS], cellLoc="center", colWidths=[0.15, 1/3, 1/3],
+                              colColours=ccolors, colLabels=HEADERS, loc="center")
+        the_table.scale(1, 1.5)
+        ax = plt.gca()
+        ax.get_xaxis().set_visible(False)
+        ax.get_yaxis().set_visible(False)
+        plt.box(on=None)
+        plt.suptitle(TITLE, y=0.92)
+        plt.figtext(0.05, 0.05, FOOTER, horizontalalignment="left", size=6, weight="light")
+        plt.draw()
+        fig = plt.gcf()
+        width, height = fig.get_size_inches()*fig.dpi
+        img = legacy_watermark(width)
+        fig.text(0.5, 0.5, "SignalPlus", fontsize=40, color="black", ha="center", va="center", alpha=0.1)
+        fig.figimage(img, width-img.size[0], 0, alpha=.8, zorder=1)
+        buf = io.BytesIO()
+        plt.savefig(buf, format="png", dpi=fig.dpi)
+        plt.close(fig)
+    return buf.getvalue()
+
+
+def legacy_line_chart():
+    # plot.render_plot's figure code before the render module
+    min_y = min(min(y) for _, _, y, _, _ in LINES)
+    max_y = max(max(y) for _, _, y, _, _ in LINES)
+    with plt.rc_context({"xtick.labelsize": 10, "ytick.labelsize": 10}):
+        fig = plt.figure(figsize=(12, 5))
+        width, height = fig.get_size_inches()*fig.dpi
+        img = legacy_watermark(width)
+        ax = plt.axes()
+        fig.text(0.5, 0.5, "SignalPlus", fontsize=40, color="black", ha="center", va="center", alpha=0.1)
+        fig.figimage(img, ax.transAxes.transform((0.695, 0))[0], ax.transAxes.transform((0, 0.805))[1], alpha=.8, zorder=1)
+        for label, x, y, color, linestyle in LINES:
+            plt.plot(x, y, linestyle, label=label, marker="o", color=color)
+        plt.ylabel("IV/RV")
+        min_y_axis = min_y - (max_y - min_y) / 4
+        max_y_axis = max_y + (max_y - min_y) / 4
+        plt.yticks(np.arange(min_y_axis, max_y_axis, (max_y_axis-min_y_axis)/4))
+        plt.gca().yaxis.set_major_formatter(mtick.PercentFormatter())
+        plt.legend(loc="lower right", fontsize="8")
+        plt.title("BTC ATM Time Lapse IV - Tenor")
+        plt.grid(axis="y")
+        buf = io.BytesIO()
+        plt.savefig(buf, format="png", dpi=fig.dpi)
+        plt.close(fig)
+    return buf.getvalue()
+
+
+def time_ms(fn, iterations):
+    fn()
+    return min(timeit.repeat(fn, number=iterations, repeat=3)) / iterations * 1e3
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    cases = [
+        ("watermark 1200px", lambda: legacy_watermark(1200), lambda: render.watermark(300)),
+        ("table chart", legacy_table, lambda: render.table_chart(VOLUME_TABLE, TITLE, HEADERS, ROWS, FOOTER)),
+        ("line chart", legacy_line_chart, lambda: render.percent_line_chart("BTC ATM Time Lapse IV - Tenor", LINES, "IV/RV")),
+    ]
+    print(f"{'case':<18}{'legacy ms':>12}{'render ms':>12}{'speedup':>10}")
+    for name, legacy, shared in cases:
+        before, after = time_ms(legacy, iterations), time_ms(shared, iterations)
+        print(f"{name:<18}{before:>12.3f}{after:>12.3f}{before / after:>9.1f}x")
+
+    tables = [
+        ("volume", VOLUME_TABLE, TITLE, HEADERS, ROWS, FOOTER),
+        ("volatility", IV_TABLE, "BTC DERIBIT Volatility Table", IV_HEADERS, IV_ROWS, FOOTER),
+        ("calendar", CALENDAR_TABLE, "Economic Calendar", CALENDAR_HEADERS, CALENDAR_ROWS, CALENDAR_FOOTER),
+    ]
+    print(f"\n{'table':<18}{'mpl ms':>12}{'pillow ms':>12}{'speedup':>10}")
+    for name, *table in tables:
+        before = time_ms(lambda: render.table_chart(*table), iterations)
+        after = time_ms(lambda: render.table_chart(*table, backend="pillow"), iterations)
+        print(f"{name:<18}{before:>12.3f}{after:>12.3f}{before / after:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+# Import time and RSS of loading the strategy catalogue with pandas versus the csv module, and of
+# drawing a first table chart with render's matplotlib and Pillow backends.
+# Each variant runs in a fresh interpreter under `python -X importtime`.
+# usage: python3 bench/bench_startup.py [runs]
+
+import re
+import subprocess
+import sys
+from pathlib import Path
+
+bot_dir = Path(__file__).parent.parent.resolve() / "bot"
+cron_dir = bot_dir.parent / "cron"
+CSV_PATH = bot_dir / "deribit_combo.csv"
+
+TABLE = (f"import sys; sys.path.append({str(cron_dir)!r}); import render; "
+         "render.table_chart(render.TableStyle(col_widths=[0.5, 0.5]), 'title', ['a', 'b'], [['1', '2']], 'footer'")
+
+REPORT = "import resource; print('maxrss_kb', resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)"
+
+VARIANTS = {
+    "interpreter only": "pass",
+    "pandas.read_csv": f"import pandas as pd; pd.read_csv({str(CSV_PATH)!r})",
+    "strategy_catalogue": f"import sys; sys.path.append({str(bot_dir)!r}); import strategy_catalogue; strategy_catalogue.StrategyCatalogue({str(CSV_PATH)!r})",
+    "matplotlib table": f"{TABLE})",
+    "pillow table": f"{TABLE}, backend='pillow'); assert 'matplotlib' not in sys.modules",
+}
+
+
+def run(code):
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"{code}; {REPORT}"],
+        capture_output=True, text=True, check=True,
+    )
+    # -X importtime writes "import time: self [us] | cumulative | imported package" lines to stderr,
+    # top level imports are the ones without leading spaces before the package name
+    import_us = 0
+    for line in result.stderr.splitlines():
+        match = re.match(r"import time:\s+\d+ \|\s+(\d+) \| (\S.*)$", line)
+        if match:
+            import_us += int(match.group(1))
+    maxrss_kb = int(result.stdout.split()[-1])
+    return import_us, maxrss_kb
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    print(f"{'variant':<20} {'imports (ms)':>14} {'max RSS (MB)':>14}")
+    for name, code in VARIANTS.items():
+        try:
+            samples = [run(code) for _ in range(runs)]
+        except subprocess.CalledProcessError as e:
+            print(f"{name:<20} failed: {e.stderr.strip().splitlines()[-1]}")
+            continue
+        import_ms = min(s[0] for s in samples) / 1000
+        rss_mb = min(s[1] for s in samples) / 1024
+        print(f"{name:<20} {import_ms:>14.1f} {rss_mb:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+# Compare the deribit_combo DataFrame .loc filter with the compiled StrategyCatalogue lookup.
+# pandas is no longer a bot dependency, install it separately to run the .loc baseline.
+# usage: python3 bench/bench_strategy_lookup.py [iterations]
+
+import sys
+import timeit
+from pathlib import Path
+
+import pandas as pd
+
+bot_dir = Path(__file__).parent.parent.resolve() / "bot"
+sys.path.append(str(bot_dir))
+import strategy_catalogue
+
+CSV_PATH = bot_dir / "deribit_combo.csv"
+
+# (legs, contract_type, strike, expiry, size_ratio, side): a hit per shape plus a miss
+KEYS = [
+    (1, "C", "N", "N", "1", "A"),
+    (2, "C", "A<B", "A=B", "1:1", "A-B"),
+    (2, "PC", "A<B", "A=B", "1:1", "-A+B"),
+    (3, "C", "A<B<C", "A=B=C", "1:2:1", "A-B+C"),
+    (4, "PPCC", "A<B<C<D", "A=B=C=D", "1:1:1:1", "-A+B+C-D"),
+    (5, "P", "A<B<C<D<E", "A=B=C=D=E", "1:2:1:2:1", "A-B+C-D+E"),
+    (3, "N", "N", "N", "N", "A-B-C"),
+]
+
+
+def loc_lookup(deribit_combo, legs, contract_type, strike, expiry, size_ratio, side):
+    return deribit_combo.loc[(deribit_combo["Legs"]==legs) &
+                             (deribit_combo["Contract Type"]==contract_type) &
+                             (deribit_combo["Strike"]==strike) &
+                             (deribit_combo["Expiry"]==expiry) &
+                             (deribit_combo["Size Ratio"]==size_ratio) &
+                             (deribit_combo["Side"]==side)]
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    deribit_combo = pd.read_csv(CSV_PATH)
+    catalogue = strategy_catalogue.StrategyCatalogue(CSV_PATH)
+
+    # both implementations must agree before timing them
+    for key in KEYS:
+        result = loc_lookup(deribit_combo, *key)
+        record = catalogue.lookup(*key)
+        expected = None if result.empty else result["Strategy Name"].values[0]
+        assert (record.strategy_name if record else None) == expected, key
+
+    loc_time = timeit.timeit(lambda: [loc_lookup(deribit_combo, *key) for key in KEYS], number=iterations)
+    dict_time = timeit.timeit(lambda: [catalogue.lookup(*key) for key in KEYS], number=iterations)
+    calls = iterations * len(KEYS)
+    print(f"strategies: {len(catalogue)}, lookups: {calls}")
+    print(f"DataFrame .loc filter: {loc_time / calls * 1e6:10.2f} us/lookup")
+    print(f"compiled dict index:   {dict_time / calls * 1e6:10.2f} us/lookup")
+    print(f"speedup: {loc_time / dict_time:,.0f}x")
+
+
+if __name__ == "__main__":
+    main()
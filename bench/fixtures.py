@@ -0,0 +1,92 @@
+# Realistic normalised trades, shaped like the dicts fetch_deribit_data puts in Redis, for the
+# benchmarks in this directory. Every call returns fresh dicts since the formatting code mutates them.
+
+INDEX_PRICE = 30125.37
+GREEKS = {"delta": 0.4123, "gamma": 0.00007, "vega": 31.52, "theta": -24.81, "rho": 9.33}
+
+
+def deribit_leg(symbol, direction, size, price, iv=52.4, n=0):
+    leg = {
+        "trade_id": f"{symbol}-{n}",
+        "block_trade_id": "BLOCK-1",
+        "source": "deribit",
+        "symbol": symbol,
+        "currency": symbol.split("-")[0],
+        "direction": direction,
+        "price": price,
+        "size": size,
+        "iv": iv,
+        "index_price": INDEX_PRICE,
+        "liquidation": False,
+        "timestamp": 1679484388529,
+        "oi_change": 12.5,
+    }
+    if iv is not None:
+        leg.update({
+            "greeks": dict(GREEKS),
+            "bid": round(price * 0.97, 4),
+            "bid_amount": 25,
+            "ask": round(price * 1.03, 4),
+            "ask_amount": 40,
+            "mark": price,
+        })
+    return leg
+
+
+def legs(*specs):
+    return [deribit_leg(*spec, n=n) for n, spec in enumerate(specs)]
+
+
+# the deribit_combo strategy each block structure of block_trades() classifies as
+BLOCK_STRATEGIES = {
+    "single call": "LONG CALL",
+    "call spread": "LONG CALL SPREAD",
+    "put ratio": "LONG PUT RATIO SPREAD",
+    "calendar": "LONG CALL CALENDAR SPREAD",
+    "straddle": "LONG STRADDLE",
+    "call butterfly": "LONG CALL BUTTERFLY",
+    "iron condor": "LONG IRON CONDOR",
+    "call albatross": "LONG CALL ALBATROSS",
+    "futures spread": "FUTURES SPREAD",
+}
+
+
+def block_trades():
+    """(name, legs) for every block structure the benchmarks format and classify."""
+    return [
+        ("single call", legs(("BTC-30JUN23-32000-C", "buy", 150, 0.0415))),
+        ("call spread", legs(("BTC-30JUN23-32000-C", "buy", 100, 0.0415), ("BTC-30JUN23-36000-C", "sell", 100, 0.0155))),
+        ("put ratio", legs(("BTC-30JUN23-26000-P", "sell", 200, 0.0112), ("BTC-30JUN23-28000-P", "buy", 100, 0.0263))),
+        ("calendar", legs(("BTC-28APR23-30000-C", "sell", 50, 0.0301), ("BTC-30JUN23-30000-C", "buy", 50, 0.0672))),
+        ("straddle", legs(("BTC-30JUN23-30000-P", "buy", 75, 0.0608), ("BTC-30JUN23-30000-C", "buy", 75, 0.0651))),
+        ("call butterfly", legs(("BTC-30JUN23-28000-C", "buy", 50, 0.1002), ("BTC-30JUN23-30000-C", "sell", 100, 0.0651),
+                                ("BTC-30JUN23-32000-C", "buy", 50, 0.0415))),
+        ("iron condor", legs(("BTC-30JUN23-24000-P", "buy", 100, 0.0061), ("BTC-30JUN23-26000-P", "sell", 100, 0.0112),
+                             ("BTC-30JUN23-34000-C", "sell", 100, 0.0251), ("BTC-30JUN23-36000-C", "buy", 100, 0.0155))),
+        ("call albatross", legs(("BTC-30JUN23-26000-C", "buy", 25, 0.1503), ("BTC-30JUN23-28000-C", "sell", 50, 0.1002),
+                                ("BTC-30JUN23-30000-C", "buy", 25, 0.0651), ("BTC-30JUN23-32000-C", "sell", 50, 0.0415),
+                                ("BTC-30JUN23-34000-C", "buy", 25, 0.0251))),
+        ("futures spread", legs(("BTC-PERPETUAL", "sell", 2500000, 30130.5, None), ("BTC-30JUN23", "buy", 2500000, 30642.0, None))),
+    ]
+
+
+def onscreen_trades():
+    """(name, trade) for the single-leg messages generate_trade_message renders."""
+    # bybit is left out: generate_trade_message formats its USD price, a string as bybit sends it,
+    # with a float format and cannot render it yet
+    deribit = deribit_leg("ETH-30JUN23-2000-C", "buy", 1200, 0.0521)
+    deribit.update({"currency": "ETH", "index_price": 1812.44})
+    okx = {
+        "trade_id": "361",
+        "source": "okx",
+        "symbol": "BTC-USD-230630-26000-P",
+        "currency": "BTC",
+        "direction": "sell",
+        "price": "0.0112",
+        "size": 40.0,
+        "iv": None,
+        "oi_change": 0,
+        "index_price": "30125.37",
+        "timestamp": "1679882651706",
+    }
+    return [("deribit", deribit), ("okx", okx)]
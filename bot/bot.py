@@ -1,10 +1,13 @@
 import logging
+import json
 import requests
 import asyncio
 import time
+import signal
+import functools
 from datetime import datetime
 import os
-import pandas as pd
+import numpy as np
 
 import telegram
 from telegram.constants import ParseMode
@@ -12,7 +15,21 @@ from telegram.constants import ParseMode
 import config
 import redis_client
 import paradigm
+import strategy_catalogue
+import strategy_classifier
+import trade_archive
+import tape
+import loop_monitor
+import cluster
+import supervisor
+import black76
+import implied_vol
+import price_service
+from instrument import parse_instrument
+from redis_client import trade_set_id
 from insights_generator import insights_generator
+from flow_aggregator import flow_aggregator
+from metrics import metrics
 
 # logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
@@ -28,19 +45,123 @@ SIGNALPLUS_PUSH_TRADE_API = "https://mizar-gateway.signalplus.com/mizar/block_tr
 redis_client = redis_client.RedisClient()
 bot = telegram.Bot(token=config.telegram_token)
 paradigm = paradigm.Paradigm(access_key=config.paradigm_access_key, secret_key=config.paradigm_secret_key)
+trade_archive = trade_archive.TradeArchiveWriter(config.trade_archive_dir)
+loop_monitor = loop_monitor.LoopMonitor(threshold=config.loop_lag_threshold, profile_dir=config.loop_profile_dir)
+supervisor = supervisor.Supervisor()
+cluster = cluster.Cluster(redis_client, supervisor, lease_ttl=config.cluster_lease_ttl) if config.cluster else None
 
 directory = os.path.dirname(os.path.realpath(__file__))
-deribit_combo = pd.read_csv(f"{directory}/deribit_combo.csv")
+deribit_combo = strategy_catalogue.StrategyCatalogue(f"{directory}/deribit_combo.csv")
+# raw venue responses are recorded for bot/replay.py when tape_dir is configured
+tape_recorder = tape.TapeRecorder(config.tape_dir) if config.tape_dir else None
+
+# GET a venue endpoint and return the decoded json, every exchange fetch goes through here
+def http_get_json(url, params=None):
+    data = requests.get(url, params=params).json()
+    if tape_recorder is not None:
+        tape_recorder.record(url, params, data)
+    return data
+
+# Count an option block trade leg in the 24h block volume leaderboard
+def add_block_volume(trade):
+    if parse_instrument(trade["symbol"]).is_option:
+        redis_client.add_block_volume(trade["source"], trade["currency"], trade["symbol"], trade["size"], trade["timestamp"])
+
+# Solve the IV of the option trades of a fetched page that came without a venue-supplied vol, in
+# one batch. Bybit prices are in USD, the others in the underlying
+def add_implied_vols(trades):
+    pending = []
+    for trade in trades:
+        instrument = parse_instrument(trade["symbol"])
+        if instrument.is_option and trade["iv"] is None and (trade.get("forward") or trade["index_price"]):
+            pending.append((trade, instrument))
+    if not pending:
+        return
+    forwards = np.array([float(trade.get("forward") or trade["index_price"]) for trade, _ in pending])
+    prices = np.array([float(trade["price"]) for trade, _ in pending])
+    in_usd = np.array([trade["source"] == "bybit" for trade, _ in pending])
+    vols = implied_vol.implied_vol(
+        np.where(in_usd, prices, prices * forwards),
+        forwards,
+        np.array([instrument.strike for _, instrument in pending], dtype=float),
+        black76.years_to_expiry([instrument.expiry for _, instrument in pending], time.time()),
+        np.array([instrument.option_type == "C" for _, instrument in pending]),
+    )
+    for (trade, _), vol in zip(pending, vols):
+        if not np.isnan(vol):
+            trade["iv"] = round(float(vol) * 100, 2)
+
+# Fill in local Black-76 greeks for the option trades of a fetched page that carry an IV but no
+# venue greeks, priced off the forward when the venue gives one and the index otherwise
+def add_local_greeks(trades):
+    pending = []
+    for trade in trades:
+        instrument = parse_instrument(trade["symbol"])
+        if instrument.is_option and "greeks" not in trade and trade["iv"] and (trade.get("forward") or trade["index_price"]):
+            pending.append((trade, instrument))
+    if not pending:
+        return
+    greeks = black76.greeks(
+        np.array([float(trade.get("forward") or trade["index_price"]) for trade, _ in pending]),
+        np.array([instrument.strike for _, instrument in pending], dtype=float),
+        black76.years_to_expiry([instrument.expiry for _, instrument in pending], time.time()),
+        np.array([float(trade["iv"]) / 100 for trade, _ in pending]),
+        np.array([instrument.option_type == "C" for _, instrument in pending]),
+    )
+    for n, (trade, _) in enumerate(pending):
+        trade["greeks"] = {name: round(float(values[n]), 5) for name, values in greeks.items()}
+
+# metrics label of every chat trades are sent to
+destinations = {
+    config.group_chat_id: "main",
+    config.midas_group_chat_id: "midas",
+    config.playground_group_chat_id: "playground",
+    config.breavan_horward_group_chat_id: "breavan",
+    config.fbg_group_chat_id: "fbg",
+    config.galaxy_group_chat_id: "galaxy",
+    config.astron_group_chat_id: "astron",
+}
+for chat_id in config.signalplus_group_chat_ids:
+    destinations.setdefault(chat_id, "signalplus")
+for chat_id in config.default_blocktrade_group_chat_ids:
+    destinations.setdefault(chat_id, "default")
+
+# Send a trade message to a chat and record the send and end-to-end latency of the trade
+async def send_trade_message(chat_id, text, trades):
+    # with replicas each message is claimed per chat before it is sent, so a trade redelivered
+    # after a leader failover is not posted twice
+    message_id = None
+    if cluster is not None:
+        trade = trades[0]
+        if trade.get("block_trade_id"):
+            message_id = f'block_{trade["block_trade_id"]}'
+        else:
+            message_id = trade_set_id(trade["source"], trade["trade_id"], trade.get("timestamp"))
+        if not redis_client.claim_send(chat_id, message_id):
+            return
+    started = time.time()
+    try:
+        await bot.send_message(
+            chat_id=chat_id,
+            text=text,
+            parse_mode=ParseMode.HTML,
+            disable_web_page_preview=True,
+        )
+    except Exception:
+        if message_id is not None:
+            redis_client.release_send(chat_id, message_id)
+        raise
+    metrics.sent(trades[0], destinations.get(chat_id, "other"), started)
 
 async def fetch_deribit_data(currency):
-    response = requests.get(DERIBIT_TRADE_API, params={
+    data = http_get_json(DERIBIT_TRADE_API, params={
         "currency": currency,
         "kind": "any",
         "count": 500,
         "sorting": "desc",
     })
-    data = response.json()
     trades = data["result"]["trades"]
+    price_service.record_trades(redis_client, currency, trades)
     # sort trades in ascending order
     trades.sort(key=lambda x: x["trade_seq"])
     for trade in trades:
@@ -70,9 +191,9 @@ async def fetch_deribit_data(currency):
                 block_trade_id = trade["block_trade_id"]
                 # get greeks if iv in trade
                 if "iv" in trade:
-                    ticker = requests.get(DERIBIT_TICKER_API, params={
+                    ticker = http_get_json(DERIBIT_TICKER_API, params={
                         "instrument_name": trade["instrument_name"],
-                    }).json()
+                    })
                     greeks = ticker["result"]["greeks"]
                     oi_stored = redis_client.get_data(f'oi_{trade["instrument_name"]}')
                     trade = {
@@ -115,7 +236,10 @@ async def fetch_deribit_data(currency):
                     }
                 if not redis_client.is_block_trade_id_member(block_trade_id):
                     redis_client.put_block_trade_id(block_trade_id)
+                metrics.start_trace(trade)
                 redis_client.put_block_trade(trade, block_trade_id)
+                trade_archive.append(trade, block=True)
+                add_block_volume(trade)
 
                 # # midas only
                 # if ((trade["currency"] == "BTC" and float(trade["size"]) >= 500) or (trade["currency"] == "ETH" and float(trade["size"]) >= 1000)):
@@ -168,9 +292,9 @@ async def fetch_deribit_data(currency):
                     "liquidation": True if "liquidation" in trade else False,
                     "timestamp": trade["timestamp"],
                 }
-                ticker = requests.get(DERIBIT_TICKER_API, params={
+                ticker = http_get_json(DERIBIT_TICKER_API, params={
                     "instrument_name": trade["symbol"],
-                }).json()
+                })
                 oi_stored = redis_client.get_data(f'oi_{trade["symbol"]}')
                 trade["greeks"] = ticker["result"]["greeks"]
                 trade["bid"] = ticker["result"]["best_bid_price"]
@@ -180,20 +304,22 @@ async def fetch_deribit_data(currency):
                 trade["mark"] = ticker["result"]["mark_price"]
                 trade["oi_change"] = float(ticker["result"]["open_interest"]) - float(oi_stored) if oi_stored is not None else 0
                 redis_client.set_data(f'oi_{trade["symbol"]}', ticker["result"]["open_interest"])
+                metrics.start_trace(trade)
                 redis_client.put_trade(trade, id)
+                trade_archive.append(trade)
 
 async def fetch_bybit_data(symbol):
-    response = requests.get(BYBIT_TRADE_API, params={
+    data = http_get_json(BYBIT_TRADE_API, params={
         "symbol": symbol,
         "category": "option",
     })
-    data = response.json()
     if data["retCode"] != 0:
         logger.error(f"Error fetching bybit data for {symbol}.")
         return
     trades = data["result"]["list"]
+    new_trades = []
     for trade in trades:
-        id = f"bybit_{trade['execId']}"
+        id = trade_set_id("bybit", trade['execId'])
         if trade["isBlockTrade"] and not redis_client.is_trade_member(id):
             """ Parse the trade data and return a dict (trade_id, source, symbol, currency, direction, price, size, iv, index_price, timestamp). The trade data is in the following format:
             {
@@ -203,7 +329,11 @@ async def fetch_bybit_data(symbol):
             "price": "97.2",
             "time": "1679518292229",
             "execId": "1b21d10b-53ad-474d-a0e0-79a31380e35c",
-            "isBlockTrade": true
+            "isBlockTrade": true,
+            "mP": "97.5",
+            "iP": "27564.21",
+            "mIv": "0.5127",
+            "iv": "0.5104"
             },
             """
             logger.error(trade)
@@ -211,28 +341,35 @@ async def fetch_bybit_data(symbol):
                 "trade_id": trade["execId"],
                 "source": "bybit",
                 "symbol": trade["symbol"],
-                "currency": trade["symbol"].split("-")[0],
+                "currency": parse_instrument(trade["symbol"]).currency,
                 "direction": trade["side"],
                 "price": trade["price"],
                 "size": trade["size"],
-                "iv": None,
+                "iv": round(float(trade["iv"]) * 100, 2) if trade.get("iv") else None,
                 "oi_change": 0,
-                "index_price": None,
+                "index_price": trade.get("iP"),
                 "timestamp": trade["time"],
             }
+            new_trades.append((trade, id))
 
-            redis_client.put_trade(trade, id)
+    add_implied_vols([trade for trade, _ in new_trades])
+    add_local_greeks([trade for trade, _ in new_trades])
+    for trade, id in new_trades:
+        metrics.start_trace(trade)
+        redis_client.put_trade(trade, id)
+        trade_archive.append(trade, block=True)
+        add_block_volume(trade)
 
 async def fetch_okx_data(currency):
-    response = requests.get(OKX_TRADE_API, params={
+    data = http_get_json(OKX_TRADE_API, params={
         "instFamily": f"{currency}-USD",
     })
-    data = response.json()
     trades = data["data"]
+    new_trades = []
     for trade in trades:
-        id = f"okx_{trade['tradeId']}_{trade['ts']}"
+        id = trade_set_id("okx", trade['tradeId'], trade['ts'])
         if not redis_client.is_trade_member(id):
-            """ Parse the trade data and return a dict (trade_id, source, symbol, currency, direction, price, size, iv, index_price, timestamp). The trade data is in the following format:
+            """ Parse the trade data and return a dict (trade_id, source, symbol, currency, direction, price, size, iv, index_price, forward, timestamp). The trade data is in the following format:
             {"fillVol":"0.65430556640625","fwdPx":"1764.388687312925","idxPx":"1764.08","instFamily":"ETH-USD","instId":"ETH-USD-230331-1900-C","markPx":"0.005667868981589025","optType":"C","px":"0.0055","side":"sell","sz":"259","tradeId":"361","ts":"1679882651706"}
             """
             trade = {
@@ -243,13 +380,20 @@ async def fetch_okx_data(currency):
                 "direction": trade["side"],
                 "price": trade["px"],
                 "size": int(trade["sz"])/100 if currency=="BTC" else int(trade["sz"])/10,
-                "iv": None,
+                "iv": round(float(trade["fillVol"]) * 100, 2) if trade.get("fillVol") else None,
                 "oi_change": 0,
                 "index_price": trade["idxPx"],
+                "forward": trade.get("fwdPx"),
                 "timestamp": trade["ts"],
             }
+            new_trades.append((trade, id))
 
-            redis_client.put_trade(trade, id)
+    add_implied_vols([trade for trade, _ in new_trades])
+    add_local_greeks([trade for trade, _ in new_trades])
+    for trade, id in new_trades:
+        metrics.start_trace(trade)
+        redis_client.put_trade(trade, id)
+        trade_archive.append(trade)
 
 async def fetch_bybit_symbol():
     # Get timeout
@@ -258,18 +402,16 @@ async def fetch_bybit_symbol():
         symbols = redis_client.get_array('bybit_symbols')
         return symbols
     else:
-        btcResponse = requests.get(BYBIT_SYMBOL_API, params={
+        btcData = http_get_json(BYBIT_SYMBOL_API, params={
             "category": "option",
             "baseCoin": "BTC",
         })
-        btcData = btcResponse.json()
         btcSymbolList = btcData["result"]["list"]
 
-        ethResponse = requests.get(BYBIT_SYMBOL_API, params={
+        ethData = http_get_json(BYBIT_SYMBOL_API, params={
             "category": "option",
             "baseCoin": "ETH",
         })
-        ethData = ethResponse.json()
         ethSymbolList = ethData["result"]["list"]
 
         # 将btcSymbolList,ethSymbolList数组里的symbol值取出来
@@ -343,459 +485,445 @@ async def fetch_bybit_data_all():
 
         await asyncio.sleep(60)
 
+# Route a popped trade to the group queues by currency and size, returns False if the trade is dropped
+def route_trade(data):
+    metrics.trace(data, "enqueue", "fetched", stamp="routed")
+    flow_aggregator.add_trade(data)
+    # if data["price"] <= 0.0005 drop the trade
+    if float(data["price"]) <= 0.0005:
+        return False
+
+    # logger.error(f"Pop data from Redis: {data}")
+    # Check if the size is >=25 or >=250
+    if data["currency"] == "BTC" and float(data["size"]) >= 25:
+        redis_client.put_item(data, 'bigsize_trade_queue')
+        # galaxy only
+        redis_client.put_item(data, 'galaxy_trade_queue')
+        # breavan horward only
+        if float(data["size"]) >= 49:
+            redis_client.put_item(data, 'breavan_trade_queue')
+        # fbg only
+        if float(data["size"]) >= 100:
+            redis_client.put_item(data, 'fbg_trade_queue')
+        # midas only
+        if float(data["size"]) >= 500:
+            redis_client.put_item(data, 'midas_trade_queue')
+            redis_client.put_item(data, 'astron_trade_queue')
+            # signalplus
+            redis_client.put_item(data, 'signalplus_trade_queue')
+            # playground
+            if float(data["size"]) >= 1000:
+                redis_client.put_item(data, 'playground_trade_queue')
+    elif data["currency"] == "ETH" and float(data["size"]) >= 250:
+        redis_client.put_item(data, 'bigsize_trade_queue')
+        # galaxy only
+        redis_client.put_item(data, 'galaxy_trade_queue')
+        # breavan horward only
+        if float(data["size"]) >= 999:
+            redis_client.put_item(data, 'breavan_trade_queue')
+        # midas only
+        if float(data["size"]) >= 1000:
+            redis_client.put_item(data, 'midas_trade_queue')
+            redis_client.put_item(data, 'fbg_trade_queue')
+            # signalplus
+            if float(data["size"]) >= 2000:
+                # redis_client.put_item(data, 'signalplus_trade_queue')
+                if float(data["size"]) >= 5000:
+                    redis_client.put_item(data, 'astron_trade_queue')
+                    redis_client.put_item(data, 'signalplus_trade_queue')
+                # playground
+                if float(data["size"]) >= 10000:
+                    redis_client.put_item(data, 'playground_trade_queue')
+    return True
+
+
 # Define a function to pop 'trade_queue' data from Redis and if BTC's size>=25 or ETH's size>=250 send it to Telegram group
 async def handle_trade_data():
     while True:
         try:
             # Pop data from Redis
             data = redis_client.get_trade()
-            if data:
-                # if data["price"] <= 0.0005 continue the loop
-                if float(data["price"]) <= 0.0005:
-                    continue
-
-                # logger.error(f"Pop data from Redis: {data}")
-                # Check if the size is >=25 or >=250
-                if data["currency"] == "BTC" and float(data["size"]) >= 25:
-                    redis_client.put_item(data, 'bigsize_trade_queue')
-                    # galaxy only
-                    redis_client.put_item(data, 'galaxy_trade_queue')
-                    # breavan horward only
-                    if float(data["size"]) >= 49:
-                        redis_client.put_item(data, 'breavan_trade_queue')
-                    # fbg only
-                    if float(data["size"]) >= 100:
-                        redis_client.put_item(data, 'fbg_trade_queue')
-                    # midas only
-                    if float(data["size"]) >= 500:
-                        redis_client.put_item(data, 'midas_trade_queue')
-                        redis_client.put_item(data, 'astron_trade_queue')
-                        # signalplus
-                        redis_client.put_item(data, 'signalplus_trade_queue')
-                        # playground
-                        if float(data["size"]) >= 1000:
-                            redis_client.put_item(data, 'playground_trade_queue')
-                elif data["currency"] == "ETH" and float(data["size"]) >= 250:
-                    redis_client.put_item(data, 'bigsize_trade_queue')
-                    # galaxy only
-                    redis_client.put_item(data, 'galaxy_trade_queue')
-                    # breavan horward only
-                    if float(data["size"]) >= 999:
-                        redis_client.put_item(data, 'breavan_trade_queue')
-                    # midas only
-                    if float(data["size"]) >= 1000:
-                        redis_client.put_item(data, 'midas_trade_queue')
-                        redis_client.put_item(data, 'fbg_trade_queue')
-                        # signalplus
-                        if float(data["size"]) >= 2000:
-                            # redis_client.put_item(data, 'signalplus_trade_queue')
-                            if float(data["size"]) >= 5000:
-                                redis_client.put_item(data, 'astron_trade_queue')
-                                redis_client.put_item(data, 'signalplus_trade_queue')
-                            # playground
-                            if float(data["size"]) >= 10000:
-                                redis_client.put_item(data, 'playground_trade_queue')
+            # dropped trades don't wait before the next pop
+            if data and not route_trade(data):
+                continue
         except Exception as e:
             logger.error(f"Error4: {e}")
             continue
         # Wait for 10 second before fetching data again
         await asyncio.sleep(0.1)
 
-async def push_block_trade_to_telegram():
-    while True:
-        try:
-            id = redis_client.get_block_trade_id()
-            trades = []
-            if id:
-                while redis_client.get_block_trade_len(id) > 0:
-                    trades.append(redis_client.get_block_trade(id))
-
-            if trades:
-                strikes = []
-                strikes_seen = {}
-                expiries = []
-                expiries_seen = {}
-                prices = []
-                premium = 0
-                total_premium = 0
-                delta = 0
-                gamma = 0
-                vega = 0
-                theta = 0
-                rho = 0
-                index_price = trades[0]["index_price"]
-                total_size = 0
-                currency = trades[0]["currency"]
-
-                # sort trades by distances between trade["strike"] and index_price if trade["iv"] is not None
-                trades = sorted(trades, key=lambda x: abs(float(x["symbol"].split("-")[-2]) - float(index_price)) if x["iv"] is not None else 0)
-                # trade["symbol"]可能是"BTC-28JUN21-40000-C", "BTC-28JUN21-40000-P", "ETH-28JUN21-4000-C", "ETH-28JUN21-4000-P", "ETH-PERPETUAL", "ETH-14APR23"等格式。分解trades数据，得到callOrPut, strike, expiry并重新存入trades数组中
-                for trade in trades:
-                    if trade["symbol"].split("-")[-1] == "C" or trade["symbol"].split("-")[-1] == "P":
-                        trade["callOrPut"] = trade["symbol"].split("-")[-1]
-                        trade["strike"] = int(trade["symbol"].split("-")[-2])
-                        trade["expiry"] = trade["symbol"].split("-")[-3]
-                        if trade["strike"] not in strikes_seen:
-                            strikes.append(trade["strike"])
-                            strikes_seen[trade["strike"]] = True
-                        if trade["expiry"] not in expiries_seen:
-                            expiries.append(trade["expiry"])
-                            expiries_seen[trade["expiry"]] = True
-                        prices.append(f'{trade["price"]} ({str(trade["iv"])+"v"})')
-                        direction = trade["direction"].upper()
-                        if direction == "BUY":
-                            size = float(trade["size"])
-                        else:
-                            size = -float(trade["size"])
-                        total_premium += float(trade["price"]) * size
-                        total_size += abs(size)
-                        # if greeks
-                        if "greeks" in trade:
-                            delta += size * float(trade["greeks"]["delta"])
-                            gamma += size * float(trade["greeks"]["gamma"])
-                            vega += size * float(trade["greeks"]["vega"])
-                            theta += size * float(trade["greeks"]["theta"])
-                            rho += size * float(trade["greeks"]["rho"])
-                    else:
-                        trade["callOrPut"] = None
-                        trade["strike"] = None
-                        trade["expiry"] = None
-
-                premium = total_premium / float(trades[0]["size"])
-
-                result, size_ratio, legs = get_block_trade_strategy(trades)
-                # 输出结果
-                if result.empty or result["Strategy Name"].values[0] == "FUTURES SPREAD":
-                    if result.empty:
-                        strategy_name = "CUSTOM STRATEGY"
-                        text = f"<b>CUSTOM {currency} STRATEGY:</b>"
-                    else:
-                        strategy_name = "FUTURES SPREAD"
-                        text = f"<b>{currency} {strategy_name}:</b>"
-                    text += '\n\n'
-
-                    for trade in trades:
-                        direction = trade["direction"].upper()
-                        callOrPut = trade["symbol"].split("-")[-1]
-                        if callOrPut == "C" or callOrPut == "P":
-                            text += f'{"🔴 Sold" if direction=="SELL" else "🟢 Bought"} {trade["size"]}x '
-                            text += f'{"🔶" if currency=="BTC" else "🔷"} {trade["symbol"]} {"📈" if callOrPut=="C" else "📉"} '
-                            text += f'at {trade["price"]} {"₿" if currency=="BTC" else "Ξ"} (${float(trade["price"])*float(trade["index_price"]):,.2f}) '
-                            text += f'{"Total Sold:" if direction=="SELL" else "Total Bought:"} '
-                            total_trade = float(trade["price"]) * float(trade["size"])
-                            text += f'{total_trade:,.4f} {"₿" if currency=="BTC" else "Ξ"} (${total_trade*float(trade["index_price"])/1000:,.2f}K),'
-                            text += f' <b>IV</b>: {str(trade["iv"])+"%"},'
-                            text += f' <b>Ref</b>: {"$"+str(trade["index_price"])}'
-                            text += f' {"‼️‼️" if (trade["currency"] == "BTC" and float(trade["size"]) >= 1000) or (trade["currency"] == "ETH" and float(trade["size"]) >= 10000) else ""}'
-                            if "mark" in trade:
-                                text += '\n'
-                                text += f'bid: {trade["bid"]} (size: {trade["bid_amount"]}), mark: {trade["mark"]}, ask: {trade["ask"]} (size: {trade["ask_amount"]})'
-                        else:
-                            text += f'{"🔴 Sold " if direction=="SELL" else "🟢 Bought "} {trade["size"]}x '
-                            text += f'{"🔶" if currency=="BTC" else "🔷"} {trade["symbol"]} '
-                            text += f'at ${float(trade["price"]):,.2f}, '
-                            text += f'<b>Ref</b>: {"$"+str(trade["index_price"])}'
+# Format the legs of a block trade, returns the message, strategy name, total size and the legs in display order
+async def generate_block_trade_message(trades):
+    started = time.time()
+    strikes = []
+    strikes_seen = {}
+    expiries = []
+    expiries_seen = {}
+    prices = []
+    premium = 0
+    total_premium = 0
+    delta = 0
+    gamma = 0
+    vega = 0
+    theta = 0
+    rho = 0
+    index_price = trades[0]["index_price"]
+    total_size = 0
+    currency = trades[0]["currency"]
+
+    # sort trades by distances between trade["strike"] and index_price if trade["iv"] is not None
+    trades = sorted(trades, key=lambda x: abs(parse_instrument(x["symbol"]).strike - float(index_price)) if x["iv"] is not None else 0)
+    # trade["symbol"]可能是"BTC-28JUN21-40000-C", "BTC-28JUN21-40000-P", "ETH-28JUN21-4000-C", "ETH-28JUN21-4000-P", "ETH-PERPETUAL", "ETH-14APR23"等格式。分解trades数据，得到callOrPut, strike, expiry并重新存入trades数组中
+    for trade in trades:
+        instrument = parse_instrument(trade["symbol"])
+        if instrument.is_option:
+            trade["callOrPut"] = instrument.option_type
+            trade["strike"] = instrument.strike
+            trade["expiry"] = instrument.expiry_code
+            if trade["strike"] not in strikes_seen:
+                strikes.append(trade["strike"])
+                strikes_seen[trade["strike"]] = True
+            if trade["expiry"] not in expiries_seen:
+                expiries.append(trade["expiry"])
+                expiries_seen[trade["expiry"]] = True
+            prices.append(f'{trade["price"]} ({str(trade["iv"])+"v"})')
+            direction = trade["direction"].upper()
+            if direction == "BUY":
+                size = float(trade["size"])
+            else:
+                size = -float(trade["size"])
+            total_premium += float(trade["price"]) * size
+            total_size += abs(size)
+            # if greeks
+            if "greeks" in trade:
+                delta += size * float(trade["greeks"]["delta"])
+                gamma += size * float(trade["greeks"]["gamma"])
+                vega += size * float(trade["greeks"]["vega"])
+                theta += size * float(trade["greeks"]["theta"])
+                rho += size * float(trade["greeks"]["rho"])
+        else:
+            trade["callOrPut"] = None
+            trade["strike"] = None
+            trade["expiry"] = None
+
+    premium = total_premium / float(trades[0]["size"])
+
+    result, size_ratio, legs = get_block_trade_strategy(trades)
+    # 输出结果
+    if result is None or result.strategy_name == "FUTURES SPREAD":
+        if result is None:
+            strategy_name = "CUSTOM STRATEGY"
+            text = f"<b>CUSTOM {currency} STRATEGY:</b>"
+        else:
+            strategy_name = "FUTURES SPREAD"
+            text = f"<b>{currency} {strategy_name}:</b>"
+        text += '\n\n'
+
+        for trade in trades:
+            direction = trade["direction"].upper()
+            callOrPut = trade["callOrPut"]
+            if callOrPut == "C" or callOrPut == "P":
+                text += f'{"🔴 Sold" if direction=="SELL" else "🟢 Bought"} {trade["size"]}x '
+                text += f'{"🔶" if currency=="BTC" else "🔷"} {trade["symbol"]} {"📈" if callOrPut=="C" else "📉"} '
+                text += f'at {trade["price"]} {"₿" if currency=="BTC" else "Ξ"} (${float(trade["price"])*float(trade["index_price"]):,.2f}) '
+                text += f'{"Total Sold:" if direction=="SELL" else "Total Bought:"} '
+                total_trade = float(trade["price"]) * float(trade["size"])
+                text += f'{total_trade:,.4f} {"₿" if currency=="BTC" else "Ξ"} (${total_trade*float(trade["index_price"])/1000:,.2f}K),'
+                text += f' <b>IV</b>: {str(trade["iv"])+"%"},'
+                text += f' <b>Ref</b>: {"$"+str(trade["index_price"])}'
+                text += f' {"‼️‼️" if (trade["currency"] == "BTC" and float(trade["size"]) >= 1000) or (trade["currency"] == "ETH" and float(trade["size"]) >= 10000) else ""}'
+                if "mark" in trade:
+                    text += '\n'
+                    text += f'bid: {trade["bid"]} (size: {trade["bid_amount"]}), mark: {trade["mark"]}, ask: {trade["ask"]} (size: {trade["ask_amount"]})'
+            else:
+                text += f'{"🔴 Sold " if direction=="SELL" else "🟢 Bought "} {trade["size"]}x '
+                text += f'{"🔶" if currency=="BTC" else "🔷"} {trade["symbol"]} '
+                text += f'at ${float(trade["price"]):,.2f}, '
+                text += f'<b>Ref</b>: {"$"+str(trade["index_price"])}'
 
-                        text += '\n'
+            text += '\n'
 
-                else:
-                    view = result["View"].values[0]
-                    strategy_name = result["Strategy Name"].values[0]
-                    short_strategy_name = result["Short Strategy Name"].values[0].title()
-                    # strategy_name = 'LONG CALL SPREAD' or 'SHORT CALL SPREAD', make strategy_name to be 'LONG {currency} CALL SPREAD' or 'SHORT {currency} CALL SPREAD'
-                    if strategy_name.startswith("LONG"):
-                        strategy_name = strategy_name.replace("LONG", f"LONG {trades[0]['currency']}")
-                        if size_ratio == "1:N" or size_ratio == "N:1":
-                            trades = sorted(trades, key=lambda x: abs(float(x["symbol"].split("-")[-2]) - float(index_price)))
-                            trade_summary = f'🟩 Bought {trades[0]["size"]}x/{trades[1]["size"]}x {"🔶" if currency=="BTC" else "🔷"} {trades[0]["currency"]} '
-                        else:
-                            trade_summary = f'🟩 Bought {trades[0]["size"]}x {"🔶" if currency=="BTC" else "🔷"} {trades[0]["currency"]} '
-                    elif strategy_name.startswith("SHORT"):
-                        strategy_name = strategy_name.replace("SHORT", f"SHORT {trades[0]['currency']}")
-                        if size_ratio == "1:N" or size_ratio == "N:1":
-                            trades = sorted(trades, key=lambda x: abs(float(x["symbol"].split("-")[-2]) - float(index_price)))
-                            trade_summary = f'🟥 Sold {trades[0]["size"]}x/{trades[1]["size"]}x {"🔶" if currency=="BTC" else "🔷"} {trades[0]["currency"]} '
-                        else:
-                            trade_summary = f'🟥 Sold {trades[0]["size"]}x {"🔶" if currency=="BTC" else "🔷"} {trades[0]["currency"]} '
-                        premium = -premium
-                        total_premium = -total_premium
-
-                    if not pd.isna(view):
-                        if size_ratio == "1:N" or size_ratio == "N:1":
-                            text = f'<b>{strategy_name} ({view}) ({trades[0]["size"]}x/{trades[1]["size"]}x):</b>'
-                        else:
-                            text = f'<b>{strategy_name} ({view}) ({trades[0]["size"]}x):</b>'
-                    else:
-                        if size_ratio == "1:N" or size_ratio == "N:1":
-                            text = f'<b>{strategy_name} ({trades[0]["size"]}x/{trades[1]["size"]}x):</b>'
-                        else:
-                            if legs == 1 and trades[0]["oi_change"] != 0:
-                                if trades[0]["oi_change"] > 0:
-                                    strategy_name = f'✅OPENED {strategy_name}'
-                                else:
-                                    if strategy_name.startswith("LONG"):
-                                        strategy_name = strategy_name.replace("LONG", "SHORT")
-                                    elif strategy_name.startswith("SHORT"):
-                                        strategy_name = strategy_name.replace("SHORT", "LONG")
-                                    strategy_name = f'❌CLOSED {strategy_name}'
-
-                            text = f'<b>{strategy_name} ({trades[0]["size"]}x):</b>'
-                    text += '\n'
-                    if legs == 1:
-                        data = trades[0]
-                        direction = data["direction"].upper()
-                        callOrPut = data["symbol"].split("-")[-1]
-
-                        text += f'{"🔴 Sold" if direction=="SELL" else "🟢 Bought"} {data["size"]}x '
-                        text += f'{"🔶" if currency=="BTC" else "🔷"} {data["symbol"]} {"📈" if callOrPut=="C" else "📉"} '
-                        text += f'at {data["price"]} {"U" if data["source"].upper()=="BYBIT" else "₿" if currency=="BTC" else "Ξ"} (${data["price"] if data["source"].upper()=="BYBIT" else float(data["price"])*float(data["index_price"]):,.2f}) '
-                        text += f'{"Total Sold:" if direction=="SELL" else "Total Bought:"} '
-                        total_trade = float(data["price"]) * float(data["size"])
-                        text += f'{total_trade:,.4f} {"₿" if currency=="BTC" else "Ξ"} (${total_trade*float(data["index_price"])/1000:,.2f}K),'
-                        text += f' <b>IV</b>: {str(data["iv"])+"%"},'
-                        text += f' <b>Ref</b>: {"$"+str(data["index_price"])}'
-                        text += f' {"‼️‼️" if (data["currency"] == "BTC" and float(data["size"]) >= 1000) or (data["currency"] == "ETH" and float(data["size"]) >= 10000) else ""}'
-                        if "mark" in data:
-                            text += '\n'
-                            text += f'bid: {data["bid"]} (size: {data["bid_amount"]}), mark: {data["mark"]}, ask: {data["ask"]} (size: {data["ask_amount"]})'
+    else:
+        view = result.view
+        strategy_name = result.strategy_name
+        short_strategy_name = result.short_strategy_name.title()
+        # strategy_name = 'LONG CALL SPREAD' or 'SHORT CALL SPREAD', make strategy_name to be 'LONG {currency} CALL SPREAD' or 'SHORT {currency} CALL SPREAD'
+        if strategy_name.startswith("LONG"):
+            strategy_name = strategy_name.replace("LONG", f"LONG {trades[0]['currency']}")
+            if size_ratio == "1:N" or size_ratio == "N:1":
+                trades = sorted(trades, key=lambda x: abs(parse_instrument(x["symbol"]).strike - float(index_price)))
+                trade_summary = f'🟩 Bought {trades[0]["size"]}x/{trades[1]["size"]}x {"🔶" if currency=="BTC" else "🔷"} {trades[0]["currency"]} '
+            else:
+                trade_summary = f'🟩 Bought {trades[0]["size"]}x {"🔶" if currency=="BTC" else "🔷"} {trades[0]["currency"]} '
+        elif strategy_name.startswith("SHORT"):
+            strategy_name = strategy_name.replace("SHORT", f"SHORT {trades[0]['currency']}")
+            if size_ratio == "1:N" or size_ratio == "N:1":
+                trades = sorted(trades, key=lambda x: abs(parse_instrument(x["symbol"]).strike - float(index_price)))
+                trade_summary = f'🟥 Sold {trades[0]["size"]}x/{trades[1]["size"]}x {"🔶" if currency=="BTC" else "🔷"} {trades[0]["currency"]} '
+            else:
+                trade_summary = f'🟥 Sold {trades[0]["size"]}x {"🔶" if currency=="BTC" else "🔷"} {trades[0]["currency"]} '
+            premium = -premium
+            total_premium = -total_premium
+
+        if view:
+            if size_ratio == "1:N" or size_ratio == "N:1":
+                text = f'<b>{strategy_name} ({view}) ({trades[0]["size"]}x/{trades[1]["size"]}x):</b>'
+            else:
+                text = f'<b>{strategy_name} ({view}) ({trades[0]["size"]}x):</b>'
+        else:
+            if size_ratio == "1:N" or size_ratio == "N:1":
+                text = f'<b>{strategy_name} ({trades[0]["size"]}x/{trades[1]["size"]}x):</b>'
+            else:
+                if legs == 1 and trades[0]["oi_change"] != 0:
+                    if trades[0]["oi_change"] > 0:
+                        strategy_name = f'✅OPENED {strategy_name}'
                     else:
-                        text += f'{trade_summary}'
-                        if short_strategy_name.find("Calendar") != -1:
-                            trades = sorted(trades, key=lambda x: datetime.strptime(x["expiry"], '%d%b%y'))
-                            expiries = [trade["expiry"] for trade in trades]
-                            prices = [f'{trade["price"]} ({str(trade["iv"])+"v"})' for trade in trades]
-                        text += f'{"/".join(expiries)} '
-                        text += f'{"/".join(map(str, strikes))} '
-                        text += f'{short_strategy_name} '
-                        text += f'at {premium:,.5f} {"₿" if currency=="BTC" else "Ξ"} (${premium*float(index_price):,.2f}) '
-                        text += f' {"‼️‼️" if (trades[0]["currency"] == "BTC" and float(trades[0]["size"]) >= 1000) or (trades[0]["currency"] == "ETH" and float(trades[0]["size"]) >= 10000) else ""}'
-                        text += '\n\n'
-                        for trade in trades:
-                            direction = trade["direction"].upper()
-                            callOrPut = trade["symbol"].split("-")[-1]
-                            if callOrPut == "C" or callOrPut == "P":
-                                text += f'{"🔴 Sold" if direction=="SELL" else "🟢 Bought"} {trade["size"]}x '
-                                text += f'{"🔶" if currency=="BTC" else "🔷"} {trade["symbol"]} {"📈" if callOrPut=="C" else "📉"} '
-                                text += f'at {trade["price"]} {"₿" if currency=="BTC" else "Ξ"} (${float(trade["price"])*float(trade["index_price"]):,.2f}) '
-                                text += f'{"Total Sold:" if direction=="SELL" else "Total Bought:"} '
-                                total_trade = float(trade["price"]) * float(trade["size"])
-                                text += f'{total_trade:,.4f} {"₿" if currency=="BTC" else "Ξ"} (${total_trade*float(trade["index_price"])/1000:,.2f}K),'
-                                text += f' <b>IV</b>: {str(trade["iv"])+"%"},'
-                                text += f' <b>Ref</b>: {"$"+str(trade["index_price"])}'
-                                if "mark" in trade:
-                                    text += '\n'
-                                    text += f'bid: {trade["bid"]} (size: {trade["bid_amount"]}), mark: {trade["mark"]}, ask: {trade["ask"]} (size: {trade["ask_amount"]})'
-                                text += '\n'
-                        # text += f'📊 <b>Leg Prices</b>: {", ".join(prices)}'
-                        # text += f' <b>Ref</b>: {"$"+str(index_price)}'
-
-                if delta != 0 or gamma != 0 or vega != 0 or theta != 0 or rho != 0:
+                        if strategy_name.startswith("LONG"):
+                            strategy_name = strategy_name.replace("LONG", "SHORT")
+                        elif strategy_name.startswith("SHORT"):
+                            strategy_name = strategy_name.replace("SHORT", "LONG")
+                        strategy_name = f'❌CLOSED {strategy_name}'
+
+                text = f'<b>{strategy_name} ({trades[0]["size"]}x):</b>'
+        text += '\n'
+        if legs == 1:
+            data = trades[0]
+            direction = data["direction"].upper()
+            callOrPut = data["callOrPut"]
+
+            text += f'{"🔴 Sold" if direction=="SELL" else "🟢 Bought"} {data["size"]}x '
+            text += f'{"🔶" if currency=="BTC" else "🔷"} {data["symbol"]} {"📈" if callOrPut=="C" else "📉"} '
+            text += f'at {data["price"]} {"U" if data["source"].upper()=="BYBIT" else "₿" if currency=="BTC" else "Ξ"} (${data["price"] if data["source"].upper()=="BYBIT" else float(data["price"])*float(data["index_price"]):,.2f}) '
+            text += f'{"Total Sold:" if direction=="SELL" else "Total Bought:"} '
+            total_trade = float(data["price"]) * float(data["size"])
+            text += f'{total_trade:,.4f} {"₿" if currency=="BTC" else "Ξ"} (${total_trade*float(data["index_price"])/1000:,.2f}K),'
+            text += f' <b>IV</b>: {str(data["iv"])+"%"},'
+            text += f' <b>Ref</b>: {"$"+str(data["index_price"])}'
+            text += f' {"‼️‼️" if (data["currency"] == "BTC" and float(data["size"]) >= 1000) or (data["currency"] == "ETH" and float(data["size"]) >= 10000) else ""}'
+            if "mark" in data:
+                text += '\n'
+                text += f'bid: {data["bid"]} (size: {data["bid_amount"]}), mark: {data["mark"]}, ask: {data["ask"]} (size: {data["ask_amount"]})'
+        else:
+            text += f'{trade_summary}'
+            if short_strategy_name.find("Calendar") != -1:
+                trades = sorted(trades, key=lambda x: parse_instrument(x["symbol"]).expiry)
+                expiries = [trade["expiry"] for trade in trades]
+                prices = [f'{trade["price"]} ({str(trade["iv"])+"v"})' for trade in trades]
+            text += f'{"/".join(expiries)} '
+            text += f'{"/".join(map(str, strikes))} '
+            text += f'{short_strategy_name} '
+            text += f'at {premium:,.5f} {"₿" if currency=="BTC" else "Ξ"} (${premium*float(index_price):,.2f}) '
+            text += f' {"‼️‼️" if (trades[0]["currency"] == "BTC" and float(trades[0]["size"]) >= 1000) or (trades[0]["currency"] == "ETH" and float(trades[0]["size"]) >= 10000) else ""}'
+            text += '\n\n'
+            for trade in trades:
+                direction = trade["direction"].upper()
+                callOrPut = trade["callOrPut"]
+                if callOrPut == "C" or callOrPut == "P":
+                    text += f'{"🔴 Sold" if direction=="SELL" else "🟢 Bought"} {trade["size"]}x '
+                    text += f'{"🔶" if currency=="BTC" else "🔷"} {trade["symbol"]} {"📈" if callOrPut=="C" else "📉"} '
+                    text += f'at {trade["price"]} {"₿" if currency=="BTC" else "Ξ"} (${float(trade["price"])*float(trade["index_price"]):,.2f}) '
+                    text += f'{"Total Sold:" if direction=="SELL" else "Total Bought:"} '
+                    total_trade = float(trade["price"]) * float(trade["size"])
+                    text += f'{total_trade:,.4f} {"₿" if currency=="BTC" else "Ξ"} (${total_trade*float(trade["index_price"])/1000:,.2f}K),'
+                    text += f' <b>IV</b>: {str(trade["iv"])+"%"},'
+                    text += f' <b>Ref</b>: {"$"+str(trade["index_price"])}'
+                    if "mark" in trade:
+                        text += '\n'
+                        text += f'bid: {trade["bid"]} (size: {trade["bid_amount"]}), mark: {trade["mark"]}, ask: {trade["ask"]} (size: {trade["ask_amount"]})'
                     text += '\n'
-                    text += f'📖 <b>Risks</b>: <i>Δ: {delta:,.2f}, Γ: {gamma:,.4f}, ν: {vega:,.2f}, Θ: {theta:,.2f}, ρ: {rho:,.2f}</i>'
-                # Generate AI insights for significant trades
-                if ((currency == "BTC" and float(total_size) >= 100) or (currency == "ETH" and float(total_size) >= 1000)):
-                    try:
-                        insights = await insights_generator.generate_trade_insights(
-                            strategy_name, trades, currency, trades[0]["size"], total_premium, float(index_price)
-                        )
-                        if insights:
-                            text += '\n\n'
-                            text += f'🧠 <b>AI Insights</b>: <i>{insights}</i>'
-                    except Exception as e:
-                        logger.error(f"Failed to generate insights: {e}")
-                
+            # text += f'📊 <b>Leg Prices</b>: {", ".join(prices)}'
+            # text += f' <b>Ref</b>: {"$"+str(index_price)}'
+
+    if delta != 0 or gamma != 0 or vega != 0 or theta != 0 or rho != 0:
+        text += '\n'
+        text += f'📖 <b>Risks</b>: <i>Δ: {delta:,.2f}, Γ: {gamma:,.4f}, ν: {vega:,.2f}, Θ: {theta:,.2f}, ρ: {rho:,.2f}</i>'
+    # Generate AI insights for significant trades
+    if ((currency == "BTC" and float(total_size) >= 100) or (currency == "ETH" and float(total_size) >= 1000)):
+        try:
+            insights_started = time.time()
+            insights = await insights_generator.generate_trade_insights(
+                strategy_name, trades, currency, trades[0]["size"], total_premium, float(index_price)
+            )
+            if insights_generator.enabled:
+                metrics.stage(trades[0], "insights", insights_started)
+            if insights:
                 text += '\n\n'
-                text += f'<i>Deribit</i>'
-                text += '\n'
-                text += f'<i>#block</i>'
-                # if timestamp in seconds of now % 3 is zero, add the text below
-                # if int(time.time()) % 3 == 0:
-                #     text += '\n'
-                #     text += f'👉 Want Best Execution? <a href="https://pdgm.co/3ABtI6m">Paradigm</a> is 100% FREE and offers block liquidity in SIZE!'
-                # TODO paradigm
-                # if redis_client.is_paradigm_trade_timestamp_member(trades[0]["timestamp"]):
-                #     text += f'<i> 👉 Block trades on <a href="https://www.paradigm.co">paradigm</a></i>'
-
-                # push trade to Telegram
+                text += f'🧠 <b>AI Insights</b>: <i>{insights}</i>'
+        except Exception as e:
+            logger.error(f"Failed to generate insights: {e}")
+
+    text += '\n\n'
+    text += f'<i>Deribit</i>'
+    text += '\n'
+    text += f'<i>#block</i>'
+    # if timestamp in seconds of now % 3 is zero, add the text below
+    # if int(time.time()) % 3 == 0:
+    #     text += '\n'
+    #     text += f'👉 Want Best Execution? <a href="https://pdgm.co/3ABtI6m">Paradigm</a> is 100% FREE and offers block liquidity in SIZE!'
+    # TODO paradigm
+    # if redis_client.is_paradigm_trade_timestamp_member(trades[0]["timestamp"]):
+    #     text += f'<i> 👉 Block trades on <a href="https://www.paradigm.co">paradigm</a></i>'
+    metrics.stage(trades[0], "render", started)
+    return text, strategy_name, total_size, trades
+
+
+# Pop the legs of a block trade from Redis, format them and send the message to the groups
+async def push_block_trade(id):
+    trades = []
+    while redis_client.get_block_trade_len(id) > 0:
+        trades.append(redis_client.get_block_trade(id))
+
+    if trades:
+        for trade in trades:
+            metrics.trace(trade, "enqueue", "fetched")
+            flow_aggregator.add_trade(trade)
+        text, strategy_name, total_size, trades = await generate_block_trade_message(trades)
+        currency = trades[0]["currency"]
+
+        # push trade to Telegram
+        try:
+            await send_trade_message(config.group_chat_id, text, trades)
+        except Exception as e:
+            logger.error(f"Failed to send message to main group {config.group_chat_id}: {e}")
+
+        # push trade to SignalPlus (only once for all groups)
+        await push_trade_to_signalplus(f"{currency} {strategy_name}", trades)
+
+        # midas only
+        if ((currency == "BTC" and float(total_size) >= 500) or (currency == "ETH" and float(total_size) >= 1000)):
+            try:
+                await send_trade_message(config.midas_group_chat_id, text, trades)
+            except Exception as e:
+                logger.error(f"Failed to send message to midas group {config.midas_group_chat_id}: {e}")
+        # signalplus only
+        if ((currency == "BTC" and float(total_size) >= 500) or (currency == "ETH" and float(total_size) >= 5000)):
+            for chat_id in config.signalplus_group_chat_ids:
+                try:
+                    await send_trade_message(chat_id, text, trades)
+                except Exception as e:
+                    logger.error(f"Failed to send message to signalplus group {chat_id}: {e}")
+        # playground only
+        if ((currency == "BTC" and float(total_size) >= 1000) or (currency == "ETH" and float(total_size) >= 10000)):
+            try:
+                await send_trade_message(config.playground_group_chat_id, text, trades)
+            except Exception as e:
+                logger.error(f"Failed to send message to playground group {config.playground_group_chat_id}: {e}")
+        # breavan horward only
+        if ((currency == "BTC" and float(total_size) >= 49) or (currency == "ETH" and float(total_size) >= 999)):
+            try:
+                await send_trade_message(config.breavan_horward_group_chat_id, text, trades)
+            except Exception as e:
+                logger.error(f"Failed to send message to breavan group {config.breavan_horward_group_chat_id}: {e}")
+        # fbg only
+        if ((currency == "BTC" and float(total_size) >= 100) or (currency == "ETH" and float(total_size) >= 1000)):
+            try:
+                await send_trade_message(config.fbg_group_chat_id, text, trades)
+            except Exception as e:
+                logger.error(f"Failed to send message to fbg group {config.fbg_group_chat_id}: {e}")
+            for chat_id in config.default_blocktrade_group_chat_ids:
                 try:
-                    await bot.send_message(
-                        chat_id=config.group_chat_id,
-                        text=text,
-                        parse_mode=ParseMode.HTML,
-                        disable_web_page_preview=True,
-                    )
+                    await send_trade_message(chat_id, text, trades)
                 except Exception as e:
-                    logger.error(f"Failed to send message to main group {config.group_chat_id}: {e}")
-                
-                # push trade to SignalPlus (only once for all groups)
-                await push_trade_to_signalplus(f"{currency} {strategy_name}", trades)
-
-                # midas only
-                if ((currency == "BTC" and float(total_size) >= 500) or (currency == "ETH" and float(total_size) >= 1000)):
-                    try:
-                        await bot.send_message(
-                            chat_id=config.midas_group_chat_id,
-                            text=text,
-                            parse_mode=ParseMode.HTML,
-                            disable_web_page_preview=True,
-                        )
-                    except Exception as e:
-                        logger.error(f"Failed to send message to midas group {config.midas_group_chat_id}: {e}")
-                # signalplus only
-                if ((currency == "BTC" and float(total_size) >= 500) or (currency == "ETH" and float(total_size) >= 5000)):
-                    for chat_id in config.signalplus_group_chat_ids:
-                        try:
-                            await bot.send_message(
-                                chat_id=chat_id,
-                                text=text,
-                                parse_mode=ParseMode.HTML,
-                                disable_web_page_preview=True,
-                            )
-                        except Exception as e:
-                            logger.error(f"Failed to send message to signalplus group {chat_id}: {e}")
-                # playground only
-                if ((currency == "BTC" and float(total_size) >= 1000) or (currency == "ETH" and float(total_size) >= 10000)):
-                    try:
-                        await bot.send_message(
-                            chat_id=config.playground_group_chat_id,
-                            text=text,
-                            parse_mode=ParseMode.HTML,
-                            disable_web_page_preview=True,
-                        )
-                    except Exception as e:
-                        logger.error(f"Failed to send message to playground group {config.playground_group_chat_id}: {e}")
-                # breavan horward only
-                if ((currency == "BTC" and float(total_size) >= 49) or (currency == "ETH" and float(total_size) >= 999)):
-                    try:
-                        await bot.send_message(
-                            chat_id=config.breavan_horward_group_chat_id,
-                            text=text,
-                            parse_mode=ParseMode.HTML,
-                            disable_web_page_preview=True,
-                        )
-                    except Exception as e:
-                        logger.error(f"Failed to send message to breavan group {config.breavan_horward_group_chat_id}: {e}")
-                # fbg only
-                if ((currency == "BTC" and float(total_size) >= 100) or (currency == "ETH" and float(total_size) >= 1000)):
-                    try:
-                        await bot.send_message(
-                            chat_id=config.fbg_group_chat_id,
-                            text=text,
-                            parse_mode=ParseMode.HTML,
-                            disable_web_page_preview=True,
-                        )
-                    except Exception as e:
-                        logger.error(f"Failed to send message to fbg group {config.fbg_group_chat_id}: {e}")
-                    for chat_id in config.default_blocktrade_group_chat_ids:
-                        try:
-                            await bot.send_message(
-                                chat_id=chat_id,
-                                text=text,
-                                parse_mode=ParseMode.HTML,
-                                disable_web_page_preview=True,
-                            )
-                        except Exception as e:
-                            logger.error(f"Failed to send message to default blocktrade group {chat_id}: {e}")
-                # galaxy only
-                if ((currency == "BTC" and float(total_size) >= 25) or (currency == "ETH" and float(total_size) >= 250)):
-                    try:
-                        await bot.send_message(
-                            chat_id=config.galaxy_group_chat_id,
-                            text=text,
-                            parse_mode=ParseMode.HTML,
-                            disable_web_page_preview=True,
-                        )
-                    except Exception as e:
-                        logger.error(f"Failed to send message to galaxy group {config.galaxy_group_chat_id}: {e}")
-                # astron only
-                if ((currency == "BTC" and float(total_size) >= 500) or (currency == "ETH" and float(total_size) >= 5000)):
-                    try:
-                        await bot.send_message(
-                            chat_id=config.astron_group_chat_id,
-                            text=text,
-                            parse_mode=ParseMode.HTML,
-                            disable_web_page_preview=True,
-                        )
-                    except Exception as e:
-                        logger.error(f"Failed to send message to astron group {config.astron_group_chat_id}: {e}")
-
-
-                # # If id is like "midas_", then send the data to midas telegram group
-                # if id.decode('utf-8').startswith("midas_"):
-                #     await bot.send_message(
-                #         chat_id=config.midas_group_chat_id,
-                #         text=text,
-                #         parse_mode=ParseMode.HTML,
-                #         disable_web_page_preview=True,
-                #     )
-                # elif id.decode('utf-8').startswith("signalplus_"):
-                #     for chat_id in config.signalplus_group_chat_ids:
-                #         await bot.send_message(
-                #             chat_id=chat_id,
-                #             text=text,
-                #             parse_mode=ParseMode.HTML,
-                #             disable_web_page_preview=True,
-                #         )
-                # elif id.decode('utf-8').startswith("playground_"):
-                #     await bot.send_message(
-                #         chat_id=config.playground_group_chat_id,
-                #         text=text,
-                #         parse_mode=ParseMode.HTML,
-                #         disable_web_page_preview=True,
-                #     )
-                # elif id.decode('utf-8').startswith("breavan_"):
-                #     await bot.send_message(
-                #         chat_id=config.breavan_horward_group_chat_id,
-                #         text=text,
-                #         parse_mode=ParseMode.HTML,
-                #         disable_web_page_preview=True,
-                #     )
-                # elif id.decode('utf-8').startswith("galaxy_"):
-                #     await bot.send_message(
-                #         chat_id=config.galaxy_group_chat_id,
-                #         text=text,
-                #         parse_mode=ParseMode.HTML,
-                #         disable_web_page_preview=True,
-                #     )
-                # elif id.decode('utf-8').startswith("astron_"):
-                #     await bot.send_message(
-                #         chat_id=config.astron_group_chat_id,
-                #         text=text,
-                #         parse_mode=ParseMode.HTML,
-                #         disable_web_page_preview=True,
-                #     )
-                # elif id.decode('utf-8').startswith("fbg_"):
-                #     try:
-                #         await bot.send_message(
-                #             chat_id=config.fbg_group_chat_id,
-                #             text=text,
-                #             parse_mode=ParseMode.HTML,
-                #             disable_web_page_preview=True,
-                #         )
-                #     except Exception as e:
-                #         print(e)
-                #         print('unavailable', config.fbg_group_chat_id)
-                #     for chat_id in config.default_blocktrade_group_chat_ids:
-                #         try:
-                #             await bot.send_message(
-                #                 chat_id=chat_id,
-                #                 text=text,
-                #                 parse_mode=ParseMode.HTML,
-                #                 disable_web_page_preview=True,
-                #             )
-                #         except Exception as e:
-                #             print(e)
-                #             print('unavailable', chat_id)
-                # else:
-                #     # push trade to SignalPlus
-                #     await push_trade_to_signalplus(f"{currency} {strategy_name}", trades)
-                #     # push trade to Telegram
-                #     await bot.send_message(
-                #         chat_id=config.group_chat_id,
-                #         text=text,
-                #         parse_mode=ParseMode.HTML,
-                #         disable_web_page_preview=True,
-                #     )
+                    logger.error(f"Failed to send message to default blocktrade group {chat_id}: {e}")
+        # galaxy only
+        if ((currency == "BTC" and float(total_size) >= 25) or (currency == "ETH" and float(total_size) >= 250)):
+            try:
+                await send_trade_message(config.galaxy_group_chat_id, text, trades)
+            except Exception as e:
+                logger.error(f"Failed to send message to galaxy group {config.galaxy_group_chat_id}: {e}")
+        # astron only
+        if ((currency == "BTC" and float(total_size) >= 500) or (currency == "ETH" and float(total_size) >= 5000)):
+            try:
+                await send_trade_message(config.astron_group_chat_id, text, trades)
+            except Exception as e:
+                logger.error(f"Failed to send message to astron group {config.astron_group_chat_id}: {e}")
+
+
+        # # If id is like "midas_", then send the data to midas telegram group
+        # if id.decode('utf-8').startswith("midas_"):
+        #     await bot.send_message(
+        #         chat_id=config.midas_group_chat_id,
+        #         text=text,
+        #         parse_mode=ParseMode.HTML,
+        #         disable_web_page_preview=True,
+        #     )
+        # elif id.decode('utf-8').startswith("signalplus_"):
+        #     for chat_id in config.signalplus_group_chat_ids:
+        #         await bot.send_message(
+        #             chat_id=chat_id,
+        #             text=text,
+        #             parse_mode=ParseMode.HTML,
+        #             disable_web_page_preview=True,
+        #         )
+        # elif id.decode('utf-8').startswith("playground_"):
+        #     await bot.send_message(
+        #         chat_id=config.playground_group_chat_id,
+        #         text=text,
+        #         parse_mode=ParseMode.HTML,
+        #         disable_web_page_preview=True,
+        #     )
+        # elif id.decode('utf-8').startswith("breavan_"):
+        #     await bot.send_message(
+        #         chat_id=config.breavan_horward_group_chat_id,
+        #         text=text,
+        #         parse_mode=ParseMode.HTML,
+        #         disable_web_page_preview=True,
+        #     )
+        # elif id.decode('utf-8').startswith("galaxy_"):
+        #     await bot.send_message(
+        #         chat_id=config.galaxy_group_chat_id,
+        #         text=text,
+        #         parse_mode=ParseMode.HTML,
+        #         disable_web_page_preview=True,
+        #     )
+        # elif id.decode('utf-8').startswith("astron_"):
+        #     await bot.send_message(
+        #         chat_id=config.astron_group_chat_id,
+        #         text=text,
+        #         parse_mode=ParseMode.HTML,
+        #         disable_web_page_preview=True,
+        #     )
+        # elif id.decode('utf-8').startswith("fbg_"):
+        #     try:
+        #         await bot.send_message(
+        #             chat_id=config.fbg_group_chat_id,
+        #             text=text,
+        #             parse_mode=ParseMode.HTML,
+        #             disable_web_page_preview=True,
+        #         )
+        #     except Exception as e:
+        #         print(e)
+        #         print('unavailable', config.fbg_group_chat_id)
+        #     for chat_id in config.default_blocktrade_group_chat_ids:
+        #         try:
+        #             await bot.send_message(
+        #                 chat_id=chat_id,
+        #                 text=text,
+        #                 parse_mode=ParseMode.HTML,
+        #                 disable_web_page_preview=True,
+        #             )
+        #         except Exception as e:
+        #             print(e)
+        #             print('unavailable', chat_id)
+        # else:
+        #     # push trade to SignalPlus
+        #     await push_trade_to_signalplus(f"{currency} {strategy_name}", trades)
+        #     # push trade to Telegram
+        #     await bot.send_message(
+        #         chat_id=config.group_chat_id,
+        #         text=text,
+        #         parse_mode=ParseMode.HTML,
+        #         disable_web_page_preview=True,
+        #     )
+
+
+async def push_block_trade_to_telegram():
+    while not supervisor.stopping:
+        try:
+            id = redis_client.get_block_trade_id()
+            if id:
+                with supervisor.delivering():
+                    await push_block_trade(id)
         except Exception as e:
             logger.error(f"Error5: {e}")
             continue
@@ -803,6 +931,26 @@ async def push_block_trade_to_telegram():
         await asyncio.sleep(5)
 
 
+# write buffered trades to the archive
+async def flush_trade_archive():
+    while True:
+        try:
+            trade_archive.flush()
+        except Exception as e:
+            logger.error(f"Trade Archive Error: {e}")
+        await asyncio.sleep(10)
+
+
+# publish the rolling flow aggregates for the cron reports
+async def publish_flow_snapshot():
+    while True:
+        try:
+            redis_client.set_data('flow_snapshot', json.dumps(flow_aggregator.snapshot()))
+        except Exception as e:
+            logger.error(f"Flow Snapshot Error: {e}")
+        await asyncio.sleep(60)
+
+
 async def push_advertisement_to_groups():
     while True:
         try:
@@ -821,297 +969,96 @@ async def push_advertisement_to_groups():
 
 
 def get_block_trade_strategy(trades):
-    # sort trades by strike if strike is not None, else by callOrPut and its value P<C if callOrPut is not none, else by expiry
-    trades = sorted(trades, key=lambda x: (x["strike"] is None, x["strike"], x["callOrPut"] is None, x["callOrPut"] == "C", x["callOrPut"] == "P", x["expiry"] is None, x["expiry"]))
-
-    # analyse trades to get legs, contract_type, strike, expiry, size_ratio, side
-    legs = len(trades)
-    contract_type = "N"
-    strike = "N"
-    expiry = "N"
-    size_ratio = "N"
-    side = "N"
-    if legs == 1:
-        contract_type = trades[0]["callOrPut"]
-        size_ratio = "1"
-        side = "A" if trades[0]["direction"].upper() == "BUY" else "-A"
-    elif legs == 2:
-        # contract_type
-        if trades[0]["callOrPut"] is None or trades[1]["callOrPut"] is None:
-            contract_type = "F"
-        elif trades[0]["callOrPut"] == trades[1]["callOrPut"] == "C":
-            contract_type = "C"
-        elif trades[0]["callOrPut"] == trades[1]["callOrPut"] == "P":
-            contract_type = "P"
-        elif (trades[0]["callOrPut"] == "P" and trades[1]["callOrPut"] == "C") or (trades[0]["callOrPut"] == "C" and trades[1]["callOrPut"] == "P"):
-            contract_type = "PC"
-
-        # strike
-        if contract_type=="F" or trades[0]["strike"] is None or trades[1]["strike"] is None:
-            strike = "N"
-        elif trades[0]["strike"] < trades[1]["strike"]:
-            strike = "A<B"
-        elif trades[0]["strike"] == trades[1]["strike"]:
-            strike = "A=B"
-        else:
-            strike = "A>B"
-
-        # expiry
-        if contract_type=="F" or trades[0]["expiry"] is None or trades[1]["expiry"] is None:
-            expiry = "N"
-        elif trades[0]["expiry"] == trades[1]["expiry"]:
-            expiry = "A=B"
-        elif datetime.strptime(trades[0]["expiry"], '%d%b%y') < datetime.strptime(trades[1]["expiry"], '%d%b%y'):
-            expiry = "A<B"
-        else:
-            expiry = "A>B"
-
-        # size_ratio
-        if contract_type=="F" or trades[0]["size"] is None or trades[1]["size"] is None:
-            size_ratio = "N"
-        elif trades[0]["size"] == trades[1]["size"]:
-            size_ratio = "1:1"
-        elif trades[0]["size"] < trades[1]["size"]:
-            size_ratio = "1:N"
-        else:
-            size_ratio = "N:1"
-
-        # side
-        if contract_type=="F":
-            side = "N"
-        else:
-            sideA = "A" if trades[0]["direction"].upper() == "BUY" else "-A"
-            sideB = "+B" if trades[1]["direction"].upper() == "BUY" else "-B"
-            side = sideA + sideB
-    elif legs == 3:
-        # contract_type
-        if trades[0]["callOrPut"] == trades[1]["callOrPut"] == trades[2]["callOrPut"] == "C":
-            contract_type = "C"
-        elif trades[0]["callOrPut"] == trades[1]["callOrPut"] == trades[2]["callOrPut"] == "P":
-            contract_type = "P"
-
-        # strike
-        if trades[0]["strike"] is None or trades[1]["strike"] is None or trades[2]["strike"] is None:
-            strike = "N"
-        elif trades[0]["strike"] < trades[1]["strike"] < trades[2]["strike"]:
-            strike = "A<B<C"
-        elif trades[0]["strike"] == trades[1]["strike"] < trades[2]["strike"]:
-            strike = "A=B<C"
-        elif trades[0]["strike"] < trades[1]["strike"] == trades[2]["strike"]:
-            strike = "A<B=C"
-        elif trades[0]["strike"] == trades[1]["strike"] == trades[2]["strike"]:
-            strike = "A=B=C"
-
-        # expiry
-        if trades[0]["expiry"] is None or trades[1]["expiry"] is None or trades[2]["expiry"] is None:
-            expiry = "N"
-        elif trades[0]["expiry"] == trades[1]["expiry"] == trades[2]["expiry"]:
-            expiry = "A=B=C"
-        elif datetime.strptime(trades[0]["expiry"], '%d%b%y') < datetime.strptime(trades[1]["expiry"], '%d%b%y') < datetime.strptime(trades[2]["expiry"], '%d%b%y'):
-            expiry = "A<B<C"
-        elif datetime.strptime(trades[0]["expiry"], '%d%b%y') == datetime.strptime(trades[1]["expiry"], '%d%b%y') < datetime.strptime(trades[2]["expiry"], '%d%b%y'):
-            expiry = "A=B<C"
-        elif datetime.strptime(trades[0]["expiry"], '%d%b%y') < datetime.strptime(trades[1]["expiry"], '%d%b%y') == datetime.strptime(trades[2]["expiry"], '%d%b%y'):
-            expiry = "A<B=C"
-        elif datetime.strptime(trades[0]["expiry"], '%d%b%y') > datetime.strptime(trades[1]["expiry"], '%d%b%y') > datetime.strptime(trades[2]["expiry"], '%d%b%y'):
-            expiry = "A>B>C"
-
-        # size_ratio: "1:2:1" or None
-        if trades[0]["size"]*2 == trades[1]["size"] == trades[2]["size"]*2:
-            size_ratio = "1:2:1"
-
-        # side
-        sideA = "A" if trades[0]["direction"].upper() == "BUY" else "-A"
-        sideB = "+B" if trades[1]["direction"].upper() == "BUY" else "-B"
-        sideC = "+C" if trades[2]["direction"].upper() == "BUY" else "-C"
-        side = sideA + sideB + sideC
-    elif legs == 4:
-        # contract_type: "C", "P", "PPCC", None
-        if trades[0]["callOrPut"] == trades[1]["callOrPut"] == trades[2]["callOrPut"] == trades[3]["callOrPut"] == "C":
-            contract_type = "C"
-        elif trades[0]["callOrPut"] == trades[1]["callOrPut"] == trades[2]["callOrPut"] == trades[3]["callOrPut"] == "P":
-            contract_type = "P"
-        elif trades[0]["callOrPut"] == trades[1]["callOrPut"] == "P" and trades[2]["callOrPut"] == trades[3]["callOrPut"] == "C":
-            contract_type = "PPCC"
-
-        # strike: "A<B<C<D", "A<B=C<D" or None
-        if trades[0]["strike"] is None or trades[1]["strike"] is None or trades[2]["strike"] is None or trades[3]["strike"] is None:
-            strike = "N"
-        elif trades[0]["strike"] < trades[1]["strike"] < trades[2]["strike"] < trades[3]["strike"]:
-            strike = "A<B<C<D"
-        elif trades[0]["strike"] < trades[1]["strike"] == trades[2]["strike"] < trades[3]["strike"]:
-            strike = "A<B=C<D"
-
-        # expiry: "A=B=C=D" or None
-        if trades[0]["expiry"] == trades[1]["expiry"] == trades[2]["expiry"] == trades[3]["expiry"]:
-            expiry = "A=B=C=D"
-
-        # size_ratio: "1:1:1:1" or None
-        if trades[0]["size"] == trades[1]["size"] == trades[2]["size"] == trades[3]["size"]:
-            size_ratio = "1:1:1:1"
-
-        # side
-        sideA = "A" if trades[0]["direction"].upper() == "BUY" else "-A"
-        sideB = "+B" if trades[1]["direction"].upper() == "BUY" else "-B"
-        sideC = "+C" if trades[2]["direction"].upper() == "BUY" else "-C"
-        sideD = "+D" if trades[3]["direction"].upper() == "BUY" else "-D"
-        side = sideA + sideB + sideC + sideD
-    elif legs == 5:
-        # contract_type: "C", "P" for 5-leg strategies
-        if trades[0]["callOrPut"] == trades[1]["callOrPut"] == trades[2]["callOrPut"] == trades[3]["callOrPut"] == trades[4]["callOrPut"] == "C":
-            contract_type = "C"
-        elif trades[0]["callOrPut"] == trades[1]["callOrPut"] == trades[2]["callOrPut"] == trades[3]["callOrPut"] == trades[4]["callOrPut"] == "P":
-            contract_type = "P"
-
-        # strike: "A<B<C<D<E" for 5-leg strategies
-        if (trades[0]["strike"] is None or trades[1]["strike"] is None or trades[2]["strike"] is None or 
-            trades[3]["strike"] is None or trades[4]["strike"] is None):
-            strike = "N"
-        elif (trades[0]["strike"] < trades[1]["strike"] < trades[2]["strike"] < 
-              trades[3]["strike"] < trades[4]["strike"]):
-            strike = "A<B<C<D<E"
-
-        # expiry: "A=B=C=D=E" for 5-leg strategies
-        if (trades[0]["expiry"] == trades[1]["expiry"] == trades[2]["expiry"] == 
-            trades[3]["expiry"] == trades[4]["expiry"]):
-            expiry = "A=B=C=D=E"
-
-        # size_ratio: "1:2:1:2:1" for albatross strategies
-        if (trades[0]["size"] == trades[2]["size"] == trades[4]["size"] and
-            trades[1]["size"] == trades[3]["size"] and
-            trades[1]["size"] == trades[0]["size"] * 2):
-            size_ratio = "1:2:1:2:1"
-
-        # side
-        sideA = "A" if trades[0]["direction"].upper() == "BUY" else "-A"
-        sideB = "+B" if trades[1]["direction"].upper() == "BUY" else "-B"
-        sideC = "+C" if trades[2]["direction"].upper() == "BUY" else "-C"
-        sideD = "+D" if trades[3]["direction"].upper() == "BUY" else "-D"
-        sideE = "+E" if trades[4]["direction"].upper() == "BUY" else "-E"
-        side = sideA + sideB + sideC + sideD + sideE
-
-    # 根据参数查询策略名称和视图
-    result = deribit_combo.loc[(deribit_combo["Legs"]==legs) &
-                               (deribit_combo["Contract Type"]==contract_type) &
-                               (deribit_combo["Strike"]==strike) &
-                               (deribit_combo["Expiry"]==expiry) &
-                               (deribit_combo["Size Ratio"]==size_ratio) &
-                               (deribit_combo["Side"]==side)]
-
-    return result, size_ratio, legs
+    # reduce the legs to a canonical signature and look it up in the strategy catalogue.
+    # size_class keeps the "1:N"/"N:1" notation the message formatting expects for ratio spreads.
+    result, signature = strategy_classifier.classify(trades, deribit_combo)
+    return result, signature.size_class, signature.legs
+
+
+# Pop one trade from the queue of a group and send it, returns whether there was one
+async def push_trade(group_chat_id):
+    data = None
+    # Pop data from Redis
+    if group_chat_id == config.group_chat_id:
+        data = redis_client.get_item('bigsize_trade_queue')
+        if data:
+            metrics.trace(data, "route", "routed")
+            text, strategy_name = await generate_trade_message_with_insights(data)
+            # push trade to SignalPlus
+            await push_trade_to_signalplus(f'{data["currency"]} {strategy_name}', [data])
+
+            # Send the data to Telegram group
+            await send_trade_message(group_chat_id, text, [data])
+    elif group_chat_id == config.breavan_horward_group_chat_id:
+        data = redis_client.get_item('breavan_trade_queue')
+        if data:
+            metrics.trace(data, "route", "routed")
+            text, _ = await generate_trade_message_with_insights(data)
+            # Send the data to Telegram group
+            await send_trade_message(group_chat_id, text, [data])
+    elif group_chat_id == config.midas_group_chat_id:
+        data = redis_client.get_item('midas_trade_queue')
+        if data:
+            metrics.trace(data, "route", "routed")
+            text, _ = await generate_trade_message_with_insights(data)
+            # Send the data to Telegram group
+            await send_trade_message(group_chat_id, text, [data])
+    elif group_chat_id in config.signalplus_group_chat_ids:
+        data = redis_client.get_item('signalplus_trade_queue')
+        if data:
+            metrics.trace(data, "route", "routed")
+            text, _ = await generate_trade_message_with_insights(data)
+            for chat_id in config.signalplus_group_chat_ids:
+                # Send the data to Telegram group
+                await send_trade_message(chat_id, text, [data])
+    elif group_chat_id == config.playground_group_chat_id:
+        data = redis_client.get_item('playground_trade_queue')
+        if data:
+            metrics.trace(data, "route", "routed")
+            text, _ = await generate_trade_message_with_insights(data)
+            # Send the data to Telegram group
+            await send_trade_message(group_chat_id, text, [data])
+    elif group_chat_id == config.galaxy_group_chat_id:
+        data = redis_client.get_item('galaxy_trade_queue')
+        if data:
+            metrics.trace(data, "route", "routed")
+            text, _ = await generate_trade_message_with_insights(data)
+            # Send the data to Telegram group
+            await send_trade_message(group_chat_id, text, [data])
+    elif group_chat_id == config.astron_group_chat_id:
+        data = redis_client.get_item('astron_trade_queue')
+        if data:
+            metrics.trace(data, "route", "routed")
+            text, _ = await generate_trade_message_with_insights(data)
+            # Send the data to Telegram group
+            await send_trade_message(group_chat_id, text, [data])
+    elif group_chat_id == config.fbg_group_chat_id:
+        data = redis_client.get_item('fbg_trade_queue')
+        if data:
+            metrics.trace(data, "route", "routed")
+            text, _ = await generate_trade_message_with_insights(data)
+            # Send the data to Telegram group
+            try:
+                await send_trade_message(group_chat_id, text, [data])
+            except Exception as e:
+                logger.error(f"Failed to send message to fbg group {group_chat_id}: {e}")
+            for chat_id in config.default_blocktrade_group_chat_ids:
+                # Send the data to Telegram group
+                try:
+                    await send_trade_message(chat_id, text, [data])
+                except Exception as e:
+                    logger.error(f"Failed to send message to default group {chat_id}: {e}")
+    return data is not None
 
 
 # Define a function to send the data with prettify format to Telegram group
 async def push_trade_to_telegram(group_chat_id):
-    while True:
+    while not supervisor.stopping:
         try:
-            # Pop data from Redis
-            if group_chat_id == config.group_chat_id:
-                data = redis_client.get_item('bigsize_trade_queue')
-                if data:
-                    text, strategy_name = await generate_trade_message_with_insights(data)
-                    # push trade to SignalPlus
-                    await push_trade_to_signalplus(f'{data["currency"]} {strategy_name}', [data])
-
-                    # Send the data to Telegram group
-                    await bot.send_message(
-                        chat_id=group_chat_id,
-                        text=text,
-                        parse_mode=ParseMode.HTML,
-                        disable_web_page_preview=True,
-                    )
-            elif group_chat_id == config.breavan_horward_group_chat_id:
-                data = redis_client.get_item('breavan_trade_queue')
-                if data:
-                    text, _ = await generate_trade_message_with_insights(data)
-                    # Send the data to Telegram group
-                    await bot.send_message(
-                        chat_id=group_chat_id,
-                        text=text,
-                        parse_mode=ParseMode.HTML,
-                        disable_web_page_preview=True,
-                    )
-            elif group_chat_id == config.midas_group_chat_id:
-                data = redis_client.get_item('midas_trade_queue')
-                if data:
-                    text, _ = await generate_trade_message_with_insights(data)
-                    # Send the data to Telegram group
-                    await bot.send_message(
-                        chat_id=group_chat_id,
-                        text=text,
-                        parse_mode=ParseMode.HTML,
-                        disable_web_page_preview=True,
-                    )
-            elif group_chat_id in config.signalplus_group_chat_ids:
-                data = redis_client.get_item('signalplus_trade_queue')
-                if data:
-                    text, _ = await generate_trade_message_with_insights(data)
-                    for chat_id in config.signalplus_group_chat_ids:
-                        # Send the data to Telegram group
-                        await bot.send_message(
-                            chat_id=chat_id,
-                            text=text,
-                            parse_mode=ParseMode.HTML,
-                            disable_web_page_preview=True,
-                        )
-            elif group_chat_id == config.playground_group_chat_id:
-                data = redis_client.get_item('playground_trade_queue')
-                if data:
-                    text, _ = await generate_trade_message_with_insights(data)
-                    # Send the data to Telegram group
-                    await bot.send_message(
-                        chat_id=group_chat_id,
-                        text=text,
-                        parse_mode=ParseMode.HTML,
-                        disable_web_page_preview=True,
-                    )
-            elif group_chat_id == config.galaxy_group_chat_id:
-                data = redis_client.get_item('galaxy_trade_queue')
-                if data:
-                    text, _ = await generate_trade_message_with_insights(data)
-                    # Send the data to Telegram group
-                    await bot.send_message(
-                        chat_id=group_chat_id,
-                        text=text,
-                        parse_mode=ParseMode.HTML,
-                        disable_web_page_preview=True,
-                    )
-            elif group_chat_id == config.astron_group_chat_id:
-                data = redis_client.get_item('astron_trade_queue')
-                if data:
-                    text, _ = await generate_trade_message_with_insights(data)
-                    # Send the data to Telegram group
-                    await bot.send_message(
-                        chat_id=group_chat_id,
-                        text=text,
-                        parse_mode=ParseMode.HTML,
-                        disable_web_page_preview=True,
-                    )
-            elif group_chat_id == config.fbg_group_chat_id:
-                data = redis_client.get_item('fbg_trade_queue')
-                if data:
-                    text, _ = await generate_trade_message_with_insights(data)
-                    # Send the data to Telegram group
-                    try:
-                        await bot.send_message(
-                            chat_id=group_chat_id,
-                            text=text,
-                            parse_mode=ParseMode.HTML,
-                            disable_web_page_preview=True,
-                        )
-                    except Exception as e:
-                        logger.error(f"Failed to send message to fbg group {group_chat_id}: {e}")
-                    for chat_id in config.default_blocktrade_group_chat_ids:
-                        # Send the data to Telegram group
-                        try:
-                            await bot.send_message(
-                                chat_id=chat_id,
-                                text=text,
-                                parse_mode=ParseMode.HTML,
-                                disable_web_page_preview=True,
-                            )
-                        except Exception as e:
-                            logger.error(f"Failed to send message to default group {chat_id}: {e}")
+            # with several replicas only the one the group is sharded to pops its queue
+            if cluster is None or cluster.owns(group_chat_id):
+                with supervisor.delivering():
+                    await push_trade(group_chat_id)
         except Exception as e:
             logger.error(f"Error6: {e}")
             continue
@@ -1122,7 +1069,7 @@ async def push_trade_to_telegram(group_chat_id):
 # generate a message with trade data
 def generate_trade_message(data):
     direction = data["direction"].upper()
-    callOrPut = data["symbol"].split("-")[-1]
+    callOrPut = parse_instrument(data["symbol"]).option_type
     currency = data["currency"]
     # 根据direction和callOrPut判断strategy是"LONG CALL","SHORT CALL","LONG PUT"还是"SHORT PUT"
     if direction == "BUY":
@@ -1195,6 +1142,7 @@ def generate_trade_message(data):
 
 async def generate_trade_message_with_insights(data):
     """Generate trade message with AI insights for significant trades"""
+    started = time.time()
     text, strategy_name = generate_trade_message(data)
     
     # Add insights for significant trades
@@ -1205,9 +1153,12 @@ async def generate_trade_message_with_insights(data):
             premium = float(data["price"]) * size
             index_price = float(data["index_price"]) if data.get("index_price") else 0
             
+            insights_started = time.time()
             insights = await insights_generator.generate_trade_insights(
                 strategy_name, [data], currency, size, premium, index_price
             )
+            if insights_generator.enabled:
+                metrics.stage(data, "insights", insights_started)
             if insights:
                 # Insert insights before the source/tag section
                 parts = text.rsplit('\n\n', 1)
@@ -1218,6 +1169,7 @@ async def generate_trade_message_with_insights(data):
         except Exception as e:
             logger.error(f"Failed to generate insights for single trade: {e}")
     
+    metrics.stage(data, "render", started)
     return text, strategy_name
 
 
@@ -1230,7 +1182,8 @@ async def push_trade_to_signalplus(strategy_name, trades):
         "accessKey": config.signalplus_push_trade_key,
         "secretKey": config.signalplus_push_trade_secret,
         "strategy_name": strategy_name,
-        "trades": trades
+        # the latency trace is internal to the bot
+        "trades": [{key: value for key, value in trade.items() if key != "trace"} for trade in trades]
     }
 
     try:
@@ -1246,27 +1199,62 @@ async def push_trade_to_signalplus(strategy_name, trades):
 
 
 
+async def main():
+    loop = asyncio.get_running_loop()
+    stop = asyncio.Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, stop.set)
+
+    # TODO paradigm trade timestamp
+    # supervisor.start("fetch_paradigm_trade_timestamp", fetch_paradigm_trade_timestamp)
+    # ingestion, routing, block trades and the flow snapshot run once per cluster, on the leader
+    ingestion = [
+        ("fetch_deribit_data_all", fetch_deribit_data_all),
+        ("fetch_okx_data_all", fetch_okx_data_all),
+        ("fetch_bybit_data_all", fetch_bybit_data_all),
+        ("handle_trade_data", handle_trade_data),
+        ("push_block_trade_to_telegram", push_block_trade_to_telegram),
+        ("publish_flow_snapshot", publish_flow_snapshot),
+    ]
+    for name, coroutine_function in ingestion:
+        if cluster is None:
+            supervisor.start(name, coroutine_function)
+        else:
+            cluster.lead(name, coroutine_function)
+    if cluster is not None:
+        supervisor.start("cluster", cluster.run)
+    groups = [
+        ("main", config.group_chat_id),
+        ("breavan", config.breavan_horward_group_chat_id),
+        ("midas", config.midas_group_chat_id),
+        ("fbg", config.fbg_group_chat_id),
+        ("galaxy", config.galaxy_group_chat_id),
+        ("astron", config.astron_group_chat_id),
+        ("signalplus", config.signalplus_group_chat_ids[0]),
+        ("playground", config.playground_group_chat_id),
+    ]
+    for name, group_chat_id in groups:
+        supervisor.start(f"push_trade_to_telegram:{name}", functools.partial(push_trade_to_telegram, group_chat_id))
+    supervisor.start("flush_trade_archive", flush_trade_archive)
+    supervisor.start("metrics_server", functools.partial(metrics.serve, config.metrics_host, config.metrics_port))
+    # supervisor.start("push_advertisement_to_groups", push_advertisement_to_groups)
+    loop_monitor.start(loop)
+
+    await stop.wait()
+    logger.error(f"Shutting down, waiting up to {config.shutdown_timeout}s for sends in flight")
+    await supervisor.stop(config.shutdown_timeout)
+    trade_archive.flush()
+
+
 def run_bot() -> None:
-    # Create two threads to fetch block trade data and send it to Telegram group by using asyncio
+    if config.uvloop:
+        try:
+            import uvloop
+            asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+        except ImportError:
+            logger.error("uvloop is not installed, running on the asyncio event loop")
     try:
-        loop = asyncio.get_event_loop()
-        # TODO paradigm trade timestamp
-        # loop.create_task(fetch_paradigm_trade_timestamp())
-        loop.create_task(fetch_deribit_data_all())
-        loop.create_task(fetch_okx_data_all())
-        loop.create_task(fetch_bybit_data_all())
-        loop.create_task(handle_trade_data())
-        loop.create_task(push_trade_to_telegram(config.group_chat_id))
-        loop.create_task(push_trade_to_telegram(config.breavan_horward_group_chat_id))
-        loop.create_task(push_trade_to_telegram(config.midas_group_chat_id))
-        loop.create_task(push_trade_to_telegram(config.fbg_group_chat_id))
-        loop.create_task(push_trade_to_telegram(config.galaxy_group_chat_id))
-        loop.create_task(push_trade_to_telegram(config.astron_group_chat_id))
-        loop.create_task(push_trade_to_telegram(config.signalplus_group_chat_ids[0]))
-        loop.create_task(push_trade_to_telegram(config.playground_group_chat_id))
-        loop.create_task(push_block_trade_to_telegram())
-        # loop.create_task(push_advertisement_to_groups())
-        loop.run_forever()
+        asyncio.run(main())
     except Exception as e:
         logger.error(e)
 
@@ -0,0 +1,75 @@
+import os
+import uuid
+import zlib
+import socket
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Several bot replicas can share one Redis. Ingestion (the venue fetchers, routing, block trade
+# delivery and the flow snapshot) runs only on the replica holding the leader lease, a Redis key
+# it renews every third of LEASE_TTL. The lease moves to another replica within LEASE_TTL of the
+# leader dying. The per-group delivery consumers run on every replica, but each group queue is
+# only popped by the replica its chat id hashes to among the live replicas, which heartbeat into
+# a sorted set. Leader tasks run under the bot's supervisor, so they are restarted like the rest.
+LEADER_LEASE = 'bot_leader'
+LEASE_TTL = 15
+
+
+class Cluster:
+    def __init__(self, redis_client, supervisor, replica_id=None, lease_ttl=LEASE_TTL):
+        self.redis_client = redis_client
+        self.supervisor = supervisor
+        self.replica_id = replica_id or f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+        self.lease_ttl = lease_ttl
+        # live replica ids in a stable order, this one included
+        self.replicas = [self.replica_id]
+        self.is_leader = False
+        self.leader_tasks = []
+        self.running = []
+
+    def lead(self, name, coroutine_function):
+        """Run coroutine_function() as task name only while this replica is the leader."""
+        self.leader_tasks.append((name, coroutine_function))
+
+    def owns(self, destination):
+        """Whether this replica delivers to destination: its crc32 over the live replicas picks one."""
+        replicas = self.replicas
+        return replicas[zlib.crc32(str(destination).encode()) % len(replicas)] == self.replica_id
+
+    def _start_leading(self):
+        logger.error(f"Replica {self.replica_id} is now the leader")
+        self.running = [self.supervisor.start(name, coroutine_function) for name, coroutine_function in self.leader_tasks]
+        self.is_leader = True
+
+    def _stop_leading(self):
+        logger.error(f"Replica {self.replica_id} is no longer the leader")
+        for task in self.running:
+            task.cancel()
+        self.running = []
+        self.is_leader = False
+
+    async def run(self):
+        try:
+            while True:
+                try:
+                    self.replicas = self.redis_client.heartbeat_replica(self.replica_id, self.lease_ttl) or [self.replica_id]
+                    leader = self.redis_client.acquire_lease(LEADER_LEASE, self.replica_id, self.lease_ttl)
+                except Exception as e:
+                    # a lease that cannot be renewed may already be someone else's
+                    logger.error(f"Cluster Error: {e}")
+                    leader = False
+                if leader and not self.is_leader:
+                    self._start_leading()
+                elif not leader and self.is_leader:
+                    self._stop_leading()
+                await asyncio.sleep(self.lease_ttl / 3)
+        finally:
+            if self.is_leader:
+                self._stop_leading()
+            try:
+                self.redis_client.release_lease(LEADER_LEASE, self.replica_id)
+                self.redis_client.remove_replica(self.replica_id)
+            except Exception as e:
+                logger.error(f"Cluster Error: {e}")
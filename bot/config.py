@@ -27,3 +27,16 @@ astron_group_chat_id = config_yaml["astron_group_chat_id"]
 default_group_chat_ids = config_yaml["default_group_chat_ids"]
 default_blocktrade_group_chat_ids = config_yaml["default_blocktrade_group_chat_ids"]
 openai_api_key = config_yaml.get("openai_api_key", "")
+trade_archive_dir = config_yaml.get("trade_archive_dir", str(config_dir.parent / "archive"))
+tape_dir = config_yaml.get("tape_dir", "")
+metrics_host = config_yaml.get("metrics_host", "0.0.0.0")
+metrics_port = config_yaml.get("metrics_port", 9100)
+loop_lag_threshold = config_yaml.get("loop_lag_threshold", 0.5)
+loop_profile_dir = config_yaml.get("loop_profile_dir", "")
+# run as one of several replicas sharing Redis, see cluster.py
+cluster = config_yaml.get("cluster", False)
+cluster_lease_ttl = config_yaml.get("cluster_lease_ttl", 15)
+# run on uvloop when it is installed
+uvloop = config_yaml.get("uvloop", False)
+# seconds a shutdown waits for sends in flight, inside docker's 10s stop grace period
+shutdown_timeout = config_yaml.get("shutdown_timeout", 8)
@@ -0,0 +1,130 @@
+import time
+import logging
+
+from instrument import parse_instrument
+
+logger = logging.getLogger(__name__)
+
+# window name: (span in seconds, number of ring buffer buckets)
+WINDOWS = {
+    "5m": (300, 30),
+    "1h": (3600, 60),
+    "24h": (86400, 96),
+}
+# premium and notional are in USD, premium/delta/vega are signed by the taker's direction
+METRICS = ("premium", "notional", "delta", "vega", "count")
+
+
+class RingWindow:
+    """Fixed-size ring of time buckets. add() is O(1), totals() is O(buckets)."""
+
+    __slots__ = ("width", "buckets", "epochs", "sums")
+
+    def __init__(self, span, buckets):
+        self.width = span / buckets
+        self.buckets = buckets
+        # epochs[i] is the bucket number (timestamp // width) currently stored in slot i
+        self.epochs = [-1] * buckets
+        self.sums = [[0.0] * len(METRICS) for _ in range(buckets)]
+
+    def add(self, ts, values):
+        epoch = int(ts // self.width)
+        slot = epoch % self.buckets
+        if self.epochs[slot] != epoch:
+            if self.epochs[slot] > epoch:
+                # older than the bucket the slot was recycled for, outside the window
+                return
+            self.epochs[slot] = epoch
+            self.sums[slot] = [0.0] * len(METRICS)
+        bucket = self.sums[slot]
+        for i, value in enumerate(values):
+            bucket[i] += value
+
+    def totals(self, now):
+        # buckets slightly ahead of now (exchange clock skew) still count
+        oldest = int(now // self.width) - self.buckets + 1
+        totals = [0.0] * len(METRICS)
+        for epoch, bucket in zip(self.epochs, self.sums):
+            if epoch >= oldest:
+                for i, value in enumerate(bucket):
+                    totals[i] += value
+        return totals
+
+
+class FlowAggregator:
+    """
+    Rolling options flow per currency, per (currency, expiry) and per (currency, strike).
+
+    Every dimension key keeps one RingWindow per entry of WINDOWS, so a trade costs a constant
+    number of bucket updates and a snapshot costs O(keys * buckets).
+    """
+
+    def __init__(self):
+        self.windows = {}
+
+    def _windows_for(self, key):
+        windows = self.windows.get(key)
+        if windows is None:
+            windows = {name: RingWindow(span, buckets) for name, (span, buckets) in WINDOWS.items()}
+            self.windows[key] = windows
+        return windows
+
+    def add_trade(self, trade):
+        instrument = parse_instrument(trade["symbol"])
+        if not instrument.is_option:
+            return
+        try:
+            ts = int(trade["timestamp"]) / 1000
+            sign = 1 if trade["direction"].upper() == "BUY" else -1
+            size = float(trade["size"])
+            index_price = float(trade["index_price"]) if trade.get("index_price") else 0
+            price = float(trade["price"])
+        except (KeyError, TypeError, ValueError) as e:
+            logger.error(f"Flow aggregator skipped trade {trade.get('trade_id')}: {e}")
+            return
+        # bybit quotes option prices in USD, deribit and okx in the underlying
+        price_usd = price if trade["source"].upper() == "BYBIT" else price * index_price
+        greeks = trade.get("greeks") or {}
+        values = (
+            sign * price_usd * size,
+            size * index_price,
+            sign * size * float(greeks.get("delta", 0)),
+            sign * size * float(greeks.get("vega", 0)),
+            1,
+        )
+        currency = instrument.currency
+        for key in (("currency", currency), ("expiry", currency, instrument.expiry_code), ("strike", currency, instrument.strike)):
+            for window in self._windows_for(key).values():
+                window.add(ts, values)
+
+    def snapshot(self, now=None):
+        """
+        Totals of every window as plain dicts, e.g.
+        {"ts": ..., "windows": {"1h": {"currency": {"BTC": {...}}, "expiry": {"BTC": {"28APR23": {...}}}, "strike": {...}}}}
+
+        Keys with no flow left in any window are dropped.
+        """
+        now = time.time() if now is None else now
+        result = {name: {"currency": {}, "expiry": {}, "strike": {}} for name in WINDOWS}
+        stale = []
+        for key, windows in self.windows.items():
+            empty = True
+            for name, window in windows.items():
+                totals = window.totals(now)
+                if not totals[METRICS.index("count")]:
+                    continue
+                empty = False
+                metrics = dict(zip(METRICS, totals))
+                if key[0] == "currency":
+                    result[name]["currency"][key[1]] = metrics
+                else:
+                    result[name][key[0]].setdefault(key[1], {})[str(key[2])] = metrics
+            if empty:
+                stale.append(key)
+        for key in stale:
+            del self.windows[key]
+        return {"ts": int(now), "windows": result}
+
+
+# Global instance
+flow_aggregator = FlowAggregator()
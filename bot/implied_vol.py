@@ -0,0 +1,93 @@
+import numpy as np
+
+import black76
+
+# search range of the solver, vols outside it are reported as NaN
+MIN_VOL = 1e-4
+MAX_VOL = 10.0
+
+
+def _brent(f, a, b, tol, max_iterations=100):
+    # Brent's method on a bracket [a, b] with f(a), f(b) of opposite signs
+    fa, fb = f(a), f(b)
+    if fa * fb > 0:
+        return np.nan
+    if abs(fa) < abs(fb):
+        a, b, fa, fb = b, a, fb, fa
+    c, fc, d, bisected = a, fa, a, True
+    for _ in range(max_iterations):
+        if fb == 0 or abs(b - a) < tol:
+            return b
+        if fa != fc and fb != fc:
+            s = (a * fb * fc / ((fa - fb) * (fa - fc)) + b * fa * fc / ((fb - fa) * (fb - fc))
+                 + c * fa * fb / ((fc - fa) * (fc - fb)))
+        else:
+            s = b - fb * (b - a) / (fb - fa)
+        if (not (3 * a + b) / 4 < s < b and not b < s < (3 * a + b) / 4) \
+                or (bisected and abs(s - b) >= abs(b - c) / 2) \
+                or (not bisected and abs(s - b) >= abs(c - d) / 2):
+            s, bisected = (a + b) / 2, True
+        else:
+            bisected = False
+        fs = f(s)
+        d, c, fc = c, b, fb
+        if fa * fs < 0:
+            b, fb = s, fs
+        else:
+            a, fa = s, fs
+        if abs(fa) < abs(fb):
+            a, b, fa, fb = b, a, fb, fa
+    return b
+
+
+def implied_vol(price, forward, strike, t, is_call, rate=0.0, tol=1e-10, max_iterations=40):
+    """
+    Black-76 implied vols of a batch of option prices.
+
+    Every option runs a safeguarded Newton iteration at once: each step keeps a bracket of the
+    root and falls back to bisecting it whenever the Newton step would leave the bracket. The
+    few options still unconverged after max_iterations are finished by Brent's method one by one.
+
+    Args:
+        price: option prices in the currency of the forward
+        forward, strike, t, is_call, rate: as in black76.price
+        tol: price tolerance as a fraction of the forward
+
+    Returns:
+        Array of vols as decimals, NaN where the price is outside the no-arbitrage bounds or
+        the vol outside [MIN_VOL, MAX_VOL]
+    """
+    price, forward, strike, t, is_call = np.broadcast_arrays(
+        *(np.asarray(a, dtype=float) for a in (price, forward, strike, t)), np.asarray(is_call, dtype=bool))
+    t = np.maximum(t, black76.MIN_TIME)
+    discount = np.exp(-rate * t)
+    intrinsic = discount * np.maximum(np.where(is_call, forward - strike, strike - forward), 0.0)
+    upper = discount * np.where(is_call, forward, strike)
+    valid = (price > intrinsic) & (price < upper)
+
+    low = np.full(price.shape, MIN_VOL)
+    high = np.full(price.shape, MAX_VOL)
+    valid &= (black76.price(forward, strike, t, low, is_call, rate) <= price) \
+        & (black76.price(forward, strike, t, high, is_call, rate) >= price)
+    # the vol whose straddle-free moneyness term matches the log-moneyness, or the ATM approximation
+    vol = np.maximum(np.sqrt(2 * np.abs(np.log(forward / strike)) / t), np.sqrt(2 * np.pi / t) * price / forward)
+    vol = np.clip(vol, 0.05, 2.0)
+    converged = ~valid
+    for _ in range(max_iterations):
+        difference = black76.price(forward, strike, t, vol, is_call, rate) - price
+        converged |= np.abs(difference) < tol * forward
+        if converged.all():
+            break
+        high = np.where(difference > 0, vol, high)
+        low = np.where(difference > 0, low, vol)
+        vega = black76.greeks(forward, strike, t, vol, is_call, rate)["vega"] * 100
+        with np.errstate(divide="ignore", invalid="ignore"):
+            step = vol - difference / vega
+        step = np.where(np.isfinite(step) & (step > low) & (step < high), step, (low + high) / 2)
+        vol = np.where(converged, vol, step)
+
+    for i in np.flatnonzero(~converged):
+        index = np.unravel_index(i, price.shape)
+        f = lambda v: float(black76.price(forward[index], strike[index], t[index], v, is_call[index], rate)) - price[index]
+        vol[index] = _brent(f, low[index], high[index], tol * forward[index])
+    return np.where(valid, vol, np.nan)
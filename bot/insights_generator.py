@@ -4,6 +4,8 @@ import math
 from typing import List, Dict, Optional, Tuple
 from datetime import datetime
 import config
+from instrument import parse_expiry
+from payoff import payoff_profile
 
 logger = logging.getLogger(__name__)
 
@@ -286,9 +288,8 @@ Avoid:
                 
                 # Calculate DTE (Days to Expiry) for closest expiry
                 try:
-                    from datetime import datetime
-                    closest_expiry = min(unique_expiries)
-                    expiry_date = datetime.strptime(closest_expiry, "%d%b%y")
+                    closest_expiry = min(parse_expiry(expiry) for expiry in unique_expiries)
+                    expiry_date = datetime.combine(closest_expiry, datetime.min.time())
                     current_date = datetime.now()
                     dte = (expiry_date - current_date).days
                     context_parts.append(f"Days to Closest Expiry: {dte}")
@@ -331,109 +332,31 @@ Avoid:
             premium: Net premium paid/received
             
         Returns:
-            Tuple of (max_gain, max_loss) in currency units, None if cannot calculate
+            Tuple of (max_gain, max_loss) in currency units, None if cannot calculate or unlimited
         """
         if not trades or len(trades) == 0:
             return None, None
             
         try:
-            # Get strikes and option types
-            legs = []
+            # Get strikes, option types and signed sizes
+            strikes = []
+            is_call = []
+            quantities = []
             for trade in trades:
                 if not all(key in trade and trade[key] is not None for key in ['strike', 'callOrPut', 'direction', 'size']):
                     continue
-                    
-                legs.append({
-                    'strike': float(trade['strike']),
-                    'option_type': trade['callOrPut'],  # 'C' or 'P'
-                    'direction': trade['direction'].upper(),  # 'BUY' or 'SELL'
-                    'size': abs(float(trade['size'])),
-                    'multiplier': 1 if trade['direction'].upper() == 'BUY' else -1
-                })
-            
-            if not legs:
-                return None, None
+                strikes.append(float(trade['strike']))
+                is_call.append(trade['callOrPut'] == 'C')
+                multiplier = 1 if trade['direction'].upper() == 'BUY' else -1
+                quantities.append(multiplier * abs(float(trade['size'])))
             
-            # Check if strategy has unlimited profit/loss potential
-            has_unlimited_gain = False
-            has_unlimited_loss = False
-            
-            # Analyze legs for unlimited potential
-            net_call_multiplier = 0
-            net_put_multiplier = 0
+            if not strikes:
+                return None, None
             
-            for leg in legs:
-                if leg['option_type'] == 'C':
-                    net_call_multiplier += leg['multiplier'] * leg['size']
-                else:
-                    net_put_multiplier += leg['multiplier'] * leg['size']
-            
-            # Long calls (net positive call exposure) have unlimited upside
-            if net_call_multiplier > 0:
-                has_unlimited_gain = True
-            # Short calls (net negative call exposure) have unlimited downside  
-            elif net_call_multiplier < 0:
-                has_unlimited_loss = True
-            
-            # Long puts have limited gain (strike - premium), not unlimited
-            # Short puts have limited loss (strike + premium), not unlimited
-            
-            if has_unlimited_gain or has_unlimited_loss:
-                # For unlimited strategies, still calculate breakeven and limited side
-                min_strike = min(leg['strike'] for leg in legs)
-                max_strike = max(leg['strike'] for leg in legs)
-                
-                # Calculate limited profit/loss at key points
-                test_prices = [0.01, min_strike * 0.5, min_strike, (min_strike + max_strike) / 2, max_strike, max_strike * 1.5]
-                payoffs = []
-                
-                for spot_price in test_prices:
-                    total_payoff = -premium
-                    for leg in legs:
-                        if leg['option_type'] == 'C':
-                            intrinsic = max(0, spot_price - leg['strike'])
-                        else:
-                            intrinsic = max(0, leg['strike'] - spot_price)
-                        leg_payoff = leg['multiplier'] * leg['size'] * intrinsic
-                        total_payoff += leg_payoff
-                    payoffs.append(total_payoff)
-                
-                if has_unlimited_gain:
-                    max_gain = None  # Unlimited
-                    max_loss = min(payoffs)
-                else:  # has_unlimited_loss
-                    max_gain = max(payoffs)
-                    max_loss = None  # Unlimited
-            else:
-                # For strategies with limited profit/loss, use comprehensive range
-                min_strike = min(leg['strike'] for leg in legs)
-                max_strike = max(leg['strike'] for leg in legs)
-                
-                price_range = []
-                step = (max_strike - min_strike) / 50 if max_strike > min_strike else max_strike * 0.02
-                start_price = max(0.01, min_strike - max_strike * 0.2)
-                end_price = max_strike * 1.5
-                
-                current = start_price
-                while current <= end_price:
-                    price_range.append(current)
-                    current += step
-                
-                payoffs = []
-                for spot_price in price_range:
-                    total_payoff = -premium
-                    for leg in legs:
-                        if leg['option_type'] == 'C':
-                            intrinsic = max(0, spot_price - leg['strike'])
-                        else:
-                            intrinsic = max(0, leg['strike'] - spot_price)
-                        leg_payoff = leg['multiplier'] * leg['size'] * intrinsic
-                        total_payoff += leg_payoff
-                    payoffs.append(total_payoff)
-                
-                max_gain = max(payoffs) if payoffs else None
-                max_loss = min(payoffs) if payoffs else None
-                
+            # Exact extremes of the piecewise linear expiry payoff, infinite when unbounded
+            profile = payoff_profile(strikes, is_call, quantities, premium)
+            max_gain = None if math.isinf(profile.max_gain) else profile.max_gain
+            max_loss = None if math.isinf(profile.max_loss) else profile.max_loss
             return max_gain, max_loss
             
         except Exception as e:
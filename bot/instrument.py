@@ -0,0 +1,87 @@
+from datetime import date
+from functools import lru_cache
+
+MONTHS = {
+    "JAN": 1, "FEB": 2, "MAR": 3, "APR": 4, "MAY": 5, "JUN": 6,
+    "JUL": 7, "AUG": 8, "SEP": 9, "OCT": 10, "NOV": 11, "DEC": 12,
+}
+
+# settlement currency suffixes bybit appends to some option symbols, e.g. "BTC-24MAR23-26000-P-USDT"
+SETTLEMENT_SUFFIXES = ("USDT", "USDC")
+
+
+class Instrument:
+    """Parsed exchange symbol. kind is one of "option", "future", "perpetual" or "unknown"."""
+
+    __slots__ = ("symbol", "currency", "expiry", "expiry_code", "strike", "option_type", "kind")
+
+    def __init__(self, symbol, currency, expiry=None, expiry_code=None, strike=None, option_type=None, kind="unknown"):
+        self.symbol = symbol
+        self.currency = currency
+        # expiry is a datetime.date, expiry_code the token as written in the symbol ("28APR23", "230428")
+        self.expiry = expiry
+        self.expiry_code = expiry_code
+        self.strike = strike
+        self.option_type = option_type
+        self.kind = kind
+
+    @property
+    def is_option(self):
+        return self.kind == "option"
+
+    def __repr__(self):
+        return f"Instrument({self.symbol!r}, kind={self.kind!r})"
+
+
+@lru_cache(maxsize=4096)
+def parse_expiry(code):
+    """Parse a deribit/bybit ("28APR23", "7APR23") or okx ("230428") expiry code, None if it is not one."""
+    try:
+        if code.isdigit() and len(code) == 6:
+            return date(2000 + int(code[:2]), int(code[2:4]), int(code[4:]))
+        month = MONTHS.get(code[-5:-2])
+        if month is None or not code[:-5].isdigit() or not code[-2:].isdigit():
+            return None
+        return date(2000 + int(code[-2:]), month, int(code[:-5]))
+    except ValueError:
+        return None
+
+
+def parse_strike(value):
+    # deribit writes decimal strikes with a "d", e.g. "0d625"
+    strike = float(value.replace("d", "."))
+    return int(strike) if strike.is_integer() else strike
+
+
+@lru_cache(maxsize=4096)
+def parse_instrument(symbol):
+    """
+    Parse a symbol from any of the supported venues:
+
+    deribit/bybit: BTC-28APR23-30000-C, BTC-28APR23, BTC-PERPETUAL
+    okx: BTC-USD-230428-30000-C, BTC-USD-230428, BTC-USD-SWAP
+    """
+    parts = symbol.split("-")
+    if parts[-1] in SETTLEMENT_SUFFIXES and len(parts) > 2:
+        parts = parts[:-1]
+    currency = parts[0]
+    # okx symbols carry the quote currency as the second token
+    if len(parts) > 2 and parts[1] in ("USD", "USDT", "USDC") and parse_expiry(parts[1]) is None:
+        parts = [currency] + parts[2:]
+
+    if len(parts) == 4 and parts[3] in ("C", "P"):
+        expiry = parse_expiry(parts[1])
+        if expiry is not None:
+            try:
+                strike = parse_strike(parts[2])
+            except ValueError:
+                return Instrument(symbol, currency)
+            return Instrument(symbol, currency, expiry, parts[1], strike, parts[3], "option")
+    elif len(parts) == 2:
+        if parts[1] in ("PERPETUAL", "SWAP"):
+            return Instrument(symbol, currency, kind="perpetual")
+        expiry = parse_expiry(parts[1])
+        if expiry is not None:
+            return Instrument(symbol, currency, expiry, parts[1], kind="future")
+
+    return Instrument(symbol, currency)
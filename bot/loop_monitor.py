@@ -0,0 +1,104 @@
+import os
+import sys
+import time
+import asyncio
+import logging
+import threading
+from collections import Counter, deque
+
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+def _folded_stack(frame):
+    # "outer (file.py:12);inner (file.py:34)", the collapsed format flame graph tools read
+    names = []
+    while frame is not None:
+        names.append(f"{frame.f_code.co_name} ({os.path.basename(frame.f_code.co_filename)}:{frame.f_lineno})")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class LoopMonitor:
+    """
+    Measures event loop lag and attributes stalls to the task that blocked the loop.
+
+    A coroutine sleeps for `interval` and records how late it wakes up. A watchdog thread checks
+    that the coroutine keeps waking up; once the loop has been stuck for longer than `threshold`
+    it notes the running task (by the name given to create_task) and, when profile_dir is set,
+    samples the loop thread's stack until the loop recovers. The stall is then recorded against
+    that task and the sampled stacks are written to profile_dir in folded format.
+    """
+
+    def __init__(self, interval=0.1, threshold=0.5, profile_dir="", sample_interval=0.01, window=600):
+        self.interval = interval
+        self.threshold = threshold
+        self.profile_dir = profile_dir
+        self.sample_interval = sample_interval
+        self.lags = deque(maxlen=window)
+        self.loop = None
+        self.thread_id = None
+        self.last_tick = time.monotonic()
+        # stall state, written by the watchdog thread and taken by the loop coroutine
+        self.lock = threading.Lock()
+        self.stalled_task = None
+        self.stacks = Counter()
+
+    def start(self, loop):
+        self.loop = loop
+        loop.create_task(self._measure(), name="loop_monitor")
+        threading.Thread(target=self._watch, name="loop_monitor", daemon=True).start()
+
+    async def _measure(self):
+        self.thread_id = threading.get_ident()
+        while True:
+            started = self.loop.time()
+            self.last_tick = time.monotonic()
+            await asyncio.sleep(self.interval)
+            lag = max(self.loop.time() - started - self.interval, 0.0)
+            self.last_tick = time.monotonic()
+            self.lags.append(lag)
+            metrics.observe("event_loop_lag_seconds", lag)
+            if len(self.lags) % 10 == 0:
+                lags = sorted(self.lags)
+                metrics.set("event_loop_lag_quantile_seconds", lags[len(lags) // 2], quantile="0.5")
+                metrics.set("event_loop_lag_quantile_seconds", lags[min(len(lags) - 1, int(len(lags) * 0.99))], quantile="0.99")
+            if lag > self.threshold:
+                self._stalled(lag)
+
+    def _stalled(self, lag):
+        with self.lock:
+            task, self.stalled_task = self.stalled_task or "unknown", None
+            stacks, self.stacks = self.stacks, Counter()
+        metrics.observe("event_loop_stall_seconds", lag, task=task)
+        logger.warning(f"Event loop blocked for {lag:.3f}s by task {task}")
+        if self.profile_dir and stacks:
+            try:
+                os.makedirs(self.profile_dir, exist_ok=True)
+                path = os.path.join(self.profile_dir, f"stall-{int(time.time())}-{task}.folded")
+                with open(path, "w") as f:
+                    for stack, count in stacks.most_common():
+                        f.write(f"{stack} {count}\n")
+            except Exception as e:
+                logger.error(f"Failed to write stall profile: {e}")
+
+    def _watch(self):
+        while True:
+            time.sleep(self.sample_interval)
+            if self.thread_id is None:
+                continue
+            # how long the loop has been past the moment the monitor coroutine was due to wake
+            blocked = time.monotonic() - self.last_tick - self.interval
+            if blocked <= self.threshold:
+                continue
+            try:
+                task = asyncio.current_task(self.loop)
+                frame = sys._current_frames().get(self.thread_id)
+                with self.lock:
+                    if self.stalled_task is None:
+                        self.stalled_task = task.get_name() if task is not None else "callback"
+                    if self.profile_dir and frame is not None:
+                        self.stacks[_folded_stack(frame)] += 1
+            except Exception as e:
+                logger.error(f"Loop monitor sampling failed: {e}")
@@ -0,0 +1,157 @@
+import time
+import asyncio
+import bisect
+import logging
+
+logger = logging.getLogger(__name__)
+
+# upper bounds in seconds shared by every histogram, wide enough for a 60s poll plus queue waits
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+HELP = {
+    "trade_stage_seconds": "Time a trade spent in each pipeline stage: fetch (exchange timestamp to normalised), "
+                           "enqueue (waiting in Redis for the router or block consumer), route (waiting in a group queue), "
+                           "render (message formatting, insights included) and insights (OpenAI call).",
+    "trade_send_seconds": "Duration of the Telegram send call per destination.",
+    "trade_alert_latency_seconds": "Exchange timestamp to Telegram delivery per destination.",
+    "event_loop_lag_seconds": "Delay of the event loop waking a periodic timer.",
+    "event_loop_lag_quantile_seconds": "Event loop lag quantiles over the recent samples.",
+    "event_loop_stall_seconds": "Event loop stalls above the threshold, by the task that was running.",
+    "task_restarts": "Times the supervisor restarted each task after it crashed or returned.",
+}
+
+
+class Histogram:
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        index = bisect.bisect_left(BUCKETS, value)
+        if index < len(BUCKETS):
+            self.counts[index] += 1
+        self.sum += value
+        self.count += 1
+
+
+def _labels(labels, **extra):
+    pairs = list(labels) + list(extra.items())
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in pairs) + "}"
+
+
+class Metrics:
+    """
+    Latency histograms in the Prometheus text format, plus the per-trade trace they are fed from.
+
+    A trade's trace is a dict of wall clock stamps stored on the trade itself under "trace", so it
+    survives the trip through the Redis queues. Spans are recorded as the trade reaches each stage.
+    """
+
+    def __init__(self):
+        # name -> {((label, value), ...): Histogram}
+        self.histograms = {}
+        # name -> {((label, value), ...): float}
+        self.gauges = {}
+
+    def observe(self, name, value, **labels):
+        series = self.histograms.setdefault(name, {})
+        key = tuple(labels.items())
+        histogram = series.get(key)
+        if histogram is None:
+            histogram = series[key] = Histogram()
+        histogram.observe(max(value, 0.0))
+
+    def set(self, name, value, **labels):
+        self.gauges.setdefault(name, {})[tuple(labels.items())] = value
+
+    def start_trace(self, trade):
+        """Stamp a freshly normalised trade and record how long after its exchange timestamp it was fetched."""
+        now = time.time()
+        trade["trace"] = {"fetched": now}
+        try:
+            self.observe("trade_stage_seconds", now - int(trade["timestamp"]) / 1000, venue=trade["source"], stage="fetch")
+        except (KeyError, TypeError, ValueError):
+            pass
+
+    def trace(self, trade, stage, since, stamp=None):
+        """Record the time since the trace stamp `since` as stage, then optionally stamp `stamp` now."""
+        trace = trade.get("trace")
+        if trace is None:
+            return
+        now = time.time()
+        if since in trace:
+            self.observe("trade_stage_seconds", now - trace[since], venue=trade["source"], stage=stage)
+        if stamp is not None:
+            trace[stamp] = now
+
+    def stage(self, trade, stage, started):
+        """Record a stage of a trade that began at the wall clock time `started` and ends now."""
+        self.observe("trade_stage_seconds", time.time() - started, venue=trade["source"], stage=stage)
+
+    def sent(self, trade, destination, started):
+        """Record a delivered alert: the send call that began at `started` and the latency from the exchange."""
+        now = time.time()
+        venue = trade["source"]
+        self.observe("trade_send_seconds", now - started, venue=venue, destination=destination)
+        try:
+            self.observe("trade_alert_latency_seconds", now - int(trade["timestamp"]) / 1000, venue=venue, destination=destination)
+        except (KeyError, TypeError, ValueError):
+            pass
+
+    def render(self):
+        lines = []
+        for name, series in sorted(self.histograms.items()):
+            if name in HELP:
+                lines.append(f"# HELP {name} {HELP[name]}")
+            lines.append(f"# TYPE {name} histogram")
+            for labels, histogram in series.items():
+                cumulative = 0
+                for bound, count in zip(BUCKETS, histogram.counts):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{_labels(labels, le=bound)} {cumulative}")
+                lines.append(f"{name}_bucket{_labels(labels, le='+Inf')} {histogram.count}")
+                lines.append(f"{name}_sum{_labels(labels)} {histogram.sum}")
+                lines.append(f"{name}_count{_labels(labels)} {histogram.count}")
+        for name, series in sorted(self.gauges.items()):
+            if name in HELP:
+                lines.append(f"# HELP {name} {HELP[name]}")
+            lines.append(f"# TYPE {name} gauge")
+            for labels, value in series.items():
+                lines.append(f"{name}{_labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+    async def _handle(self, reader, writer):
+        try:
+            request = await reader.readline()
+            # drain the headers, the request line is all that matters
+            while (await reader.readline()).strip():
+                pass
+            parts = request.decode("latin-1").split()
+            if len(parts) >= 2 and parts[0] == "GET" and parts[1].split("?")[0] == "/metrics":
+                status, body = "200 OK", self.render().encode()
+            else:
+                status, body = "404 Not Found", b"not found\n"
+            writer.write(
+                f"HTTP/1.1 {status}\r\nContent-Type: text/plain; version=0.0.4\r\n"
+                f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body
+            )
+            await writer.drain()
+        except Exception as e:
+            logger.error(f"Metrics request failed: {e}")
+        finally:
+            writer.close()
+
+    async def serve(self, host, port):
+        """Serve GET /metrics until cancelled."""
+        server = await asyncio.start_server(self._handle, host, port)
+        async with server:
+            await server.serve_forever()
+
+
+# Global instance
+metrics = Metrics()
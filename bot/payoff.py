@@ -0,0 +1,72 @@
+from collections import namedtuple
+
+import numpy as np
+
+# max_gain/max_loss are the extreme expiry P&L values, +inf/-inf when that side is unbounded.
+# breakevens is a sorted array of underlying prices where the expiry P&L crosses zero.
+PayoffProfile = namedtuple("PayoffProfile", ["max_gain", "max_loss", "breakevens"])
+
+
+def expiry_pnl(spots, strikes, is_call, quantities, premium=0.0):
+    """
+    Expiry P&L of option structures at the given underlying prices.
+
+    Args:
+        spots: underlying prices, shape (..., M)
+        strikes, is_call, quantities: legs, shape (..., N). quantities are signed, positive when bought.
+            Pad structures with fewer legs with a quantity of 0.
+        premium: net premium paid, shape (...) or scalar, subtracted from every value
+
+    Returns:
+        Array of shape (..., M)
+    """
+    spots = np.asarray(spots, dtype=float)[..., :, None]
+    strikes = np.asarray(strikes, dtype=float)[..., None, :]
+    is_call = np.asarray(is_call, dtype=bool)[..., None, :]
+    quantities = np.asarray(quantities, dtype=float)[..., None, :]
+    intrinsic = np.where(is_call, np.maximum(spots - strikes, 0.0), np.maximum(strikes - spots, 0.0))
+    return (intrinsic * quantities).sum(axis=-1) - np.asarray(premium, dtype=float)[..., None]
+
+
+def payoff_profile(strikes, is_call, quantities, premium=0.0):
+    """
+    Exact max gain, max loss and breakevens of option structures held to expiry.
+
+    Expiry P&L is piecewise linear in the underlying with kinks only at the strikes, so its
+    extremes are at a kink, at a zero underlying or in the tail above the highest strike, whose
+    slope is the net call quantity. Accepts a single structure (legs of shape (N,)) or a batch
+    (legs of shape (B, N), premium of shape (B,)).
+    """
+    strikes = np.asarray(strikes, dtype=float)
+    is_call = np.asarray(is_call, dtype=bool)
+    quantities = np.asarray(quantities, dtype=float)
+    single = strikes.ndim == 1
+    if single:
+        strikes, is_call, quantities = strikes[None, :], is_call[None, :], quantities[None, :]
+    premium = np.broadcast_to(np.asarray(premium, dtype=float), strikes.shape[:1])
+
+    # breakpoints: a zero underlying then every strike in ascending order
+    breakpoints = np.concatenate([np.zeros((strikes.shape[0], 1)), np.sort(strikes, axis=1)], axis=1)
+    values = expiry_pnl(breakpoints, strikes, is_call, quantities, premium)
+    right_slope = np.where(is_call, quantities, 0.0).sum(axis=1)
+
+    max_gain = values.max(axis=1)
+    max_loss = values.min(axis=1)
+    max_gain = np.where(right_slope > 0, np.inf, max_gain)
+    max_loss = np.where(right_slope < 0, -np.inf, max_loss)
+
+    # breakevens: linear roots inside each segment whose endpoint values change sign,
+    # kinks sitting exactly on zero, and the root of the right tail
+    x0, x1 = breakpoints[:, :-1], breakpoints[:, 1:]
+    v0, v1 = values[:, :-1], values[:, 1:]
+    crossing = (v0 * v1 < 0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        roots = np.where(crossing, x0 - v0 * (x1 - x0) / (v1 - v0), np.nan)
+        tail_root = np.where(values[:, -1] * right_slope < 0, breakpoints[:, -1] - values[:, -1] / right_slope, np.nan)
+    on_kink = np.where(values == 0, breakpoints, np.nan)
+    candidates = np.concatenate([roots, on_kink, tail_root[:, None]], axis=1)
+    breakevens = [np.unique(row[~np.isnan(row)]) for row in candidates]
+
+    if single:
+        return PayoffProfile(float(max_gain[0]), float(max_loss[0]), breakevens[0])
+    return PayoffProfile(max_gain, max_loss, breakevens)
@@ -0,0 +1,51 @@
+import time
+import logging
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+# The bot records the deribit index price carried by the newest trade of every poll in the
+# index_price Redis hash, so the cron jobs and formatters read current prices in one call. An
+# external quote is only fetched, and stored in its place, for currencies whose entry is stale.
+COINGECKO_PRICE_API = "https://api.coingecko.com/api/v3/simple/price"
+COINGECKO_IDS = {"BTC": "bitcoin", "ETH": "ethereum"}
+# the bot polls deribit every few seconds and both currencies trade around the clock, an entry this
+# old means the bot is down
+MAX_AGE = 10 * 60
+
+
+def record_trades(redis_client, currency, trades):
+    """Store the index price of the newest of a currency's deribit trades."""
+    if not trades:
+        return
+    latest = max(trades, key=lambda trade: trade["timestamp"])
+    redis_client.put_index_price(currency, latest["index_price"], latest["timestamp"] / 1000, "deribit")
+
+
+def fetch_external_prices(currencies):
+    response = requests.get(COINGECKO_PRICE_API, params={
+        "ids": ",".join(COINGECKO_IDS[currency] for currency in currencies),
+        "vs_currencies": "usd",
+    }, timeout=10)
+    prices = response.json()
+    return {currency: prices[COINGECKO_IDS[currency]]["usd"] for currency in currencies}
+
+
+def get_prices(redis_client, currencies=("BTC", "ETH"), max_age=MAX_AGE):
+    """
+    Latest USD index prices of currencies as {currency: price}, falling back to CoinGecko for
+    the ones not updated within max_age seconds. If that fails the stale prices are returned,
+    and a currency with no price at all is left out.
+    """
+    now = time.time()
+    entries = redis_client.get_index_prices(currencies)
+    stale = [currency for currency in currencies if currency not in entries or now - entries[currency]["ts"] > max_age]
+    if stale:
+        try:
+            for currency, price in fetch_external_prices(stale).items():
+                redis_client.put_index_price(currency, price, now, "coingecko")
+                entries[currency] = {"price": price, "ts": now, "source": "coingecko"}
+        except Exception as e:
+            logger.error(f"Error fetching external prices for {stale}: {e}")
+    return {currency: entries[currency]["price"] for currency in currencies if currency in entries}
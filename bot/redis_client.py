@@ -2,9 +2,31 @@ import redis
 import json
 import time
 
+# block trade volume is counted per instrument in buckets of this many seconds
+BLOCK_VOLUME_BUCKET = 600
+# buckets outlive the longest leaderboard window (24h) by an hour
+BLOCK_VOLUME_TTL = 25 * 60 * 60
+# vol surface snapshots are kept long enough for T-7 comparisons
+VOL_SURFACE_TTL = 8 * 24 * 60 * 60
+# rendered cron charts by content hash, a week covers the weekly and weekend repeats
+CHART_TTL = 7 * 24 * 60 * 60
+# a message claimed for a chat stays claimed long enough to outlast any redelivery of its trade
+SEND_CLAIM_TTL = 24 * 60 * 60
+
+
+# trade_set member of a normalised trade: okx trade ids are only unique per instrument, so the
+# timestamp is part of its key, and bybit exec ids are namespaced by the venue
+def trade_set_id(source, trade_id, timestamp=None):
+    if source == "okx":
+        return f"okx_{trade_id}_{timestamp}"
+    if source == "bybit":
+        return f"bybit_{trade_id}"
+    return trade_id
+
+
 class RedisClient:
-    def __init__(self):
-        self.client = redis.Redis(host='redis', port=6379, db=0)
+    def __init__(self, host='redis', port=6379, db=0):
+        self.client = redis.Redis(host=host, port=port, db=db)
 
     def put_trade(self, item, id):
         item_str = json.dumps(item)
@@ -94,3 +116,123 @@ class RedisClient:
 
     def is_paradigm_trade_timestamp_member(self, timestamp):
         return self.client.sismember('paradigm_trade_timestamp_set', timestamp)
+
+    # add the size of a block trade leg to its instrument's counter in the current time bucket
+    def add_block_volume(self, source, currency, symbol, size, timestamp):
+        bucket = int(timestamp) // 1000 // BLOCK_VOLUME_BUCKET
+        key = f'block_volume:{source}:{currency}:{bucket}'
+        pipe = self.client.pipeline()
+        pipe.zincrby(key, float(size), symbol)
+        pipe.expire(key, BLOCK_VOLUME_TTL)
+        pipe.execute()
+
+    # top instruments by block volume over the last window seconds, as [(symbol, size)]
+    def get_block_volume_top(self, source, currency, count=10, window=24 * 60 * 60):
+        now = int(time.time())
+        first = (now - window) // BLOCK_VOLUME_BUCKET + 1
+        last = now // BLOCK_VOLUME_BUCKET
+        keys = [f'block_volume:{source}:{currency}:{bucket}' for bucket in range(first, last + 1)]
+        dest = f'block_volume_top:{source}:{currency}'
+        pipe = self.client.pipeline()
+        pipe.zunionstore(dest, keys)
+        pipe.zrevrange(dest, 0, count - 1, withscores=True)
+        pipe.delete(dest)
+        _, top, _ = pipe.execute()
+        return [(symbol.decode(), size) for symbol, size in top]
+
+    # store a vol surface snapshot scored by its timestamp and drop the ones older than VOL_SURFACE_TTL
+    def put_vol_surface(self, currency, snapshot):
+        key = f'vol_surface:{currency}'
+        pipe = self.client.pipeline()
+        pipe.zadd(key, {json.dumps(snapshot): snapshot['ts']})
+        pipe.zremrangebyscore(key, '-inf', snapshot['ts'] - VOL_SURFACE_TTL)
+        pipe.execute()
+
+    # the vol surface snapshot nearest to timestamp within tolerance seconds, None if there is none
+    def get_vol_surface(self, currency, timestamp, tolerance=3 * 60 * 60):
+        items = self.client.zrangebyscore(f'vol_surface:{currency}', timestamp - tolerance, timestamp + tolerance, withscores=True)
+        if not items:
+            return None
+        item, _ = min(items, key=lambda item: abs(item[1] - timestamp))
+        return json.loads(item)
+
+    # store a rendered chart as its png, caption and telegram file_id under the digest of its data
+    def put_chart(self, digest, chart):
+        key = f'chart:{digest}'
+        pipe = self.client.pipeline()
+        pipe.hset(key, mapping={'png': chart['png'], 'caption': chart['caption'], 'file_id': chart['file_id'] or ''})
+        pipe.expire(key, CHART_TTL)
+        pipe.execute()
+
+    # the chart stored under digest as {png, caption, file_id}, None if there is none
+    def get_chart(self, digest):
+        chart = self.client.hgetall(f'chart:{digest}')
+        if not chart:
+            return None
+        return {'png': chart[b'png'], 'caption': chart[b'caption'].decode(), 'file_id': chart[b'file_id'].decode() or None}
+
+    # the digest of the last chart a job (with its args) sent
+    def set_last_chart(self, name, digest):
+        self.client.set(f'last_chart:{name}', digest, ex=CHART_TTL)
+
+    def get_last_chart(self, name):
+        digest = self.client.get(f'last_chart:{name}')
+        return digest.decode() if digest is not None else None
+
+    # the latest index price of a currency with the unix time it was seen and where from
+    def put_index_price(self, currency, price, timestamp, source):
+        self.client.hset('index_price', currency, json.dumps({'price': float(price), 'ts': timestamp, 'source': source}))
+
+    # {currency: {price, ts, source}} of the currencies with an index price
+    def get_index_prices(self, currencies):
+        values = self.client.hmget('index_price', list(currencies))
+        return {currency: json.loads(value) for currency, value in zip(currencies, values) if value is not None}
+
+    # take or renew the lease key for owner for ttl seconds, returns whether owner holds it
+    def acquire_lease(self, key, owner, ttl):
+        if self.client.set(key, owner, nx=True, px=int(ttl * 1000)):
+            return True
+        with self.client.pipeline() as pipe:
+            try:
+                pipe.watch(key)
+                if pipe.get(key) != owner.encode():
+                    return False
+                pipe.multi()
+                pipe.pexpire(key, int(ttl * 1000))
+                pipe.execute()
+                return True
+            except redis.WatchError:
+                return False
+
+    # give up the lease key if owner holds it
+    def release_lease(self, key, owner):
+        with self.client.pipeline() as pipe:
+            try:
+                pipe.watch(key)
+                if pipe.get(key) == owner.encode():
+                    pipe.multi()
+                    pipe.delete(key)
+                    pipe.execute()
+            except redis.WatchError:
+                pass
+
+    # mark a bot replica alive and return the ids of the replicas seen within ttl seconds, sorted
+    def heartbeat_replica(self, replica_id, ttl):
+        now = time.time()
+        pipe = self.client.pipeline()
+        pipe.zadd('bot_replicas', {replica_id: now})
+        pipe.zremrangebyscore('bot_replicas', '-inf', now - ttl)
+        pipe.zrange('bot_replicas', 0, -1)
+        _, _, replicas = pipe.execute()
+        return sorted(replica.decode() for replica in replicas)
+
+    def remove_replica(self, replica_id):
+        self.client.zrem('bot_replicas', replica_id)
+
+    # claim sending message_id to chat_id, False if it was already claimed
+    def claim_send(self, chat_id, message_id):
+        return bool(self.client.set(f'sent:{chat_id}:{message_id}', 1, nx=True, ex=SEND_CLAIM_TTL))
+
+    # release a claim whose send failed, so the message can be sent again
+    def release_send(self, chat_id, message_id):
+        self.client.delete(f'sent:{chat_id}:{message_id}')
@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+# Replay tapes recorded with tape_dir set (see tape.py) through the real normalisation -> Redis ->
+# routing -> formatting path of bot.py, with Telegram, OpenAI, SignalPlus and the trade archive
+# replaced by local fakes, and report trades/sec and per-stage latency.
+#
+# usage: python3 bot/replay.py TAPE [TAPE ...] [--speed 1] [--redis-host localhost] [--redis-db 15]
+#
+# TAPE is a .jsonl.gz file or a directory of them. --speed 0 (the default) replays as fast as
+# possible, --speed 1 keeps the recorded spacing between venue responses. The replay Redis db is
+# flushed before and after the run, never point it at the bot's own db.
+import sys
+import time
+import asyncio
+import logging
+import argparse
+from collections import defaultdict, deque
+
+import redis_client
+import tape
+from insights_generator import InsightsGenerator
+
+import bot
+
+logger = logging.getLogger(__name__)
+
+# stub returned for deribit tickers missing from the tape (requested before the tape started)
+EMPTY_TICKER = {"result": {
+    "greeks": {"delta": 0, "gamma": 0, "vega": 0, "theta": 0, "rho": 0},
+    "best_bid_price": 0,
+    "best_bid_amount": 0,
+    "best_ask_price": 0,
+    "best_ask_amount": 0,
+    "mark_price": 0,
+    "open_interest": 0,
+}}
+
+
+class Stats:
+    def __init__(self):
+        self.samples = defaultdict(list)
+        self.counts = defaultdict(int)
+
+    def timed(self, stage, fn):
+        """Wrap a sync or async function so every call adds a latency sample to stage."""
+        if asyncio.iscoroutinefunction(fn):
+            async def wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return await fn(*args, **kwargs)
+                finally:
+                    self.samples[stage].append(time.perf_counter() - start)
+        else:
+            def wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    self.samples[stage].append(time.perf_counter() - start)
+        return wrapper
+
+    def reset(self):
+        self.samples.clear()
+        self.counts.clear()
+
+    def report(self, elapsed):
+        trades = self.counts["trades"]
+        print(f"replayed {self.counts['responses']} responses, {trades} trades, "
+              f"{self.counts['messages']} messages in {elapsed:.2f}s ({trades / elapsed if elapsed else 0:,.1f} trades/s)")
+        print(f"{'stage':<10}{'calls':>8}{'p50 ms':>10}{'p99 ms':>10}{'max ms':>10}{'total s':>10}")
+        for stage, samples in self.samples.items():
+            samples = sorted(samples)
+            p50 = samples[len(samples) // 2]
+            p99 = samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+            print(f"{stage:<10}{len(samples):>8}{p50 * 1000:>10.3f}{p99 * 1000:>10.3f}{samples[-1] * 1000:>10.3f}{sum(samples):>10.2f}")
+
+
+class TapePlayer:
+    """Serves recorded responses in the order they were recorded, per (url, params)."""
+
+    def __init__(self, records):
+        self.responses = defaultdict(deque)
+        for record in records:
+            self.responses[self.key(record["url"], record["params"])].append(record["response"])
+
+    @staticmethod
+    def key(url, params):
+        return url, tuple(sorted((params or {}).items()))
+
+    def get_json(self, url, params=None):
+        responses = self.responses.get(self.key(url, params))
+        if responses:
+            return responses.popleft()
+        if url == bot.DERIBIT_TICKER_API:
+            return EMPTY_TICKER
+        raise KeyError(f"no recorded response for {url} {params}")
+
+
+class FakeBot:
+    def __init__(self, stats):
+        self.stats = stats
+
+    async def send_message(self, chat_id, text, **kwargs):
+        self.stats.counts["messages"] += 1
+
+
+class FakeInsightsGenerator(InsightsGenerator):
+    """Builds the real prompt context but never calls OpenAI."""
+
+    def __init__(self):
+        self.enabled = True
+
+    async def generate_trade_insights(self, strategy_name, trades, currency, size, premium, index_price):
+        self._build_trade_context(strategy_name, trades, currency, size, premium, index_price)
+        return "Replayed insight."
+
+
+class CountingArchive:
+    def __init__(self, stats):
+        self.stats = stats
+
+    def append(self, trade, block=False):
+        self.stats.counts["trades"] += 1
+
+    def flush(self):
+        pass
+
+
+async def fake_push_trade_to_signalplus(strategy_name, trades):
+    pass
+
+
+async def fetch(record):
+    """Run the bot.py fetch coroutine that requested a top-level venue response."""
+    url, params = record["url"], record["params"] or {}
+    if url == bot.DERIBIT_TRADE_API:
+        await bot.fetch_deribit_data(params["currency"])
+    elif url == bot.OKX_TRADE_API:
+        await bot.fetch_okx_data(params["instFamily"].split("-")[0])
+    elif url == bot.BYBIT_TRADE_API:
+        await bot.fetch_bybit_data(params["symbol"])
+
+
+async def drain(group_chat_ids):
+    while True:
+        data = bot.redis_client.get_trade()
+        if not data:
+            break
+        bot.route_trade(data)
+    while True:
+        id = bot.redis_client.get_block_trade_id()
+        if not id:
+            break
+        await bot.push_block_trade(id)
+    for group_chat_id in group_chat_ids:
+        while await bot.push_trade(group_chat_id):
+            pass
+
+
+async def replay(records, speed, stats):
+    config = bot.config
+    group_chat_ids = [
+        config.group_chat_id,
+        config.breavan_horward_group_chat_id,
+        config.midas_group_chat_id,
+        config.fbg_group_chat_id,
+        config.galaxy_group_chat_id,
+        config.astron_group_chat_id,
+        config.signalplus_group_chat_ids[0],
+        config.playground_group_chat_id,
+    ]
+    pages = [record for record in records if record["url"] in (bot.DERIBIT_TRADE_API, bot.OKX_TRADE_API, bot.BYBIT_TRADE_API)]
+
+    # the first page of every stream overlaps trades the bot had seen before the tape started,
+    # play it only to fill trade_set and the open interest cache, then drop what it queued
+    streams = set()
+    remaining = []
+    for record in pages:
+        key = TapePlayer.key(record["url"], record["params"])
+        if key in streams:
+            remaining.append(record)
+        else:
+            streams.add(key)
+            await fetch(record)
+    client = bot.redis_client.client
+    for key in client.scan_iter():
+        if key != b"trade_set" and not key.startswith(b"oi_"):
+            client.delete(key)
+    stats.reset()
+
+    timed_fetch = stats.timed("fetch", fetch)
+    start = time.perf_counter()
+    first_ts = remaining[0]["ts"] if remaining else 0
+    for record in remaining:
+        if speed:
+            delay = (record["ts"] - first_ts) / speed - (time.perf_counter() - start)
+            if delay > 0:
+                await asyncio.sleep(delay)
+        stats.counts["responses"] += 1
+        try:
+            await timed_fetch(record)
+            await drain(group_chat_ids)
+        except Exception as e:
+            logger.error(f"Replay error at {record['url']} {record['params']}: {e}")
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay recorded venue responses through the bot pipeline")
+    parser.add_argument("tapes", nargs="+")
+    parser.add_argument("--speed", type=float, default=0, help="1 replays in real time, 0 as fast as possible")
+    parser.add_argument("--redis-host", default="localhost")
+    parser.add_argument("--redis-port", type=int, default=6379)
+    parser.add_argument("--redis-db", type=int, default=15)
+    args = parser.parse_args()
+
+    records = tape.read_tape(args.tapes)
+    if not records:
+        sys.exit("empty tape")
+
+    stats = Stats()
+    player = TapePlayer(records)
+    bot.tape_recorder = None
+    bot.http_get_json = player.get_json
+    bot.redis_client = redis_client.RedisClient(host=args.redis_host, port=args.redis_port, db=args.redis_db)
+    bot.redis_client.client.flushdb()
+    bot.bot = FakeBot(stats)
+    bot.insights_generator = FakeInsightsGenerator()
+    bot.trade_archive = CountingArchive(stats)
+    bot.push_trade_to_signalplus = fake_push_trade_to_signalplus
+    bot.route_trade = stats.timed("route", bot.route_trade)
+    bot.generate_trade_message = stats.timed("render", bot.generate_trade_message)
+    bot.push_block_trade = stats.timed("block", bot.push_block_trade)
+    bot.push_trade = stats.timed("push", bot.push_trade)
+    bot.insights_generator.generate_trade_insights = stats.timed("insights", bot.insights_generator.generate_trade_insights)
+    bot.bot.send_message = stats.timed("send", bot.bot.send_message)
+
+    try:
+        elapsed = asyncio.run(replay(records, args.speed, stats))
+    finally:
+        bot.redis_client.client.flushdb()
+    stats.report(elapsed)
+
+
+if __name__ == "__main__":
+    main()
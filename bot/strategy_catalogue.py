@@ -0,0 +1,54 @@
+import csv
+import logging
+from collections import namedtuple
+
+logger = logging.getLogger(__name__)
+
+# columns of deribit_combo.csv that identify a strategy, in lookup key order
+KEY_COLUMNS = ["Legs", "Contract Type", "Strike", "Expiry", "Size Ratio", "Side"]
+
+# lightweight record returned by a lookup, View is None when the csv cell is empty
+Strategy = namedtuple("Strategy", ["strategy_name", "view", "short_strategy_name"])
+
+
+class StrategyCatalogue:
+    def __init__(self, path):
+        self.path = path
+        self.index = self.compile(path)
+
+    def compile(self, path):
+        """
+        Compile the strategy csv into a dict keyed by (legs, contract_type, strike, expiry, size_ratio, side).
+
+        Every cell is read as a string and stripped, so stray values such as "1 " in the Legs column
+        become the int 1. Duplicate keys raise a ValueError, since only one of them could ever match.
+        """
+        # utf-8-sig drops the byte order mark the csv was saved with
+        with open(path, newline="", encoding="utf-8-sig") as f:
+            rows = list(csv.reader(f))
+        header = [column.strip() for column in rows[0]]
+        if header[:len(KEY_COLUMNS)] != KEY_COLUMNS:
+            raise ValueError(f"{path}: unexpected header {header}")
+        index = {}
+        for row_number, row in enumerate(rows[1:], start=2):
+            if not row:
+                continue
+            if len(row) != len(header):
+                raise ValueError(f"{path}:{row_number}: expected {len(header)} columns, got {len(row)}")
+            values = [value.strip() for value in row]
+            legs, contract_type, strike, expiry, size_ratio, side, strategy_name, view, short_strategy_name = values
+            if not legs.isdigit():
+                raise ValueError(f"{path}:{row_number}: invalid Legs value {legs!r}")
+            key = (int(legs), contract_type, strike, expiry, size_ratio, side)
+            if key in index:
+                raise ValueError(f"{path}:{row_number}: duplicate strategy key {key} ({index[key].strategy_name} / {strategy_name})")
+            index[key] = Strategy(strategy_name, view or None, short_strategy_name)
+
+        logger.info(f"Compiled {len(index)} strategies from {path}")
+        return index
+
+    def lookup(self, legs, contract_type, strike, expiry, size_ratio, side):
+        return self.index.get((legs, contract_type, strike, expiry, size_ratio, side))
+
+    def __len__(self):
+        return len(self.index)
@@ -0,0 +1,102 @@
+from collections import namedtuple
+from fractions import Fraction
+from functools import reduce
+from math import gcd
+
+from instrument import parse_instrument
+
+LETTERS = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+
+# canonical description of a block trade, every field except legs is a string in deribit_combo.csv notation.
+# size_ratio is the gcd-normalised ratio ("1:2:1"), size_class the coarse form the csv uses for
+# unequal pairs ("1:N", "N:1"): legs at the smallest size are "1", the others "N".
+Signature = namedtuple("Signature", ["legs", "contract_type", "strike", "expiry", "size_ratio", "size_class", "side"])
+
+
+def _relation(values):
+    # "A<B=C" style pattern comparing each leg with the next one
+    if len(values) < 2 or any(value is None for value in values):
+        return "N"
+    pattern = LETTERS[0]
+    for i in range(1, len(values)):
+        previous, current = values[i - 1], values[i]
+        pattern += "<" if previous < current else "=" if previous == current else ">"
+        pattern += LETTERS[i]
+    return pattern
+
+
+def _size_ratio(sizes):
+    fractions = [Fraction(str(size)).limit_denominator(10**6) for size in sizes]
+    denominator = reduce(lambda a, b: a * b // gcd(a, b), (f.denominator for f in fractions), 1)
+    integers = [int(f * denominator) for f in fractions]
+    divisor = reduce(gcd, integers)
+    if divisor == 0:
+        return "N", "N"
+    integers = [i // divisor for i in integers]
+    smallest = min(integers)
+    size_ratio = ":".join(str(i) for i in integers)
+    size_class = ":".join("1" if i == smallest else "N" for i in integers)
+    return size_ratio, size_class
+
+
+def signature(trades):
+    """
+    Reduce a block trade to its canonical signature.
+
+    Option legs are ordered by strike, then puts before calls, then expiry date. Any non-option
+    leg makes the whole trade a futures structure ("F" with every other field "N").
+    """
+    legs = len(trades)
+    instruments = [parse_instrument(trade["symbol"]) for trade in trades]
+    if not all(instrument.is_option for instrument in instruments):
+        return Signature(legs, "F", "N", "N", "N", "N", "N")
+
+    ordered = sorted(zip(instruments, trades), key=lambda x: (x[0].strike, x[0].option_type == "C", x[0].expiry))
+    option_types = [instrument.option_type for instrument, _ in ordered]
+    if all(option_type == "C" for option_type in option_types):
+        contract_type = "C"
+    elif all(option_type == "P" for option_type in option_types):
+        contract_type = "P"
+    else:
+        contract_type = "".join(option_types)
+
+    side = ""
+    for i, (_, trade) in enumerate(ordered):
+        sign = "+" if trade["direction"].upper() == "BUY" else "-"
+        side += (sign if i > 0 or sign == "-" else "") + LETTERS[i]
+
+    if legs == 1:
+        return Signature(legs, contract_type, "N", "N", "1", "1", side)
+
+    strike = _relation([instrument.strike for instrument, _ in ordered])
+    expiry = _relation([instrument.expiry for instrument, _ in ordered])
+    size_ratio, size_class = _size_ratio([float(trade["size"]) for _, trade in ordered])
+    return Signature(legs, contract_type, strike, expiry, size_ratio, size_class, side)
+
+
+def candidate_keys(sig):
+    """
+    Catalogue keys to probe for a signature, most specific first.
+
+    Mixed put/call structures also match the generic "PC" contract type and unequal sizes also
+    match their coarse size class, so there are never more than four probes per trade.
+    """
+    contract_types = [sig.contract_type]
+    if sig.contract_type not in ("C", "P", "F", "PC"):
+        contract_types.append("PC")
+    size_ratios = [sig.size_ratio]
+    if sig.size_class != sig.size_ratio:
+        size_ratios.append(sig.size_class)
+    for contract_type in contract_types:
+        for size_ratio in size_ratios:
+            yield (sig.legs, contract_type, sig.strike, sig.expiry, size_ratio, sig.side)
+
+
+def classify(trades, catalogue):
+    """Return (Strategy or None, Signature) for a block trade."""
+    sig = signature(trades)
+    for key in candidate_keys(sig):
+        result = catalogue.lookup(*key)
+        if result is not None:
+            return result, sig
+    return None, sig
@@ -0,0 +1,75 @@
+import time
+import asyncio
+import logging
+import contextlib
+
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class Supervisor:
+    """
+    Keeps the bot's long running tasks alive and stops them without cutting off a delivery.
+
+    Each task is a coroutine function run under the name given to start. If it raises or returns
+    it is logged, counted in the task_restarts gauge and started again after a delay that doubles
+    on every failure up to max_restart_delay, and resets once the task has stayed up that long.
+
+    Consumers wrap the handling of each item they pop in delivering(). stop() stops restarts and
+    tells the consumers to exit through `stopping`, waits up to its timeout for the deliveries in
+    flight to complete, then cancels every task.
+    """
+
+    def __init__(self, restart_delay=1.0, max_restart_delay=60.0):
+        self.restart_delay = restart_delay
+        self.max_restart_delay = max_restart_delay
+        self.tasks = set()
+        self.restarts = {}
+        self.stopping = False
+        self.in_flight = 0
+
+    def start(self, name, coroutine_function):
+        task = asyncio.get_running_loop().create_task(self._run(name, coroutine_function), name=name)
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        return task
+
+    async def _run(self, name, coroutine_function):
+        delay = self.restart_delay
+        while not self.stopping:
+            started = time.monotonic()
+            try:
+                await coroutine_function()
+                if self.stopping:
+                    return
+                logger.error(f"Task {name} returned, restarting in {delay}s")
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception(f"Task {name} crashed, restarting in {delay}s")
+            self.restarts[name] = self.restarts.get(name, 0) + 1
+            metrics.set("task_restarts", self.restarts[name], task=name)
+            if time.monotonic() - started > self.max_restart_delay:
+                delay = self.restart_delay
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.max_restart_delay)
+
+    @contextlib.contextmanager
+    def delivering(self):
+        self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+
+    async def stop(self, timeout):
+        self.stopping = True
+        deadline = time.monotonic() + timeout
+        while self.in_flight and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        if self.in_flight:
+            logger.error(f"Cancelling {self.in_flight} deliveries still in flight after {timeout}s")
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
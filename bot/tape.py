@@ -0,0 +1,45 @@
+import os
+import gzip
+import json
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+# A tape is a gzip-compressed json-lines file of raw venue responses, one record per request:
+# {"ts": <wall clock seconds>, "url": ..., "params": {...}, "response": <decoded json>}
+# Recorders start a new file per process and per UTC hour: {tape_dir}/{YYYYmmdd-HH}-{pid}.jsonl.gz
+
+
+class TapeRecorder:
+    def __init__(self, tape_dir):
+        self.tape_dir = tape_dir
+        os.makedirs(tape_dir, exist_ok=True)
+
+    def record(self, url, params, response):
+        ts = time.time()
+        path = os.path.join(self.tape_dir, f"{time.strftime('%Y%m%d-%H', time.gmtime(ts))}-{os.getpid()}.jsonl.gz")
+        try:
+            # every record is appended as its own gzip member, so a killed process leaves a readable tape
+            with gzip.open(path, "at", encoding="utf-8") as f:
+                f.write(json.dumps({"ts": ts, "url": url, "params": params, "response": response}) + "\n")
+        except Exception as e:
+            logger.error(f"Failed to record tape: {e}")
+
+
+def read_tape(paths):
+    """Load the records of one or more tape files (or directories of them) in timestamp order."""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files += [os.path.join(path, name) for name in os.listdir(path) if name.endswith(".jsonl.gz")]
+        else:
+            files.append(path)
+    records = []
+    for path in files:
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    records.append(json.loads(line))
+    records.sort(key=lambda record: record["ts"])
+    return records
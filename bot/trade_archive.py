@@ -0,0 +1,209 @@
+import os
+import logging
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from instrument import parse_instrument
+
+logger = logging.getLogger(__name__)
+
+# One raw little-endian file per column per UTC day: {archive_dir}/{YYYY-MM-DD}/{column}.bin
+# Columns are appended in batches, and {day}/rows records how many rows every column holds once
+# a batch has been written to all of them. A crash or error mid-flush can leave some columns
+# longer than that; the next flush truncates them back before appending, and readers ignore the
+# rows past it.
+COLUMNS = {
+    "timestamp": "<i8",       # exchange timestamp, ms
+    "source": "S8",
+    "kind": "u1",             # 0 on-screen, 1 block
+    "trade_id": "S64",
+    "block_trade_id": "S32",
+    "symbol": "S48",
+    "currency": "S12",
+    "option_type": "S1",      # C, P or empty for non-options
+    "strike": "<f8",          # nan for non-options
+    "expiry": "<i4",          # days since 1970-01-01, -1 for perpetuals
+    "direction": "i1",        # 1 buy, -1 sell
+    "price": "<f8",
+    "size": "<f8",
+    "iv": "<f8",              # nan when the venue did not send one
+    "index_price": "<f8",
+    "liquidation": "?",
+}
+ROWS_FILE = "rows"
+KIND_ONSCREEN = 0
+KIND_BLOCK = 1
+EPOCH = datetime(1970, 1, 1).date()
+
+
+def _float(value):
+    return float(value) if value is not None and value != "" else np.nan
+
+
+def _day(timestamp_ms):
+    return datetime.fromtimestamp(timestamp_ms / 1000, tz=timezone.utc).strftime("%Y-%m-%d")
+
+
+def _committed_rows(day_dir):
+    # rows written to every column by the last complete flush
+    try:
+        with open(os.path.join(day_dir, ROWS_FILE)) as f:
+            return int(f.read())
+    except FileNotFoundError:
+        pass
+    # days archived before the row count was kept
+    rows = []
+    for column, dtype in COLUMNS.items():
+        path = os.path.join(day_dir, f"{column}.bin")
+        rows.append(os.path.getsize(path) // np.dtype(dtype).itemsize if os.path.exists(path) else 0)
+    return min(rows)
+
+
+class TradeArchiveWriter:
+    """
+    Buffers trades for the bot's periodic flush. append never writes, so a failing disk cannot
+    break the fetchers; while flushes keep failing at most max_pending rows are kept, the oldest
+    dropped first.
+    """
+
+    def __init__(self, archive_dir, max_pending=100000):
+        self.archive_dir = archive_dir
+        self.max_pending = max_pending
+        self.pending = {}
+        self.pending_rows = 0
+        self.dropped = 0
+
+    def append(self, trade, block=False):
+        """Buffer a normalised trade dict until the next flush."""
+        instrument = parse_instrument(trade["symbol"])
+        timestamp = int(trade["timestamp"])
+        row = (
+            timestamp,
+            trade["source"],
+            KIND_BLOCK if block else KIND_ONSCREEN,
+            str(trade["trade_id"]),
+            str(trade.get("block_trade_id") or ""),
+            trade["symbol"],
+            trade["currency"],
+            instrument.option_type or "",
+            instrument.strike if instrument.strike is not None else np.nan,
+            (instrument.expiry - EPOCH).days if instrument.expiry is not None else -1,
+            1 if trade["direction"].upper() == "BUY" else -1,
+            _float(trade["price"]),
+            _float(trade["size"]),
+            _float(trade.get("iv")),
+            _float(trade.get("index_price")),
+            bool(trade.get("liquidation")),
+        )
+        self.pending.setdefault(_day(timestamp), []).append(row)
+        self.pending_rows += 1
+        if self.pending_rows > self.max_pending:
+            self._drop_oldest()
+
+    def _drop_oldest(self):
+        day = min(self.pending)
+        rows = self.pending[day]
+        rows.pop(0)
+        if not rows:
+            del self.pending[day]
+        self.pending_rows -= 1
+        self.dropped += 1
+        if self.dropped % 1000 == 1:
+            logger.error(f"Trade archive buffer full at {self.max_pending} rows, {self.dropped} oldest rows dropped")
+
+    def flush(self):
+        pending, self.pending = self.pending, {}
+        try:
+            for day, rows in list(pending.items()):
+                self._write_day(day, rows)
+                del pending[day]
+        except Exception:
+            # unwritten rows go back ahead of any buffered since, to be retried by the next flush
+            for day, rows in pending.items():
+                self.pending[day] = rows + self.pending.get(day, [])
+            raise
+        finally:
+            self.pending_rows = sum(len(rows) for rows in self.pending.values())
+
+    def _write_day(self, day, rows):
+        day_dir = os.path.join(self.archive_dir, day)
+        os.makedirs(day_dir, exist_ok=True)
+        committed = _committed_rows(day_dir)
+        records = np.array(rows, dtype=list(COLUMNS.items()))
+        for column, dtype in COLUMNS.items():
+            with open(os.path.join(day_dir, f"{column}.bin"), "ab") as f:
+                # drop rows an interrupted flush left past the committed count
+                f.truncate(committed * np.dtype(dtype).itemsize)
+                f.write(records[column].tobytes())
+        path = os.path.join(day_dir, ROWS_FILE)
+        with open(f"{path}.tmp", "w") as f:
+            f.write(str(committed + len(rows)))
+        os.replace(f"{path}.tmp", path)
+
+
+class TradeArchiveReader:
+    """
+    Range and instrument scans over the archive. Columns are memory-mapped and the filter
+    columns are read in chunks, so only the pages holding matching rows are loaded.
+    """
+
+    def __init__(self, archive_dir, chunk_size=1 << 20):
+        self.archive_dir = archive_dir
+        self.chunk_size = chunk_size
+
+    def days(self):
+        if not os.path.isdir(self.archive_dir):
+            return []
+        return sorted(d for d in os.listdir(self.archive_dir) if os.path.isdir(os.path.join(self.archive_dir, d)))
+
+    def _open_day(self, day):
+        day_dir = os.path.join(self.archive_dir, day)
+        columns = {}
+        for column, dtype in COLUMNS.items():
+            path = os.path.join(day_dir, f"{column}.bin")
+            if not os.path.exists(path) or os.path.getsize(path) == 0:
+                return {}
+            columns[column] = np.memmap(path, dtype=dtype, mode="r")
+        rows = min([_committed_rows(day_dir)] + [len(values) for values in columns.values()])
+        return {column: values[:rows] for column, values in columns.items()}
+
+    def scan(self, start_ms, end_ms, symbol=None, source=None, columns=None):
+        """
+        Trades with start_ms <= timestamp < end_ms, optionally for one symbol and/or source.
+
+        Returns a dict of column name -> numpy array (all columns unless a list is given),
+        ordered by day and then by archive order within a day.
+        """
+        columns = list(columns or COLUMNS)
+        day = datetime.fromtimestamp(start_ms / 1000, tz=timezone.utc).date()
+        last_day = datetime.fromtimestamp((end_ms - 1) / 1000, tz=timezone.utc).date()
+        symbol = symbol.encode() if symbol is not None else None
+        source = source.encode() if source is not None else None
+        parts = {column: [] for column in columns}
+        while day <= last_day:
+            data = self._open_day(day.strftime("%Y-%m-%d"))
+            day += timedelta(days=1)
+            if not data:
+                continue
+            rows = len(data["timestamp"])
+            for offset in range(0, rows, self.chunk_size):
+                chunk = slice(offset, min(offset + self.chunk_size, rows))
+                timestamps = data["timestamp"][chunk]
+                mask = (timestamps >= start_ms) & (timestamps < end_ms)
+                if symbol is not None:
+                    mask &= data["symbol"][chunk] == symbol
+                if source is not None:
+                    mask &= data["source"][chunk] == source
+                index = np.flatnonzero(mask) + offset
+                if len(index) == 0:
+                    continue
+                for column in columns:
+                    parts[column].append(np.asarray(data[column][index]))
+        return {
+            column: np.concatenate(values) if values else np.empty(0, dtype=COLUMNS[column])
+            for column, values in parts.items()
+        }
+
+    def instrument(self, symbol, start_ms, end_ms, columns=None):
+        return self.scan(start_ms, end_ms, symbol=symbol, columns=columns)
@@ -0,0 +1,226 @@
+import time
+import logging
+from collections import namedtuple
+from statistics import NormalDist
+
+import numpy as np
+import requests
+
+from black76 import YEAR, expiry_timestamp
+from instrument import parse_instrument
+
+logger = logging.getLogger(__name__)
+
+DERIBIT_BOOK_SUMMARY_API = "https://www.deribit.com/api/v2/public/get_book_summary_by_currency"
+DERIBIT_CHART_API = "https://www.deribit.com/api/v2/public/get_tradingview_chart_data"
+# kept alive between snapshots when a long-running process builds them
+session = requests.Session()
+
+# standard tenors in days
+TENORS = {"1D": 1, "2D": 2, "1W": 7, "2W": 14, "3W": 21, "1M": 30, "2M": 60, "3M": 91, "6M": 182, "9M": 273, "1Y": 365}
+# realized vol is reported for the tenors it has enough daily closes for
+RV_TENORS = ["1W", "2W", "3W", "1M", "2M", "3M", "6M", "9M"]
+
+# smile points in delta space. Each is the N(d1) of the strike (0.9 for the 10 delta put,
+# 0.1 for the 10 delta call), ATM is the forward itself.
+POINTS = ["10P", "25P", "ATM", "25C", "10C"]
+POINT_N_D1 = np.array([0.9, 0.75, np.nan, 0.25, 0.1])
+POINT_D1 = np.array([NormalDist().inv_cdf(p) if not np.isnan(p) else 0.0 for p in POINT_N_D1])
+
+# expiries with fewer out-of-the-money quotes than this are left out of the surface
+MIN_QUOTES = 3
+
+# expiries: deribit expiry codes, expiry_ts: unix seconds, t: years to expiry, forwards: per expiry,
+# coefficients: (E, 3) total implied variance w(k) = a + b*k + c*k^2 in log-moneyness k = ln(K/F),
+# bounds: (E, 2) lowest and highest quoted k, the smile is held flat beyond them
+Smiles = namedtuple("Smiles", ["ts", "expiries", "expiry_ts", "t", "forwards", "coefficients", "bounds"])
+
+
+def fetch_book_summary(currency):
+    response = session.get(DERIBIT_BOOK_SUMMARY_API, params={"currency": currency, "kind": "option"})
+    return response.json()["result"]
+
+
+def fetch_daily_closes(currency, days):
+    end = int(time.time() * 1000)
+    response = session.get(DERIBIT_CHART_API, params={
+        "instrument_name": f"{currency}-PERPETUAL",
+        "resolution": "1D",
+        "start_timestamp": end - (days + 2) * 24 * 3600 * 1000,
+        "end_timestamp": end,
+    })
+    return np.asarray(response.json()["result"]["close"], dtype=float)
+
+
+def fit_smiles(summary, now=None):
+    """
+    Fit a quadratic total-variance smile per expiry to the out-of-the-money mark IVs of a
+    deribit book summary, all expiries at once through batched weighted normal equations.
+    """
+    now = time.time() if now is None else now
+    expiry_index = {}
+    expiries, expiry_ts, forwards = [], [], []
+    rows, ks, ws, weights = [], [], [], []
+    for item in summary:
+        instrument = parse_instrument(item["instrument_name"])
+        iv, forward = item.get("mark_iv"), item.get("underlying_price")
+        if not instrument.is_option or not iv or not forward:
+            continue
+        # out of the money side only: puts below the forward, calls at or above it
+        if (instrument.strike < forward) != (instrument.option_type == "P"):
+            continue
+        code = instrument.expiry_code
+        if code not in expiry_index:
+            expires = expiry_timestamp(instrument.expiry)
+            if expires <= now:
+                continue
+            expiry_index[code] = len(expiries)
+            expiries.append(code)
+            expiry_ts.append(expires)
+            forwards.append(float(forward))
+        index = expiry_index[code]
+        t = (expiry_ts[index] - now) / YEAR
+        k = np.log(instrument.strike / forwards[index])
+        sigma = float(iv) / 100
+        rows.append(index)
+        ks.append(k)
+        ws.append(sigma * sigma * t)
+        # gaussian in standardised moneyness, so the wings do not drag the centre of the smile
+        weights.append(np.exp(-0.5 * (k / (sigma * np.sqrt(t))) ** 2))
+
+    rows, ks, ws, weights = np.array(rows, dtype=int), np.array(ks), np.array(ws), np.array(weights)
+    design = np.stack([np.ones_like(ks), ks, ks * ks], axis=1)
+    normal = np.zeros((len(expiries), 3, 3))
+    target = np.zeros((len(expiries), 3))
+    np.add.at(normal, rows, weights[:, None, None] * design[:, :, None] * design[:, None, :])
+    np.add.at(target, rows, weights[:, None] * design * ws[:, None])
+    coefficients = np.linalg.solve(normal + np.eye(3) * 1e-12, target[:, :, None])[:, :, 0]
+
+    # drop expiries without enough quotes for a curve, then sort by expiry
+    counts = np.bincount(rows, minlength=len(expiries))
+    bounds = np.full((len(expiries), 2), [np.inf, -np.inf])
+    np.minimum.at(bounds[:, 0], rows, ks)
+    np.maximum.at(bounds[:, 1], rows, ks)
+    keep = np.flatnonzero(counts >= MIN_QUOTES)
+    keep = keep[np.argsort(np.array(expiry_ts)[keep])]
+    expiry_ts = np.array(expiry_ts)[keep]
+    return Smiles(
+        now,
+        [expiries[i] for i in keep],
+        expiry_ts,
+        (expiry_ts - now) / YEAR,
+        np.array(forwards)[keep],
+        coefficients[keep],
+        bounds[keep],
+    )
+
+
+def total_variance(coefficients, k):
+    """w(k) for coefficients of shape (E, 3) and log-moneyness of shape (E, ...)."""
+    a, b, c = (coefficients[:, i].reshape((-1,) + (1,) * (k.ndim - 1)) for i in range(3))
+    return np.maximum(a + b * k + c * k * k, 1e-8)
+
+
+def smile_variance(smiles, k):
+    """Total variance of the fitted smiles at log-moneyness k of shape (E, ...), flat beyond the quoted strikes."""
+    shape = (-1,) + (1,) * (k.ndim - 1)
+    k = np.clip(k, smiles.bounds[:, 0].reshape(shape), smiles.bounds[:, 1].reshape(shape))
+    return total_variance(smiles.coefficients, k)
+
+
+def delta_vols(smiles, iterations=50):
+    """
+    Implied vols at the POINTS of every expiry, shape (E, len(POINTS)).
+
+    The strike of a forward delta point is where d1(k) = (-k + w(k) / 2) / sqrt(w(k)) meets the
+    point's d1. d1 falls with k on any arbitrage-free smile, so all points of all expiries are
+    bisected together within the quoted strike range.
+    """
+    expiries = len(smiles.expiries)
+    d1 = np.broadcast_to(POINT_D1, (expiries, len(POINTS)))
+    low = np.broadcast_to(smiles.bounds[:, :1], (expiries, len(POINTS))).copy()
+    high = np.broadcast_to(smiles.bounds[:, 1:], (expiries, len(POINTS))).copy()
+    for _ in range(iterations):
+        k = (low + high) / 2
+        w = smile_variance(smiles, k)
+        above = (-k + w / 2) / np.sqrt(w) > d1
+        low = np.where(above, k, low)
+        high = np.where(above, high, k)
+    k = np.where(np.isnan(POINT_N_D1), 0.0, (low + high) / 2)
+    return np.sqrt(smile_variance(smiles, k) / smiles.t[:, None])
+
+
+def tenor_vols(smiles, vols, tenors=TENORS):
+    """
+    Interpolate per-expiry vols of shape (E, P) to standard tenors, shape (len(tenors), P).
+
+    Total variance is linear in time between expiries, vols are flat before the first and after
+    the last expiry. Without any expiry every tenor is nan.
+    """
+    t = np.array(list(tenors.values()), dtype=float) / 365
+    if len(smiles.expiries) == 0:
+        return np.full((len(t), vols.shape[1]), np.nan)
+    variance = vols ** 2 * smiles.t[:, None]
+    result = np.empty((len(t), vols.shape[1]))
+    for point in range(vols.shape[1]):
+        interpolated = np.interp(t, smiles.t, variance[:, point]) / t
+        result[:, point] = np.sqrt(interpolated)
+        result[t <= smiles.t[0], point] = vols[0, point]
+        result[t >= smiles.t[-1], point] = vols[-1, point]
+    return result
+
+
+def realized_vols(closes, tenors=RV_TENORS):
+    """Annualised close-to-close realized vol over the trailing days of every tenor."""
+    returns = np.diff(np.log(closes))
+    result = {}
+    for tenor in tenors:
+        days = TENORS[tenor]
+        if len(returns) >= days:
+            result[tenor] = float(np.std(returns[-days:], ddof=1) * np.sqrt(365))
+    return result
+
+
+def point_metrics(vols):
+    """Named vols plus 25/10 delta risk reversals and butterflies for rows of (..., len(POINTS)) vols."""
+    p10, p25, atm, c25, c10 = (vols[..., i] for i in range(len(POINTS)))
+    return {
+        "10P": p10, "25P": p25, "ATM": atm, "25C": c25, "10C": c10,
+        "RR25": c25 - p25, "RR10": c10 - p10,
+        "FLY25": (c25 + p25) / 2 - atm, "FLY10": (c10 + p10) / 2 - atm,
+    }
+
+
+def build_snapshot(currency, summary=None, closes=None, now=None):
+    """
+    Fit the current surface of a currency into a json-serialisable snapshot:
+    {"ts", "currency", "expiries": [{"expiry", "future", "10P", ..., "FLY10"}], "tenors": {"1D": {...}}, "rv": {"1W": ...}}
+    Vols are decimals (0.52 for 52%). None when the summary has no option with enough quotes to fit.
+    """
+    summary = fetch_book_summary(currency) if summary is None else summary
+    smiles = fit_smiles(summary, now)
+    if len(smiles.expiries) == 0:
+        logger.error(f"No {currency} expiry with enough quotes to fit a vol surface")
+        return None
+    vols = delta_vols(smiles)
+    by_expiry = point_metrics(vols)
+    by_tenor = point_metrics(tenor_vols(smiles, vols))
+    if closes is None:
+        try:
+            closes = fetch_daily_closes(currency, max(TENORS[tenor] for tenor in RV_TENORS))
+        except Exception as e:
+            logger.error(f"Failed to fetch {currency} closes for realized vol: {e}")
+            closes = np.empty(0)
+    return {
+        "ts": int(smiles.ts),
+        "currency": currency,
+        "expiries": [
+            dict({"expiry": expiry, "future": float(smiles.forwards[i])}, **{name: float(values[i]) for name, values in by_expiry.items()})
+            for i, expiry in enumerate(smiles.expiries)
+        ],
+        "tenors": {
+            tenor: {name: float(values[i]) for name, values in by_tenor.items()}
+            for i, tenor in enumerate(TENORS)
+        },
+        "rv": realized_vols(closes) if len(closes) else {},
+    }
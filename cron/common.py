@@ -0,0 +1,152 @@
+# Setup shared by the cron jobs: config, the telegram bot, an HTTP session and the bot/ modules on
+# the import path. The scheduler imports it once, so every job it runs finds all of this warm.
+
+import io
+import sys
+import json
+import time
+import asyncio
+import hashlib
+from pathlib import Path
+
+import requests
+import telegram
+from telegram.constants import ParseMode
+from telegram.error import RetryAfter
+import yaml
+
+root_dir = Path(__file__).parent.parent.resolve()
+config_dir = root_dir / "config"
+sys.path.append(str(root_dir / "bot"))
+import redis_client
+import render
+import render_pool
+
+# load yaml config
+with open(config_dir / "config.yml", 'r') as f:
+    config_yaml = yaml.safe_load(f)
+
+bot = telegram.Bot(token=config_yaml["telegram_token"])
+redis_client = redis_client.RedisClient()
+session = requests.Session()
+# chart render worker processes, render_workers: 0 in the config draws charts in a thread instead
+render_pool = render_pool.RenderPool(config_yaml.get("render_workers"))
+
+# telegram allows a bot about 30 messages a second, broadcasts stay under it between them
+BROADCAST_RATE = 25
+BROADCAST_CONCURRENCY = 8
+SEND_ATTEMPTS = 3
+_next_send = 0.0
+
+# what a job does with a chart whose data is unchanged since it was rendered: "render" (the
+# default) draws and uploads it again, "reuse" sends the file_id it was uploaded under, "skip"
+# sends nothing when the job's last chart was the same. A reused chart still shows the footer time
+# it was first drawn at, so only opt in for jobs where that is acceptable, in config.yml:
+#   chart_cache: {volume: skip, expireIv: reuse}
+CHART_POLICIES = ("render", "reuse", "skip")
+
+
+async def run_blocking(fn, *args):
+    # run HTTP fetches and rendering off the event loop, so concurrent jobs overlap their waits
+    return await asyncio.get_running_loop().run_in_executor(None, fn, *args)
+
+
+async def _rate_limit():
+    # hand out send slots 1/BROADCAST_RATE apart, shared by every broadcast of the process
+    global _next_send
+    now = time.monotonic()
+    slot = max(now, _next_send)
+    _next_send = slot + 1 / BROADCAST_RATE
+    await asyncio.sleep(slot - now)
+
+
+async def _send_photo(chat_id, photo, caption):
+    for attempt in range(SEND_ATTEMPTS):
+        await _rate_limit()
+        try:
+            return await bot.send_photo(chat_id=chat_id, photo=photo, caption=caption, parse_mode=ParseMode.HTML)
+        except RetryAfter as e:
+            if attempt == SEND_ATTEMPTS - 1:
+                raise
+            await asyncio.sleep(e.retry_after)
+
+
+async def broadcast_photo(chat_ids, photo, caption):
+    """
+    Send a photo buffer to every chat, uploading the image only once. The first chat that accepts
+    the upload gives the file_id telegram stored it under, the remaining chats are sent that
+    file_id concurrently under the rate limit. A file_id in place of the buffer is sent to all
+    chats as is.
+
+    Returns:
+        The file_id, None if no chat accepted the upload
+    """
+    chat_ids = iter(dict.fromkeys(chat_ids))
+    file_id = photo if isinstance(photo, str) else None
+    for chat_id in chat_ids if file_id is None else ():
+        try:
+            photo.seek(0)
+            message = await _send_photo(chat_id, photo, caption)
+            file_id = message.photo[-1].file_id
+            print('sent', chat_id)
+            break
+        except Exception as e:
+            print(e)
+            print('unavailable', chat_id)
+    if file_id is None:
+        return None
+
+    semaphore = asyncio.Semaphore(BROADCAST_CONCURRENCY)
+
+    async def send(chat_id):
+        async with semaphore:
+            try:
+                await _send_photo(chat_id, file_id, caption)
+                print('sent', chat_id)
+            except Exception as e:
+                print(e)
+                print('unavailable', chat_id)
+
+    await asyncio.gather(*(send(chat_id) for chat_id in chat_ids))
+    return file_id
+
+
+def chart_digest(name, data):
+    # the chart's identity: the job with its args, the data it is drawn from and the templates
+    return hashlib.sha256(json.dumps([render.TEMPLATE_VERSION, name, data], default=str).encode()).hexdigest()
+
+
+async def send_chart(job, name, chat_ids, data, render_chart):
+    """
+    Broadcast a job's chart, drawing and uploading it only when its data changed under the job's
+    chart_cache policy.
+
+    Args:
+        job: the scheduler job, whose policy applies
+        name: the job with its args, e.g. "volume BTC deribit"
+        data: JSON-able data that determines the chart, leaving out what only changes its footer
+        render_chart: coroutine function returning the chart as (buffer, caption)
+
+    Returns:
+        Whether the chart is out, False if no chat accepted it
+    """
+    policies = config_yaml.get("chart_cache", {})
+    policy = policies.get(job, policies.get("default", "render"))
+    if policy not in CHART_POLICIES:
+        raise ValueError(f"unknown chart_cache policy {policy}")
+    digest = chart_digest(name, data)
+    chart = redis_client.get_chart(digest) if policy != "render" else None
+    if chart is not None and policy == "skip" and redis_client.get_last_chart(name) == digest:
+        print('unchanged', name)
+        return True
+    if chart is not None:
+        print('cached', name)
+        photo, caption = chart["file_id"] or io.BytesIO(chart["png"]), chart["caption"]
+    else:
+        photo, caption = await render_chart()
+        chart = {"png": photo.getvalue(), "caption": caption}
+    chart["file_id"] = await broadcast_photo(chat_ids, photo, caption)
+    if chart["file_id"] is not None:
+        redis_client.put_chart(digest, chart)
+        redis_client.set_last_chart(name, digest)
+    return chart["file_id"] is not None
@@ -1,142 +1,64 @@
 #!/usr/bin/env python3
 
-import time
 import datetime
-import requests
-import matplotlib.pyplot as plt
-import numpy as np
-from PIL import Image
 import io
 import sys
-import telegram
-from telegram.constants import ParseMode
 import asyncio
-import yaml
-from pathlib import Path
 
-config_dir = Path(__file__).parent.parent.resolve() / "config"
-assets_dir = Path(__file__).parent.parent.resolve() / "assets"
-# load yaml config
-with open(config_dir / "config.yml", 'r') as f:
-    config_yaml = yaml.safe_load(f)
-bot = telegram.Bot(token=config_yaml["telegram_token"])
-SIGNALPLUS_EXPIRE_IV_API = "https://mizar-gateway.signalplus.com/mizar/expire-lapse-iv"
-plt.rcParams['font.family'] = 'monospace'
+from common import config_yaml, redis_client, render_pool, run_blocking, send_chart
+import render
+import vol_surface
 
+IV_TABLE = render.TableStyle(col_widths=[0.15] + [1/11] * 10, dpi=250, font_size='xx-large')
 
-async def push_iv():
-    args = sys.argv[1:]
-    currency = args[0].upper()
-    exchange_name = args[1].lower()
-    headers =   {
-        "Content-Type" : "application/json"
-    }
-    req_body = {
-        "currency": currency,
-        "exchange": exchange_name,
-    }
-    response = requests.post(SIGNALPLUS_EXPIRE_IV_API, headers=headers, json=req_body)
-    json_data = response.json()
-    data = [['Tenor', 'Future', '10P','25P', 'ATMF', '25C', '10C', '10D FLY', '25D FLY', '10D RR', '25D RR']]
-    for i,item in enumerate(json_data['value']):
-        data.append([ item['tenor'], 
+
+def iv_rows(snapshot):
+    data = []
+    for item in snapshot['expiries']:
+        data.append([ item['expiry'],
         convert_to_float(item['future']),
-        convert_to_percentage(item['put10p']),
-        convert_to_percentage(item['put25p']),
-        convert_to_percentage(item['atm']),
-        convert_to_percentage(item['call25p']),
-        convert_to_percentage(item['call10p']),
-        convert_to_percentage(item['fly10p']),
-        convert_to_percentage(item['fly25p']),
-        convert_to_percentage(item['rr10p']),
-        convert_to_percentage(item['rr25p'])
+        convert_to_percentage(item['10P']),
+        convert_to_percentage(item['25P']),
+        convert_to_percentage(item['ATM']),
+        convert_to_percentage(item['25C']),
+        convert_to_percentage(item['10C']),
+        convert_to_percentage(item['FLY10']),
+        convert_to_percentage(item['FLY25']),
+        convert_to_percentage(item['RR10']),
+        convert_to_percentage(item['RR25'])
         ])
+    return data
+
 
+async def render_iv(currency, exchange_name, rows, backend="matplotlib"):
+    data = [['Tenor', 'Future', '10P','25P', 'ATMF', '25C', '10C', '10D FLY', '25D FLY', '10D RR', '25D RR']] + rows
     # 创建新的图例
     title_text = f'{currency} {exchange_name.upper()} Volatility Table'
     now = datetime.datetime.utcnow()
     footer_text = now.strftime('%Y-%m-%d %H:%M UTC+0')
-    fig_background_color = 'snow'
-    fig_border = 'darkgray'
     column_headers = data.pop(0)
-    #row_headers = [x.pop(0) for x in data]
-    # Table data needs to be non-numeric text. Format the data
-    # while I'm at it.
-    cell_text = []
-    for row in data:
-        cell_text.append([x for x in row])
-    # Get some lists of color specs for row and column headers
-    #rcolors = plt.cm.BuPu(np.full(len(row_headers), 0.1))
-    ccolors = plt.cm.BuPu(np.full(len(column_headers), 0.1))
-    # Create the figure. Setting a small pad on tight_layout
-    # seems to better regulate white space. Sometimes experimenting
-    # with an explicit figsize here can produce better outcome.
-    plt.figure(linewidth=2,
-               edgecolor=fig_border,
-               facecolor=fig_background_color,
-               tight_layout={'pad':1},
-               #figsize=(5,3)
-               )
-    # Add a table at the bottom of the axes
-    the_table = plt.table(cellText=cell_text,
-                          #rowLabels=row_headers,
-                          #rowColours=rcolors,
-                          cellLoc='center',
-                          colWidths=[0.15] + [1 / len(column_headers)] * (len(column_headers) - 1), # 根据列数自动调整列宽
-                          colColours=ccolors,
-                          colLabels=column_headers,
-                          loc='center')
-    for key, cell in the_table.get_celld().items():
-        cell.set_text_props(fontsize='xx-large')
-    # Scaling is the only influence we have over top and bottom cell padding.
-    # Make the rows taller (i.e., make cell y scale larger).
-    the_table.scale(1, 1.5)
-    # Hide axes
-    ax = plt.gca()
-    ax.get_xaxis().set_visible(False)
-    ax.get_yaxis().set_visible(False)
-    # Hide axes border
-    plt.box(on=None)
-    # Add title
-    plt.suptitle(title_text, y=0.92)
-    # Add footer
-    plt.figtext(0.05, 0.05, footer_text, horizontalalignment='left', size=6, weight='light')
-    # Force the figure to update, so backends center objects correctly within the figure.
-    # Without plt.draw() here, the title will center on the axes and not the figure.
-    plt.draw()
-    # Create image. plt.savefig ignores figure edge and face colors, so map them.
-    fig = plt.gcf()
-    img = Image.open(f'{assets_dir}/logo.png')
-    fig.dpi = 250
-    width, height = fig.get_size_inches()*fig.dpi
-    wm_width = int(width/4)
-    scaling = (wm_width / float(img.size[0]))
-    wm_height = int(float(img.size[1])*float(scaling))
-    img = img.resize((wm_width, wm_height), Image.LANCZOS)
-    # ax = plt.axes()
-    # xpos = ax.transAxes.transform((0.695,0))[0]
-    # ypos = ax.transAxes.transform((0,0.805))[1]
-    fig.text(0.5, 0.5, 'SignalPlus',
-             fontsize=40, color='black',
-             ha='center', va='center', alpha=0.1)
-    fig.figimage(img, width-wm_width, 0, alpha=.8, zorder=1)
-
-    buf = io.BytesIO()
-    # plt.savefig('test.png', format='png', dpi=fig.dpi)
-    plt.savefig(buf, format='png', dpi=fig.dpi)
+    png = await render_pool.render("table", IV_TABLE, title_text, column_headers, data, footer_text, backend)
     text = f'📊 {title_text}'
     text += '\n\n'
-    buf.seek(0)
-    await bot.send_photo(chat_id=config_yaml["group_chat_id"], photo=buf, caption=text, parse_mode=ParseMode.HTML)
-    # Default
-    for chat_id in config_yaml["default_group_chat_ids"]:
-        try:
-            buf.seek(0)
-            await bot.send_photo(chat_id=chat_id, photo=buf, caption=text, parse_mode=ParseMode.HTML)
-            print('sent', chat_id)
-        except Exception as e:
-            print(e)
-            print('unavailable', chat_id)
+    return io.BytesIO(png), text
+
+
+async def push_iv(currency, exchange_name, backend="matplotlib"):
+    # the surface is fitted from deribit book summaries, the only venue it is built for
+    if exchange_name != 'deribit':
+        print(f'no vol surface for {exchange_name}')
+        return
+    snapshot = await run_blocking(vol_surface.build_snapshot, currency)
+    if snapshot is None:
+        print(f'no {currency} vol surface to push')
+        return
+    redis_client.put_vol_surface(currency, snapshot)
+    # the table shows vols to 2 decimals, on quiet days the formatted rows repeat
+    rows = iv_rows(snapshot)
+    # main group, then default
+    await send_chart("expire_iv", f"expire_iv {currency} {exchange_name}",
+                     [config_yaml["group_chat_id"]] + config_yaml["default_group_chat_ids"], [rows, backend],
+                     lambda: render_iv(currency, exchange_name, rows, backend))
 
 def convert_to_percentage(s):
     # 将字符串转换为浮点数并乘以100
@@ -150,4 +72,4 @@ def convert_to_float(s):
     return f"{num:.2f}"
 
 if __name__ == "__main__":
-    asyncio.run(push_iv())
+    asyncio.run(push_iv(sys.argv[1].upper(), sys.argv[2].lower(), *sys.argv[3:4]))
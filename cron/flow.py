@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+
+import sys
+import json
+import time
+import asyncio
+import datetime
+from telegram.constants import ParseMode
+
+from common import bot, config_yaml, redis_client
+
+# snapshots older than this are not reported, the bot publishes one every minute
+MAX_SNAPSHOT_AGE = 300
+
+
+def format_usd(value):
+    if abs(value) >= 1e6:
+        return f'${value/1e6:,.2f}M'
+    return f'${value/1e3:,.1f}K'
+
+
+def format_window(name, metrics):
+    premium = metrics["premium"]
+    text = f'<b>{name}</b>: {int(metrics["count"])} trades, notional {format_usd(metrics["notional"])}\n'
+    text += f'net premium {format_usd(abs(premium))} {"bought" if premium >= 0 else "sold"}, '
+    text += f'net Δ {metrics["delta"]:+,.2f}, net ν {metrics["vega"]:+,.2f}\n'
+    return text
+
+
+def top_by_notional(items, count=5):
+    return sorted(items.items(), key=lambda x: x[1]["notional"], reverse=True)[:count]
+
+
+async def push_flow(currency):
+    snapshot = redis_client.get_data('flow_snapshot')
+    if snapshot is None:
+        print('no flow snapshot')
+        return
+    snapshot = json.loads(snapshot)
+    # ts is epoch seconds, compared with the epoch rather than a naive utcnow() the host would
+    # read as local time
+    if time.time() - snapshot["ts"] > MAX_SNAPSHOT_AGE:
+        print('flow snapshot is stale', snapshot["ts"])
+        return
+
+    windows = snapshot["windows"]
+    text = f'🌊 <b>{currency} Options Flow</b>\n\n'
+    for name, label in (("1h", "1H"), ("24h", "24H")):
+        metrics = windows[name]["currency"].get(currency)
+        if metrics:
+            text += format_window(label, metrics)
+    strikes = top_by_notional(windows["24h"]["strike"].get(currency, {}))
+    if strikes:
+        text += '\n<b>Top strikes (24H notional)</b>: '
+        text += ', '.join(f'{strike} {format_usd(metrics["notional"])}' for strike, metrics in strikes)
+    expiries = top_by_notional(windows["24h"]["expiry"].get(currency, {}))
+    if expiries:
+        text += '\n<b>Top expiries (24H notional)</b>: '
+        text += ', '.join(f'{expiry} {format_usd(metrics["notional"])}' for expiry, metrics in expiries)
+    as_of = datetime.datetime.utcfromtimestamp(snapshot["ts"])
+    text += f'\n\n<i>⏰ {as_of.strftime("%Y-%m-%d %H:%M")} UTC+0</i>'
+
+    await bot.send_message(chat_id=config_yaml["group_chat_id"], text=text, parse_mode=ParseMode.HTML)
+
+
+if __name__ == "__main__":
+    asyncio.run(push_flow(sys.argv[1].upper()))
@@ -0,0 +1,85 @@
+# FXStreet economic calendar client. The OAuth token is kept until shortly before it expires,
+# any window of days is fetched with one eventDates request, and the events of the last fetch are
+# kept by id so each refresh reports which events are new or were revised since. The scheduler
+# keeps one client for its lifetime, so daily runs and intraday refreshes share both.
+
+import time
+import logging
+import datetime
+
+OAUTH_API = "https://authorization.fxstreet.com/v2/token"
+EVENT_DATES_API = "https://calendar-api.fxstreet.com/en/api/v1/eventDates"
+# a token is renewed this many seconds before it expires, and assumed to last an hour when the
+# response does not say
+TOKEN_MARGIN = 60
+TOKEN_LIFETIME = 3600
+
+logger = logging.getLogger(__name__)
+
+
+def event_time(event):
+    return datetime.datetime.strptime(event["dateUtc"], "%Y-%m-%dT%H:%M:%SZ")
+
+
+class CalendarClient:
+    def __init__(self, session, public_key, private_key):
+        self.session = session
+        self.public_key = public_key
+        self.private_key = private_key
+        self.authorization = None
+        self.expires = 0.0
+        # event id -> event as of the last fetch
+        self.events = {}
+
+    def token(self):
+        """The Authorization header value, requesting a new token only when the cached one expires."""
+        if self.authorization is None or time.time() >= self.expires:
+            response = self.session.post(OAUTH_API, data={
+                "grant_type": "client_credentials",
+                "client_id": self.public_key,
+                "client_secret": self.private_key,
+                "scope": "calendar",
+            })
+            response.raise_for_status()
+            oauth = response.json()
+            self.authorization = f'{oauth["token_type"]} {oauth["access_token"]}'
+            self.expires = time.time() + oauth.get("expires_in", TOKEN_LIFETIME) - TOKEN_MARGIN
+        return self.authorization
+
+    def fetch(self, first_date, end_date, volatilities):
+        # events from first_date up to, not including, end_date. A token revoked before its
+        # expiry is renewed once. None if the request fails.
+        url = f'{EVENT_DATES_API}/{first_date:%Y-%m-%d}/{end_date:%Y-%m-%d}'
+        try:
+            for attempt in range(2):
+                response = self.session.get(url, params={"volatilities": volatilities}, headers={"Authorization": self.token()})
+                if response.status_code != 401:
+                    break
+                self.authorization = None
+            response.raise_for_status()
+            events = response.json()
+        except Exception as e:
+            logger.error(f"Error fetching FXStreet events {first_date} to {end_date}: {e}")
+            return None
+        # errors come back as a json object rather than a list of events
+        if type(events) is dict:
+            logger.error(f"FXStreet error for events {first_date} to {end_date}: {events}")
+            return None
+        return events
+
+    def events_between(self, start, end, volatilities="HIGH"):
+        """
+        Calendar events from start up to end, naive UTC datetimes, in time order.
+
+        Returns:
+            (events, changed): changed is the set of ids of the events that are new or were
+            updated since the previous call. None for both if the request failed.
+        """
+        end_date = end.date() + datetime.timedelta(days=1) if end.time() else end.date()
+        events = self.fetch(start.date(), end_date, volatilities)
+        if events is None:
+            return None, None
+        events = sorted((event for event in events if start <= event_time(event) < end), key=event_time)
+        changed = {event["id"] for event in events if self.events.get(event["id"]) != event}
+        self.events = {event["id"]: event for event in events}
+        return events, changed
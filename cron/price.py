@@ -1,32 +1,22 @@
-import requests
 import asyncio
 import datetime
-import telegram
 from telegram.constants import ParseMode
 
-import yaml
-from pathlib import Path
-
-config_dir = Path(__file__).parent.parent.resolve() / "config"
-# load yaml config
-with open(config_dir / "config.yml", 'r') as f:
-    config_yaml = yaml.safe_load(f)
-
-bot = telegram.Bot(token=config_yaml["telegram_token"])
-
-# 定义 CoinGecko API 的 URL
-url = 'https://api.coingecko.com/api/v3/simple/price?ids=bitcoin%2Cethereum&vs_currencies=usd'
+from common import bot, config_yaml, redis_client, run_blocking
+import price_service
 
 
 # 定义获取价格的函数
 async def get_prices():
-    # 发送 GET 请求获取价格数据
-    response = requests.get(url)
-    # 解析响应数据
-    prices = response.json()
+    # the deribit index prices the bot keeps in Redis, CoinGecko only when they are stale
+    prices = await run_blocking(price_service.get_prices, redis_client)
+    missing = [currency for currency in ("BTC", "ETH") if currency not in prices]
+    if missing:
+        print('no price for', ', '.join(missing) + ', skipping the spot prices')
+        return
     # 获取 BTC 和 ETH 的价格
-    btc_price = prices['bitcoin']['usd']
-    eth_price = prices['ethereum']['usd']
+    btc_price = prices['BTC']
+    eth_price = prices['ETH']
 
     now = datetime.datetime.utcnow()
 
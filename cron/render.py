@@ -0,0 +1,163 @@
+# Chart rendering shared by the cron jobs: the logo watermark scaled once per target size and the
+# table and line chart templates every chart is drawn from. Renderers take plain data and return
+# PNG bytes. matplotlib is only imported by the first chart drawn with it, a process drawing its
+# tables with the Pillow backend never loads it.
+
+import io
+import threading
+from collections import namedtuple
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+import table_image
+
+assets_dir = Path(__file__).parent.parent.resolve() / "assets"
+# pyplot draws on one global current figure and rcParams are global, renders take turns
+render_lock = threading.Lock()
+
+# bump when a template or a table backend draws differently, cached charts then render afresh
+TEMPLATE_VERSION = 1
+
+BACKGROUND = 'snow'
+BORDER = 'darkgray'
+# header cells are shaded with the BuPu colormap at this value
+HEADER_SHADE = 0.1
+
+# Layout of a table chart:
+#   col_widths: fraction of the axes width per column
+#   figsize/dpi: None for the matplotlib defaults, dpi applies when saving
+#   font_size: cell font size, None to leave it to matplotlib; auto_font_size lets the table
+#       shrink it to fit
+#   scale: (x, y) cell scaling, y being the only control over row padding
+#   align: {column: "left"/"center"/"right"} for columns not centred
+#   title/footer: extra suptitle and figtext arguments, footer_xy the footer position
+TableStyle = namedtuple("TableStyle", [
+    "col_widths", "figsize", "dpi", "font_size", "auto_font_size", "scale", "align", "title", "footer_xy", "footer",
+], defaults=[None, None, None, True, (1, 1.5), {}, {"y": 0.92}, (0.05, 0.05), {"size": 6, "weight": "light"}])
+
+
+@lru_cache(maxsize=1)
+def pyplot():
+    """matplotlib.pyplot on the Agg backend."""
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    return plt
+
+
+@lru_cache(maxsize=1)
+def logo():
+    with Image.open(assets_dir / "logo.png") as img:
+        return img.copy()
+
+
+@lru_cache(maxsize=32)
+def watermark(width):
+    """The logo LANCZOS-scaled to width pixels, as the RGBA array figimage draws."""
+    img = logo()
+    height = int(float(img.size[1]) * (width / float(img.size[0])))
+    return np.asarray(img.resize((width, height), Image.LANCZOS))
+
+
+def add_watermarks(fig, x=None, y=0):
+    """The faint SignalPlus text across the middle and the logo, a quarter of the figure wide, at pixel x, y (bottom right by default)."""
+    width, height = fig.get_size_inches()*fig.dpi
+    img = watermark(int(width/4))
+    fig.text(0.5, 0.5, 'SignalPlus',
+             fontsize=40, color='black',
+             ha='center', va='center', alpha=0.1)
+    fig.figimage(img, width-img.shape[1] if x is None else x, y, alpha=.8, zorder=1)
+
+
+def to_png(fig):
+    buf = io.BytesIO()
+    fig.savefig(buf, format='png', dpi=fig.dpi)
+    pyplot().close(fig)
+    return buf.getvalue()
+
+
+def _align_column(table, col, align):
+    for key, cell in table.get_celld().items():
+        if key[1] == col:
+            cell._loc = align
+            cell.get_text().set_horizontalalignment(align)
+
+
+# table_chart backends: matplotlib's plt.table, or the Pillow drawing of table_image, quicker
+TABLE_BACKENDS = ("matplotlib", "pillow")
+
+
+def table_chart(style, title, column_headers, rows, footer, backend="matplotlib"):
+    """A titled table of text cells with a footer line, as PNG bytes."""
+    if backend not in TABLE_BACKENDS:
+        raise ValueError(f"unknown table backend {backend}")
+    if backend == "pillow":
+        return table_image.table_png(style, title, column_headers, rows, footer)
+    plt = pyplot()
+    with render_lock, plt.rc_context({'font.family': 'monospace'}):
+        # Setting a small pad on tight_layout seems to better regulate white space
+        fig = plt.figure(linewidth=2,
+                         edgecolor=BORDER,
+                         facecolor=BACKGROUND,
+                         tight_layout={'pad': 1},
+                         **({'figsize': style.figsize} if style.figsize else {}))
+        table = plt.table(cellText=rows,
+                          cellLoc='center',
+                          colWidths=style.col_widths,
+                          colColours=[plt.cm.BuPu(HEADER_SHADE)] * len(column_headers),
+                          colLabels=column_headers,
+                          loc='center')
+        for col, align in style.align.items():
+            _align_column(table, col, align)
+        if style.font_size is not None:
+            if not style.auto_font_size:
+                table.auto_set_font_size(False)
+            for cell in table.get_celld().values():
+                cell.set_text_props(fontsize=style.font_size)
+        table.scale(*style.scale)
+        # Hide axes and their border
+        ax = plt.gca()
+        ax.get_xaxis().set_visible(False)
+        ax.get_yaxis().set_visible(False)
+        plt.box(on=None)
+        plt.suptitle(title, **style.title)
+        plt.figtext(*style.footer_xy, footer, horizontalalignment='left', **style.footer)
+        # Draw once so the title centres on the figure and not the axes
+        plt.draw()
+        if style.dpi:
+            fig.dpi = style.dpi
+        add_watermarks(fig)
+        return to_png(fig)
+
+
+def percent_line_chart(title, lines, ylabel, figsize=(12, 5)):
+    """
+    Lines of percentages over shared categorical x values, as PNG bytes.
+
+    lines: [(label, x, y, color, linestyle)], y in percent
+    """
+    from matplotlib import ticker
+    plt = pyplot()
+    ys = [value for _, _, y, _, _ in lines for value in y]
+    min_y, max_y = min(ys), max(ys)
+    with render_lock, plt.rc_context({'xtick.labelsize': 10, 'ytick.labelsize': 10}):
+        fig = plt.figure(figsize=figsize)
+        ax = plt.axes()
+        # logo at the top right of the axes
+        add_watermarks(fig, ax.transAxes.transform((0.695, 0))[0], ax.transAxes.transform((0, 0.805))[1])
+
+        for label, x, y, color, linestyle in lines:
+            plt.plot(x, y, linestyle, label=label, marker='o', color=color)
+
+        plt.ylabel(ylabel)
+        min_y_axis = min_y - (max_y - min_y) / 4
+        max_y_axis = max_y + (max_y - min_y) / 4
+        plt.yticks(np.arange(min_y_axis, max_y_axis, (max_y_axis-min_y_axis)/4))
+        plt.gca().yaxis.set_major_formatter(ticker.PercentFormatter())
+        plt.legend(loc='lower right', fontsize="8")
+        plt.title(title)
+        plt.grid(axis='y')
+        return to_png(fig)
@@ -0,0 +1,67 @@
+# Renders charts in worker processes, so several charts draw at once across cores while the event
+# loop keeps serving. Jobs are plain data in, PNG bytes out: a job kind naming a render.py template
+# and that template's arguments, all picklable.
+#
+# Workers fork from a forkserver that has already imported render, and matplotlib.pyplot when the
+# jobs draw with it. Each worker draws a throwaway table with every backend the jobs use when it
+# starts, so no job pays for the imports, the font cache or the watermark scaling, and a pool
+# drawing only Pillow tables never loads matplotlib. Forking from the server rather than from the scheduler
+# keeps workers clear of locks the scheduler's threads may hold. With no workers the charts are
+# drawn in an executor thread of the calling process instead.
+
+import os
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import render
+
+# job kind -> template run in the worker
+RENDERERS = {
+    "table": render.table_chart,
+    "line": render.percent_line_chart,
+}
+
+
+def _warm(backends):
+    for backend in backends:
+        render.table_chart(render.TableStyle(col_widths=[0.5, 0.5]), "", ["a", "b"], [["1", "2"]], "", backend)
+
+
+def _render(kind, args):
+    return RENDERERS[kind](*args)
+
+
+class RenderPool:
+    def __init__(self, workers=None):
+        self.workers = os.cpu_count() if workers is None else workers
+        self.executor = None
+
+    def start(self, backends=()):
+        """Start the workers now rather than on the first job, warmed up for the table backends given."""
+        if self.executor is not None or self.workers == 0:
+            return
+        context = multiprocessing.get_context("forkserver")
+        context.set_forkserver_preload(["render"] + (["matplotlib.pyplot"] if "matplotlib" in backends else []))
+        self.executor = ProcessPoolExecutor(self.workers, mp_context=context, initializer=_warm, initargs=(tuple(backends),))
+        # workers are started as jobs find none idle, queue one per worker to start them all
+        for _ in range(self.workers):
+            self.executor.submit(int)
+
+    async def render(self, kind, *args):
+        """
+        PNG bytes of a chart.
+
+        Args:
+            kind: "table" for render.table_chart, "line" for render.percent_line_chart
+            args: the template's arguments
+        """
+        if kind not in RENDERERS:
+            raise ValueError(f"unknown chart kind {kind}")
+        self.start()
+        return await asyncio.get_running_loop().run_in_executor(self.executor, _render, kind, args)
+
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
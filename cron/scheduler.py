@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+# Runs the cron jobs on cron-like schedules in one long-lived process, so imports, config, the
+# telegram bot and HTTP connections are set up once rather than for every run. Jobs due in the
+# same minute (e.g. the BTC and ETH variants) run concurrently, a job still running when it is due
+# again is skipped.
+#
+# usage: python3 cron/scheduler.py
+#        python3 cron/scheduler.py --once plot BTC atm
+#
+# The schedule is the "schedule" list of config/config.yml when present, DEFAULT_SCHEDULE otherwise,
+# with times in UTC:
+#   schedule:
+#     - {cron: "0 9 * * *", job: plot, args: [BTC, atm]}
+# Charts are drawn in render_workers processes (render_pool.py), one per CPU by default, warmed up
+# for the table backends the schedule uses.
+# The table jobs (volume, expire_iv, eco_calendar) take the table backend as an optional last
+# argument, "matplotlib" or "pillow", e.g. args: [BTC, deribit, pillow].
+
+import time
+import asyncio
+import argparse
+import datetime
+import traceback
+
+from common import config_yaml, render_pool
+import eco_calendar
+import expireIv
+import flow
+import plot
+import price
+import render
+import vol_snapshot
+import volume
+
+# job name -> coroutine function taking the job's args
+JOBS = {
+    "price": price.get_prices,
+    "plot": plot.push_plot,
+    "volume": volume.push_volume,
+    "expire_iv": expireIv.push_iv,
+    "eco_calendar": eco_calendar.get_calendar,
+    "flow": flow.push_flow,
+    "vol_snapshot": vol_snapshot.store_snapshot,
+}
+
+# table job -> position of its optional table backend argument
+TABLE_JOBS = {"volume": 2, "expire_iv": 2, "eco_calendar": 0}
+# jobs drawing line charts, always with matplotlib
+LINE_JOBS = {"plot"}
+
+DEFAULT_SCHEDULE = [
+    {"cron": "5 * * * *", "job": "vol_snapshot", "args": ["BTC"]},
+    {"cron": "5 * * * *", "job": "vol_snapshot", "args": ["ETH"]},
+    {"cron": "0 */8 * * *", "job": "price", "args": []},
+    {"cron": "30 5 * * *", "job": "eco_calendar", "args": []},
+    {"cron": "0 9 * * *", "job": "plot", "args": ["BTC", "atm"]},
+    {"cron": "0 9 * * *", "job": "plot", "args": ["ETH", "atm"]},
+    {"cron": "0 10 * * *", "job": "expire_iv", "args": ["BTC", "deribit"]},
+    {"cron": "0 10 * * *", "job": "expire_iv", "args": ["ETH", "deribit"]},
+    {"cron": "0 11 * * *", "job": "volume", "args": ["BTC", "deribit"]},
+    {"cron": "0 11 * * *", "job": "volume", "args": ["ETH", "deribit"]},
+    {"cron": "0 */4 * * *", "job": "flow", "args": ["BTC"]},
+    {"cron": "0 */4 * * *", "job": "flow", "args": ["ETH"]},
+]
+
+
+def parse_field(field, low, high):
+    """The set of values a cron field ("*", "*/15", "1-5", "0,30", "8-20/4") allows."""
+    values = set()
+    for part in field.split(","):
+        part, _, step = part.partition("/")
+        if part == "*":
+            start, end = low, high
+        elif "-" in part:
+            start, end = (int(value) for value in part.split("-"))
+        else:
+            start = end = int(part)
+        if step and "-" not in part and part != "*":
+            end = high
+        values.update(range(start, end + 1, int(step) if step else 1))
+    if not values or min(values) < low or max(values) > high:
+        raise ValueError(f"cron field {field} outside {low}-{high}")
+    return values
+
+
+class CronSchedule:
+    """A five field cron expression: minute, hour, day of month, month, day of week (0 or 7 = Sunday)."""
+
+    def __init__(self, expression):
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError(f"cron expression needs 5 fields: {expression}")
+        self.expression = expression
+        self.minutes = parse_field(fields[0], 0, 59)
+        self.hours = parse_field(fields[1], 0, 23)
+        self.days = parse_field(fields[2], 1, 31)
+        self.months = parse_field(fields[3], 1, 12)
+        self.weekdays = {day % 7 for day in parse_field(fields[4], 0, 7)}
+        # like cron, a restricted day of month and day of week match when either does
+        self.any_day = fields[2] == "*"
+        self.any_weekday = fields[4] == "*"
+
+    def _day_matches(self, moment):
+        day = moment.day in self.days
+        weekday = (moment.weekday() + 1) % 7 in self.weekdays
+        if self.any_day or self.any_weekday:
+            return day and weekday
+        return day or weekday
+
+    def next(self, after):
+        """The first matching minute strictly after the datetime after."""
+        moment = after.replace(second=0, microsecond=0) + datetime.timedelta(minutes=1)
+        # bounded search: skip whole months, days and hours that cannot match
+        for _ in range(100000):
+            if moment.month not in self.months:
+                moment = (moment.replace(day=1, hour=0, minute=0) + datetime.timedelta(days=32)).replace(day=1)
+            elif not self._day_matches(moment):
+                moment = moment.replace(hour=0, minute=0) + datetime.timedelta(days=1)
+            elif moment.hour not in self.hours:
+                moment = moment.replace(minute=0) + datetime.timedelta(hours=1)
+            elif moment.minute not in self.minutes:
+                moment += datetime.timedelta(minutes=1)
+            else:
+                return moment
+        raise ValueError(f"cron expression never matches: {self.expression}")
+
+
+def job_name(entry):
+    return " ".join([entry["job"]] + [str(arg) for arg in entry["args"]])
+
+
+class Scheduler:
+    def __init__(self, schedule):
+        self.entries = []
+        for entry in schedule:
+            if entry["job"] not in JOBS:
+                raise ValueError(f"unknown job {entry['job']}")
+            self.entries.append((CronSchedule(entry["cron"]), {"job": entry["job"], "args": list(entry.get("args", []))}))
+        self.running = {}
+
+    async def run_job(self, entry):
+        name = job_name(entry)
+        started = time.monotonic()
+        print(f'{datetime.datetime.utcnow():%Y-%m-%d %H:%M:%S} start {name}')
+        try:
+            await JOBS[entry["job"]](*entry["args"])
+            print(f'{datetime.datetime.utcnow():%Y-%m-%d %H:%M:%S} done {name} in {time.monotonic() - started:.1f}s')
+        except Exception as e:
+            print(f'{datetime.datetime.utcnow():%Y-%m-%d %H:%M:%S} failed {name}: {e}')
+            traceback.print_exc()
+
+    def start(self, entry):
+        name = job_name(entry)
+        task = self.running.get(name)
+        if task is not None and not task.done():
+            print(f'{datetime.datetime.utcnow():%Y-%m-%d %H:%M:%S} skip {name}, still running')
+            return
+        self.running[name] = asyncio.get_running_loop().create_task(self.run_job(entry), name=name)
+
+    async def run(self):
+        render_pool.start(chart_backends(self.entries))
+        now = datetime.datetime.utcnow()
+        due = [(schedule.next(now), schedule, entry) for schedule, entry in self.entries]
+        while True:
+            moment = min(when for when, _, _ in due)
+            await asyncio.sleep(max((moment - datetime.datetime.utcnow()).total_seconds(), 0))
+            for i, (when, schedule, entry) in enumerate(due):
+                if when == moment:
+                    self.start(entry)
+                    due[i] = (schedule.next(moment), schedule, entry)
+
+
+def chart_backends(entries):
+    """The table backends the scheduled jobs draw with, in render.TABLE_BACKENDS order."""
+    backends = set()
+    for _, entry in entries:
+        if entry["job"] in LINE_JOBS:
+            backends.add("matplotlib")
+        elif entry["job"] in TABLE_JOBS:
+            position = TABLE_JOBS[entry["job"]]
+            backends.add(entry["args"][position] if len(entry["args"]) > position else "matplotlib")
+    return [backend for backend in render.TABLE_BACKENDS if backend in backends]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the cron jobs on their schedules")
+    parser.add_argument("--once", nargs="+", metavar=("JOB", "ARGS"), help="run one job now and exit")
+    args = parser.parse_args()
+    if args.once:
+        entry = {"job": args.once[0], "args": args.once[1:]}
+        asyncio.run(Scheduler([dict(entry, cron="* * * * *")]).run_job(entry))
+        render_pool.shutdown()
+        return
+    scheduler = Scheduler(config_yaml.get("schedule", DEFAULT_SCHEDULE))
+    for schedule, entry in scheduler.entries:
+        print(f'{schedule.expression:<16} {job_name(entry)}')
+    asyncio.run(scheduler.run())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+# Table charts drawn straight with Pillow, the cheap alternative to render.table_chart for the jobs
+# whose charts are only text tables. It lays a render.TableStyle out the way plt.table and
+# tight_layout do, so the two backends give the same looking PNGs, but never imports matplotlib:
+# fonts are DejaVu Sans Mono, matplotlib's monospace font, loaded once per size from its package
+# data, and the watermark layer is built once per image size and composited over each table.
+
+import io
+import re
+import math
+import importlib.util
+from functools import lru_cache
+from pathlib import Path
+
+from PIL import Image, ImageDraw, ImageFont
+
+assets_dir = Path(__file__).parent.parent.resolve() / "assets"
+fonts_dir = Path(importlib.util.find_spec("matplotlib").submodule_search_locations[0]) / "mpl-data" / "fonts" / "ttf"
+FONTS = {"normal": "DejaVuSansMono.ttf", "bold": "DejaVuSansMono-Bold.ttf"}
+
+# render.BACKGROUND, render.BORDER and the header colour (BuPu at render.HEADER_SHADE) as RGB
+BACKGROUND = (255, 250, 250)
+BORDER = (169, 169, 169)
+HEADER_COLOR = (229, 239, 246)
+CELL_COLOR = (255, 255, 255)
+EDGE_COLOR = (0, 0, 0)
+
+# matplotlib's defaults: figure size in inches and dpi, text size in points and the named sizes
+FIGSIZE = (6.4, 4.8)
+DPI = 100
+FONT_SIZE = 10
+FONT_SCALINGS = {"xx-small": 0.579, "x-small": 0.694, "small": 0.833, "medium": 1.0,
+                 "large": 1.2, "x-large": 1.44, "xx-large": 1.728}
+# plt.table: cell text padding as a fraction of the cell width, rows 1.2 lines of 10pt text tall
+# with the axes of a default subplot, about 1.37 once tight_layout has grown it, before scaling
+CELL_PAD = 0.1
+ROW_LINES = 1.37
+# width of a default subplot's axes, the one fonts are fitted to before tight_layout runs
+SUBPLOT_WIDTH = 0.775
+FIGURE_LINEWIDTH = 2
+# tight_layout pad, in units of the font size
+LAYOUT_PAD = 1
+
+# footer mathtext the jobs use: $\bf{...}$ bold runs and \$ dollar signs
+BOLD_RUN = re.compile(r"\$\\bf\{(.*?)\}\$")
+
+
+@lru_cache(maxsize=64)
+def font(weight, pixels):
+    return ImageFont.truetype(str(fonts_dir / FONTS["bold" if weight == "bold" else "normal"]), pixels)
+
+
+def sized_font(weight, size, dpi):
+    # size points at dpi, in whole pixels rounding halves up as Agg does
+    return font(weight, max(1, math.floor(size * dpi / 72 + 0.5)))
+
+
+def points(size):
+    """A matplotlib font size, in points or by name, in points."""
+    if size is None:
+        return FONT_SIZE
+    if isinstance(size, str):
+        return FONT_SCALINGS[size] * FONT_SIZE
+    return size
+
+
+@lru_cache(maxsize=16)
+def watermark_layer(width, height, dpi):
+    """
+    The transparent overlay every table gets: the faint SignalPlus text across the middle and the
+    logo, a quarter of the image wide, at the bottom right, as render.add_watermarks draws them.
+    """
+    layer = Image.new("RGBA", (width, height), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(layer)
+    draw.text((width / 2, height / 2), "SignalPlus", font=sized_font("normal", 40, dpi),
+              fill=(0, 0, 0, round(255 * 0.1)), anchor="mm")
+    with Image.open(assets_dir / "logo.png") as img:
+        logo_width = int(width / 4)
+        logo = img.convert("RGBA").resize((logo_width, int(img.size[1] * logo_width / img.size[0])), Image.LANCZOS)
+    logo.putalpha(logo.getchannel("A").point(lambda alpha: round(alpha * 0.8)))
+    layer.alpha_composite(logo, (width - logo.size[0], height - logo.size[1]))
+    return layer
+
+
+@lru_cache(maxsize=16)
+def column_edges(col_widths, width, dpi):
+    """Pixel x of each column border, the table centred and shrunk, as tight_layout does, to fit the padded figure."""
+    pad = LAYOUT_PAD * FONT_SIZE * dpi / 72
+    scale = (width - 2 * pad) / max(sum(col_widths), 1)
+    left = (width - sum(col_widths) * scale) / 2
+    edges = [left]
+    for col_width in col_widths:
+        edges.append(edges[-1] + col_width * scale)
+    return tuple(round(x) for x in edges)
+
+
+def fit_font_size(texts, col_widths, figure_width, size):
+    # like Table.auto_set_font_size: shrink a point at a time until every cell's padded text fits
+    # its column, the one size then used by every cell. plt.table fits them on the first draw, to
+    # the default subplot at the default dpi.
+    widths = [col_width * SUBPLOT_WIDTH * figure_width * DPI for col_width in col_widths]
+    while size > 1:
+        cell_font = sized_font("normal", size, DPI)
+        if all(cell_font.getlength(text) * (1 + 2 * CELL_PAD) <= widths[col]
+               for row in texts for col, text in enumerate(row)):
+            break
+        size -= 1
+    return size
+
+
+def draw_runs(draw, xy, text, weight, size, dpi, fill):
+    # a footer line, its $\bf{...}$ runs in bold, from the baseline at xy
+    x, y = xy
+    for i, run in enumerate(BOLD_RUN.split(text)):
+        run = run.replace("\\$", "$")
+        run_font = sized_font("bold" if i % 2 else weight, size, dpi)
+        draw.text((x, y), run, font=run_font, fill=fill, anchor="ls")
+        x += run_font.getlength(run)
+
+
+def table_png(style, title, column_headers, rows, footer):
+    """render.table_chart's table drawn with Pillow, as PNG bytes."""
+    dpi = style.dpi or DPI
+    figsize = style.figsize or FIGSIZE
+    width, height = (round(size * dpi) for size in figsize)
+    texts = [[str(text) for text in column_headers]] + [[str(text) for text in row] for row in rows]
+    edges = column_edges(tuple(style.col_widths), width, dpi)
+
+    size = points(style.font_size)
+    if style.auto_font_size:
+        size = fit_font_size(texts, style.col_widths, figsize[0], size)
+    cell_font = sized_font("normal", size, dpi)
+
+    img = Image.new("RGBA", (width, height), BACKGROUND)
+    draw = ImageDraw.Draw(img)
+    line = max(1, round(dpi / 72))
+    # the figure edge line is centred on the image border, half of it shows
+    draw.rectangle((0, 0, width - 1, height - 1), outline=BORDER, width=math.ceil(FIGURE_LINEWIDTH * dpi / 144))
+
+    # rows centred between the bottom pad and the title, as tight_layout places the table axes
+    title_y = (1 - style.title.get("y", 0.98)) * height
+    pad = LAYOUT_PAD * FONT_SIZE * dpi / 72
+    row_height = ROW_LINES * FONT_SIZE * dpi / 72 * style.scale[1]
+    top = (title_y + height - pad) / 2 - row_height * len(texts) / 2
+    # a table too tall for that grows up over the title, keeping clear of the bottom
+    top = max(min(top, height - pad - row_height * len(texts)), pad)
+    for i, row in enumerate(texts):
+        y0, y1 = round(top + i * row_height), round(top + (i + 1) * row_height)
+        for col, text in enumerate(row):
+            x0, x1 = edges[col], edges[col + 1]
+            draw.rectangle((x0, y0, x1, y1), fill=HEADER_COLOR if i == 0 else CELL_COLOR, outline=EDGE_COLOR, width=line)
+            align = style.align.get(col, "center")
+            if align == "left":
+                xy, anchor = (x0 + (x1 - x0) * CELL_PAD, (y0 + y1) / 2), "lm"
+            elif align == "right":
+                xy, anchor = (x1 - (x1 - x0) * CELL_PAD, (y0 + y1) / 2), "rm"
+            else:
+                xy, anchor = ((x0 + x1) / 2, (y0 + y1) / 2), "mm"
+            draw.text(xy, text, font=cell_font, fill=EDGE_COLOR, anchor=anchor)
+
+    title_font = sized_font(style.title.get("weight", "normal"), points(style.title.get("fontsize", "large")), dpi)
+    draw.text((width / 2, title_y), title, font=title_font, fill=style.title.get("color", "black"), anchor="mt")
+    footer_x, footer_y = style.footer_xy
+    draw_runs(draw, (footer_x * width, (1 - footer_y) * height), footer, style.footer.get("weight", "normal"),
+              points(style.footer.get("size")), dpi, EDGE_COLOR)
+
+    img.alpha_composite(watermark_layer(width, height, dpi))
+    buf = io.BytesIO()
+    img.convert("RGB").save(buf, format="png")
+    return buf.getvalue()
@@ -0,0 +1,24 @@
+#!/usr/bin/env python3
+# Fit and store the current deribit vol surface of a currency, so plot.py and expireIv.py have
+# our own T-1/T-7 history to compare against. Run hourly per currency.
+#
+# usage: python3 cron/vol_snapshot.py BTC
+
+import sys
+import asyncio
+
+from common import redis_client, run_blocking
+import vol_surface
+
+
+async def store_snapshot(currency):
+    snapshot = await run_blocking(vol_surface.build_snapshot, currency)
+    if snapshot is None:
+        print('no', currency, 'vol surface to store')
+        return
+    redis_client.put_vol_surface(currency, snapshot)
+    print('stored', currency, 'vol surface with', len(snapshot['expiries']), 'expiries')
+
+
+if __name__ == "__main__":
+    asyncio.run(store_snapshot(sys.argv[1].upper()))
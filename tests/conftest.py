@@ -0,0 +1,6 @@
+import sys
+from pathlib import Path
+
+# the bot and cron modules import each other flat, as when run from their own directories
+root = Path(__file__).parent.parent.resolve()
+sys.path[:0] = [str(root / "bot"), str(root / "cron")]
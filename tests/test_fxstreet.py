@@ -0,0 +1,74 @@
+import datetime
+
+import requests
+
+import fxstreet
+
+START = datetime.datetime(2024, 1, 2, 6)
+END = START + datetime.timedelta(days=1)
+
+
+class Response:
+    def __init__(self, status_code, body):
+        self.status_code = status_code
+        self.body = body
+
+    def json(self):
+        if isinstance(self.body, Exception):
+            raise self.body
+        return self.body
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code} Error")
+
+
+class Session:
+    def __init__(self, *responses, token_status=200):
+        self.responses = list(responses)
+        self.token_status = token_status
+        self.tokens = 0
+
+    def post(self, url, data):
+        self.tokens += 1
+        return Response(self.token_status, {"token_type": "Bearer", "access_token": f"t{self.tokens}", "expires_in": 3600})
+
+    def get(self, url, params, headers):
+        return self.responses.pop(0)
+
+
+def event(id, date_utc):
+    return {"id": id, "dateUtc": date_utc, "name": f"event {id}"}
+
+
+def test_events_in_window_and_changes():
+    events = [event("b", "2024-01-02T14:30:00Z"), event("a", "2024-01-02T08:00:00Z"), event("c", "2024-01-03T07:00:00Z")]
+    client = fxstreet.CalendarClient(Session(Response(200, events), Response(200, events)), "public", "private")
+    found, changed = client.events_between(START, END)
+    assert [e["id"] for e in found] == ["a", "b"]
+    assert changed == {"a", "b"}
+    assert client.events_between(START, END)[1] == set()
+    assert client.session.tokens == 1
+
+
+def test_http_error_returns_none():
+    client = fxstreet.CalendarClient(Session(Response(503, ValueError("not json"))), "public", "private")
+    assert client.events_between(START, END) == (None, None)
+
+
+def test_error_object_returns_none():
+    client = fxstreet.CalendarClient(Session(Response(200, {"message": "quota exceeded"})), "public", "private")
+    assert client.events_between(START, END) == (None, None)
+
+
+def test_failed_token_returns_none():
+    client = fxstreet.CalendarClient(Session(token_status=500), "public", "private")
+    assert client.events_between(START, END) == (None, None)
+
+
+def test_revoked_token_is_renewed_once():
+    session = Session(Response(401, {}), Response(200, [event("a", "2024-01-02T08:00:00Z")]))
+    client = fxstreet.CalendarClient(session, "public", "private")
+    found, _ = client.events_between(START, END)
+    assert [e["id"] for e in found] == ["a"]
+    assert session.tokens == 2
@@ -0,0 +1,50 @@
+import time
+
+import price_service
+
+
+class IndexPrices:
+    # the index_price hash of RedisClient
+    def __init__(self):
+        self.entries = {}
+
+    def put_index_price(self, currency, price, timestamp, source):
+        self.entries[currency] = {"price": float(price), "ts": timestamp, "source": source}
+
+    def get_index_prices(self, currencies):
+        return {currency: dict(self.entries[currency]) for currency in currencies if currency in self.entries}
+
+
+def coingecko_down(currencies):
+    raise ConnectionError("coingecko down")
+
+
+def test_fresh_prices_skip_coingecko(monkeypatch):
+    monkeypatch.setattr(price_service, "fetch_external_prices", coingecko_down)
+    redis_client = IndexPrices()
+    price_service.record_trades(redis_client, "BTC", [
+        {"timestamp": time.time() * 1000 - 5000, "index_price": 42000.0},
+        {"timestamp": time.time() * 1000, "index_price": 42010.5},
+    ])
+    assert price_service.get_prices(redis_client, ("BTC",)) == {"BTC": 42010.5}
+
+
+def test_stale_prices_are_refreshed(monkeypatch):
+    monkeypatch.setattr(price_service, "fetch_external_prices", lambda currencies: {currency: 2300.0 for currency in currencies})
+    redis_client = IndexPrices()
+    redis_client.put_index_price("ETH", 2200.0, time.time() - 2 * price_service.MAX_AGE, "deribit")
+    assert price_service.get_prices(redis_client, ("ETH",)) == {"ETH": 2300.0}
+    assert redis_client.entries["ETH"]["source"] == "coingecko"
+
+
+def test_stale_prices_kept_when_coingecko_fails(monkeypatch):
+    monkeypatch.setattr(price_service, "fetch_external_prices", coingecko_down)
+    redis_client = IndexPrices()
+    redis_client.put_index_price("ETH", 2200.0, time.time() - 2 * price_service.MAX_AGE, "deribit")
+    assert price_service.get_prices(redis_client) == {"ETH": 2200.0}
+
+
+def test_cold_cache_and_coingecko_failure_leave_currencies_out(monkeypatch):
+    # callers must check for the currencies they need rather than index the result
+    monkeypatch.setattr(price_service, "fetch_external_prices", coingecko_down)
+    assert price_service.get_prices(IndexPrices()) == {}
@@ -0,0 +1,37 @@
+import pytest
+
+from redis_client import RedisClient, trade_set_id
+
+
+@pytest.fixture
+def client(monkeypatch):
+    fakeredis = pytest.importorskip("fakeredis")
+    monkeypatch.setattr("redis.Redis", lambda **kwargs: fakeredis.FakeRedis())
+    return RedisClient()
+
+
+def test_okx_trades_sharing_a_trade_id_have_distinct_ids():
+    # okx numbers trades per instrument, two instruments can report the same tradeId
+    first = trade_set_id("okx", "361", "1679882651706")
+    second = trade_set_id("okx", "361", "1679882652113")
+    assert first != second
+    assert first == "okx_361_1679882651706"
+
+
+def test_venue_ids_are_namespaced():
+    assert trade_set_id("bybit", "1b21d10b") == "bybit_1b21d10b"
+    assert trade_set_id("deribit", "ETH-123456") == "ETH-123456"
+
+
+def test_claims_of_okx_trades_sharing_a_trade_id(client):
+    chat_id = -100
+    assert client.claim_send(chat_id, trade_set_id("okx", "361", "1679882651706"))
+    assert client.claim_send(chat_id, trade_set_id("okx", "361", "1679882652113"))
+    assert not client.claim_send(chat_id, trade_set_id("okx", "361", "1679882651706"))
+
+
+def test_released_claim_can_be_taken_again(client):
+    assert client.claim_send(-100, "ETH-123456")
+    client.release_send(-100, "ETH-123456")
+    assert client.claim_send(-100, "ETH-123456")
+    assert client.claim_send(-200, "ETH-123456")
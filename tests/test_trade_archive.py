@@ -0,0 +1,97 @@
+import builtins
+
+import pytest
+
+import trade_archive
+from trade_archive import TradeArchiveReader, TradeArchiveWriter
+
+DAY_MS = 1700006400000  # 2023-11-15 00:00 UTC
+
+
+def trade(i):
+    return {
+        "trade_id": f"BTC-{i}",
+        "source": "deribit",
+        "symbol": f"BTC-29DEC23-{30000 + 1000 * i}-C",
+        "currency": "BTC",
+        "direction": "buy",
+        "price": 0.01 * i,
+        "size": i,
+        "timestamp": DAY_MS + i,
+    }
+
+
+def read_all(archive_dir):
+    return TradeArchiveReader(archive_dir).scan(DAY_MS, DAY_MS + 86400000)
+
+
+def assert_aligned(data, ids):
+    assert [trade_id.decode() for trade_id in data["trade_id"]] == [f"BTC-{i}" for i in ids]
+    assert [symbol.decode() for symbol in data["symbol"]] == [trade(i)["symbol"] for i in ids]
+    assert list(data["timestamp"]) == [DAY_MS + i for i in ids]
+
+
+@pytest.fixture
+def fail_on_column(monkeypatch):
+    # make writes to one column file raise, after the columns before it were appended
+    def fail(column):
+        def failing_open(path, *args, **kwargs):
+            if str(path).endswith(f"{column}.bin"):
+                raise OSError("disk full")
+            return builtins.open(path, *args, **kwargs)
+        monkeypatch.setattr(trade_archive, "open", failing_open, raising=False)
+    return fail
+
+
+def test_failed_flush_keeps_rows_and_columns_aligned(tmp_path, fail_on_column, monkeypatch):
+    writer = TradeArchiveWriter(str(tmp_path))
+    for i in range(3):
+        writer.append(trade(i))
+    writer.flush()
+
+    for i in range(3, 6):
+        writer.append(trade(i))
+    fail_on_column("symbol")
+    with pytest.raises(OSError):
+        writer.flush()
+    assert_aligned(read_all(str(tmp_path)), range(3))
+
+    monkeypatch.delattr(trade_archive, "open")
+    writer.append(trade(6))
+    writer.flush()
+    assert writer.pending == {}
+    assert_aligned(read_all(str(tmp_path)), range(7))
+
+
+def test_rows_appended_after_an_interrupted_flush_line_up(tmp_path, fail_on_column, monkeypatch):
+    writer = TradeArchiveWriter(str(tmp_path))
+    for i in range(3):
+        writer.append(trade(i))
+    writer.flush()
+    for i in range(3, 6):
+        writer.append(trade(i))
+    fail_on_column("price")
+    with pytest.raises(OSError):
+        writer.flush()
+
+    # the process dies with the batch unwritten, a new one carries on with the same day
+    monkeypatch.delattr(trade_archive, "open")
+    writer = TradeArchiveWriter(str(tmp_path))
+    for i in range(6, 9):
+        writer.append(trade(i))
+    writer.flush()
+    assert_aligned(read_all(str(tmp_path)), [0, 1, 2, 6, 7, 8])
+
+
+def test_append_keeps_buffering_while_flushes_fail(tmp_path, fail_on_column):
+    writer = TradeArchiveWriter(str(tmp_path), max_pending=3)
+    fail_on_column("timestamp")
+    for i in range(5):
+        writer.append(trade(i))
+    with pytest.raises(OSError):
+        writer.flush()
+    # append never flushes, and only the newest max_pending rows are kept
+    writer.append(trade(5))
+    assert writer.pending_rows == 3
+    assert writer.dropped == 3
+    assert [row[3] for rows in writer.pending.values() for row in rows] == ["BTC-3", "BTC-4", "BTC-5"]
@@ -0,0 +1,17 @@
+import numpy as np
+
+import vol_surface
+
+
+def test_tenor_vols_without_expiries_are_nan():
+    smiles = vol_surface.fit_smiles([], now=0)
+    vols = vol_surface.delta_vols(smiles)
+    result = vol_surface.tenor_vols(smiles, vols)
+    assert result.shape == (len(vol_surface.TENORS), len(vol_surface.POINTS))
+    assert np.isnan(result).all()
+
+
+def test_no_usable_options_gives_no_snapshot():
+    # every iv zero, as the book summary reads when deribit has no marks
+    summary = [{"instrument_name": "BTC-29MAR24-40000-C", "mark_iv": 0, "underlying_price": 42000.0}]
+    assert vol_surface.build_snapshot("BTC", summary=summary, closes=np.empty(0), now=0) is None